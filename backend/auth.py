@@ -1,34 +1,38 @@
-import bcrypt
 import jwt
+import os
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional, Set, Tuple
 from fastapi import HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from database import SessionLocal
-from models import User
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.database import get_db
+from backend.models import User
+from backend.password_hasher import hash_password, verify_password  # noqa: F401
 
 # Konfigurasi
 SECRET_KEY = "your-secret-key-here-ganti-di-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-security = HTTPBearer()
+# Cache user hasil resolve token (TTL pendek, dibatasi jumlahnya)
+AUTH_CACHE_TTL = float(os.environ.get("WT_AUTH_CACHE_TTL", "30"))
+AUTH_CACHE_MAX_ENTRIES = int(os.environ.get("WT_AUTH_CACHE_MAX_ENTRIES", "10000"))
 
-def hash_password(password: str) -> str:
-    """Hash password dengan bcrypt"""
-    salt = bcrypt.gensalt()
-    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+security = HTTPBearer()
+# Client lama hanya mengirim user_id tanpa Authorization
+optional_security = HTTPBearer(auto_error=False)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verifikasi password"""
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+# hash_password / verify_password (blocking) ada di backend/password_hasher.py,
+# dari endpoint async pakai password_hasher.hash()/verify() supaya lewat worker pool
 
 def create_access_token(data: dict) -> str:
     """Buat JWT token"""
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    now = datetime.utcnow()
+    expire = now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    to_encode.update({"exp": expire, "iat": now})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 def verify_token(token: str) -> Optional[dict]:
@@ -39,27 +43,128 @@ def verify_token(token: str) -> Optional[dict]:
     except jwt.PyJWTError:
         return None
 
-# Dependency untuk database session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# ================= PRINCIPAL CACHE =================
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    """Dependency untuk mendapatkan user dari token"""
-    token = credentials.credentials
+class PrincipalCache:
+    """LRU (user_id, iat) -> User (detached) dengan TTL pendek
+
+    Signature dan exp token tetap dicek setiap request oleh verify_token,
+    cache hanya menghemat query ke tabel users. Perubahan user (hapus,
+    ganti password, dll) harus memanggil invalidate_user(); endpoint di
+    main.py pakai invalidate_user_everywhere() supaya cache di shard lain
+    ikut dibuang.
+    """
+
+    def __init__(self, ttl: float = AUTH_CACHE_TTL, max_entries: int = AUTH_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[int, Optional[int]], Tuple[float, User]]" = OrderedDict()
+        self._by_user: Dict[int, Set[Tuple[int, Optional[int]]]] = {}
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "evictions": 0,
+            "invalidations": 0,
+        }
+
+    def get(self, key: Tuple[int, Optional[int]]) -> Optional[User]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, user = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return user
+            self.stats["expired"] += 1
+            self._remove(key)
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, key: Tuple[int, Optional[int]], user: User):
+        self._entries[key] = (time.monotonic() + self.ttl, user)
+        self._entries.move_to_end(key)
+        self._by_user.setdefault(key[0], set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.stats["evictions"] += 1
+
+    def _remove(self, key: Tuple[int, Optional[int]]):
+        self._entries.pop(key, None)
+        keys = self._by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[key[0]]
+
+    def invalidate_user(self, user_id: int):
+        """Buang semua token milik user ini dari cache"""
+        for key in self._by_user.pop(user_id, set()):
+            self._entries.pop(key, None)
+            self.stats["invalidations"] += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._by_user.clear()
+
+    def get_status(self) -> Dict:
+        status = dict(self.stats)
+        lookups = status["hits"] + status["misses"]
+        status.update({
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hit_rate": round(status["hits"] / lookups, 4) if lookups else None,
+            "miss_rate": round(status["misses"] / lookups, 4) if lookups else None,
+        })
+        return status
+
+
+principal_cache = PrincipalCache()
+
+def invalidate_user(user_id: int):
+    """Panggil setelah data user berubah supaya token lama di-resolve ulang"""
+    principal_cache.invalidate_user(user_id)
+
+async def resolve_principal(token: str, db: AsyncSession) -> User:
+    """User pemilik token (lewat principal_cache), 401 kalau token tidak valid"""
     payload = verify_token(token)
-    
-    if not payload:
+
+    if not payload or payload.get("user_id") is None:
         raise HTTPException(status_code=401, detail="Invalid token")
-    
-    user = db.query(User).filter(User.id == payload.get("user_id")).first()
+
+    # Key: subject + waktu terbit, token baru untuk user yang sama di-resolve ulang
+    key = (payload["user_id"], payload.get("iat"))
+    user = principal_cache.get(key)
+    if user is not None:
+        return user
+
+    user = await db.get(User, payload["user_id"])
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
-    
-    return user
\ No newline at end of file
+
+    # Lepas dari session request supaya aman dipakai ulang request lain
+    db.expunge(user)
+    principal_cache.put(key, user)
+    return user
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_db)
+) -> User:
+    """Dependency untuk mendapatkan user dari token"""
+    return await resolve_principal(credentials.credentials, db)
+
+async def get_optional_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    db: AsyncSession = Depends(get_db)
+) -> Optional[User]:
+    """Seperti get_current_user, tapi request tanpa token tetap lolos (None)"""
+    if credentials is None:
+        return None
+    return await resolve_principal(credentials.credentials, db)
+
+def authorize_user(principal: Optional[User], user_id: int):
+    """403 kalau request membawa token milik user lain"""
+    if principal is not None and principal.id != user_id:
+        raise HTTPException(status_code=403, detail="Token does not belong to this user")
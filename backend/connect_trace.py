@@ -0,0 +1,204 @@
+"""Breakdown waktu connect SSH per fase, disimpan per host.
+
+Satu ``ConnectTrace`` mencatat satu kali connect (create_connection atau
+fan-out). Setiap percobaan (Method 1, lalu Method 2 kalau Method 1 gagal
+negosiasi algoritma) punya fase sendiri:
+
+- ``dns``  : getaddrinfo
+- ``tcp``  : socket connect sampai established
+- ``kex``  : version exchange + key exchange pertama
+- ``auth`` : userauth sampai sukses
+- ``pty``  : buka session channel + alokasi PTY (saat websocket pertama attach)
+
+Waktu yang terbuang di Method 1 sebelum retry dicatat sebagai fase
+``retry``. Koneksi yang diambil dari pool tidak punya fase handshake,
+hanya ditandai ``reused``. Connect yang gagal diberi ``reason`` dari
+``classify_connect_error`` (auth, refused, timeout, ...).
+
+``ConnectDiagnostics`` menyimpan histogram per fase + beberapa trace
+terakhir per (host, port), dibatasi dengan LRU.
+"""
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Tuple
+
+from backend.metrics import CONNECT_BUCKETS, Histogram, observe_connect_error, observe_connect_phase
+from backend.ssh_connect import classify_connect_error
+
+# ==================== KONFIGURASI ====================
+CONNECT_DIAG_MAX_HOSTS = int(os.environ.get("WT_CONNECT_DIAG_MAX_HOSTS", "256"))
+CONNECT_DIAG_RECENT = int(os.environ.get("WT_CONNECT_DIAG_RECENT", "20"))
+
+CONNECT_PHASES = ("dns", "tcp", "kex", "auth", "retry", "pty", "total")
+_HANDSHAKE_PHASES = ("dns", "tcp", "kex", "auth")
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+class ConnectTrace:
+    """Timeline satu kali connect ke satu host"""
+
+    def __init__(self, host: str, port: int, username: str):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.started_at = time.time()
+        self.attempts: List[Dict] = []
+        self.phases: Dict[str, float] = {}
+        self.reused = False
+        self.ok: Optional[bool] = None
+        self.error: Optional[str] = None
+        # Alasan gagal hasil classify_connect_error (auth, refused, timeout, ...)
+        self.reason: Optional[str] = None
+        self._started = time.perf_counter()
+        self._last = self._started
+
+    # ==================== PERCOBAAN ====================
+    def begin_attempt(self, method: int):
+        self._last = time.perf_counter()
+        self.attempts.append({"method": method, "phases": {}, "error": None, "_started": self._last})
+
+    def mark(self, phase: str):
+        """Fase percobaan saat ini selesai (durasi = sejak mark sebelumnya)"""
+        now = time.perf_counter()
+        if self.attempts:
+            self.attempts[-1]["phases"][phase] = now - self._last
+        self._last = now
+
+    def fail_attempt(self, error: BaseException):
+        attempt = self.attempts[-1]
+        attempt["error"] = str(error) or type(error).__name__
+        attempt["reason"] = classify_connect_error(error)
+        attempt["elapsed"] = time.perf_counter() - attempt["_started"]
+        # Fase pertama yang belum sempat selesai = fase yang gagal
+        attempt["failed_phase"] = next(
+            (phase for phase in _HANDSHAKE_PHASES if phase not in attempt["phases"]), None
+        )
+
+    def finish(self, ok: bool, reused: bool = False, error: Optional[BaseException] = None):
+        self.ok = ok
+        self.reused = reused
+        if error is not None:
+            self.error = str(error) or type(error).__name__
+            self.reason = classify_connect_error(error)
+        self.phases["total"] = time.perf_counter() - self._started
+
+        # Fase dari percobaan yang berhasil, percobaan gagal jadi 'retry'
+        for attempt in self.attempts:
+            if attempt["error"] is None:
+                self.phases.update(attempt["phases"])
+            elif ok:
+                self.phases["retry"] = self.phases.get("retry", 0.0) + attempt["elapsed"]
+
+    def to_dict(self) -> Dict:
+        return {
+            "started_at": self.started_at,
+            "username": self.username,
+            "ok": self.ok,
+            "reused": self.reused,
+            "error": self.error,
+            "reason": self.reason,
+            "phases_ms": {phase: _ms(seconds) for phase, seconds in self.phases.items()},
+            "attempts": [
+                {
+                    "method": attempt["method"],
+                    "phases_ms": {p: _ms(s) for p, s in attempt["phases"].items()},
+                    "error": attempt["error"],
+                    "reason": attempt.get("reason"),
+                    "failed_phase": attempt.get("failed_phase"),
+                }
+                for attempt in self.attempts
+            ],
+        }
+
+
+class ConnectDiagnostics:
+    """(host, port) -> histogram per fase + trace terakhir"""
+
+    def __init__(self, max_hosts: int = CONNECT_DIAG_MAX_HOSTS, recent: int = CONNECT_DIAG_RECENT):
+        self.max_hosts = max_hosts
+        self.recent = recent
+        self._hosts: "OrderedDict[Tuple[str, int], Dict]" = OrderedDict()
+
+    def _entry(self, host: str, port: int) -> Dict:
+        key = (host, port)
+        entry = self._hosts.get(key)
+        if entry is None:
+            entry = self._hosts[key] = {
+                "histograms": {phase: Histogram(CONNECT_BUCKETS) for phase in CONNECT_PHASES},
+                "recent": deque(maxlen=self.recent),
+                "connects": 0,
+                "reused": 0,
+                "failures": 0,
+                "errors": {},
+                "retries": 0,
+            }
+            while len(self._hosts) > self.max_hosts:
+                self._hosts.popitem(last=False)
+        else:
+            self._hosts.move_to_end(key)
+        return entry
+
+    def _observe(self, entry: Dict, phase: str, seconds: float):
+        entry["histograms"][phase].observe(seconds)
+        observe_connect_phase(phase, seconds)
+
+    def record(self, trace: ConnectTrace):
+        """Simpan trace yang sudah finish()"""
+        entry = self._entry(trace.host, trace.port)
+        entry["recent"].append(trace)
+        entry["connects"] += 1
+        if trace.reused:
+            entry["reused"] += 1
+            return
+        if not trace.ok:
+            entry["failures"] += 1
+            reason = trace.reason or "other"
+            entry["errors"][reason] = entry["errors"].get(reason, 0) + 1
+            observe_connect_error(reason)
+        if len(trace.attempts) > 1:
+            entry["retries"] += 1
+        if trace.ok:
+            for phase, seconds in trace.phases.items():
+                self._observe(entry, phase, seconds)
+
+    def record_phase(self, trace: ConnectTrace, phase: str, seconds: float):
+        """Fase yang terjadi setelah connect selesai (misal pty saat attach)"""
+        trace.phases[phase] = seconds
+        entry = self._hosts.get((trace.host, trace.port))
+        if entry is not None:
+            self._observe(entry, phase, seconds)
+
+    def get_host(self, host: str, port: int) -> Optional[Dict]:
+        entry = self._hosts.get((host, port))
+        if entry is None:
+            return None
+
+        phases = {}
+        for phase, histogram in entry["histograms"].items():
+            if not histogram.count:
+                continue
+            phases[phase] = {
+                "count": histogram.count,
+                "mean_ms": _ms(histogram.sum / histogram.count),
+                # Batas atas bucket, bukan nilai persis (None = di atas bucket terbesar)
+                "p50_le_ms": _ms(histogram.quantile(0.5)),
+                "p99_le_ms": _ms(histogram.quantile(0.99)),
+            }
+        return {
+            "host": host,
+            "port": port,
+            "connects": entry["connects"],
+            "reused": entry["reused"],
+            "failures": entry["failures"],
+            "errors": dict(entry["errors"]),
+            "retries": entry["retries"],
+            "phases": phases,
+            "recent": [trace.to_dict() for trace in reversed(entry["recent"])],
+        }
+
+
+connect_diagnostics = ConnectDiagnostics()
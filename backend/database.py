@@ -1,16 +1,79 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import os
 
-DATABASE_URL = "sqlite:///./database.db"
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False}
+# aiosqlite: query jalan di thread milik koneksi, event loop tidak ikut terblokir
+DATABASE_URL = os.environ.get("WT_DATABASE_URL", "sqlite+aiosqlite:///./database.db")
+
+# ==================== POOL ====================
+# SQLite cuma boleh satu writer, tapi dengan WAL reader tidak menunggu writer.
+# Default aiosqlite adalah NullPool (buka file + thread baru setiap request),
+# pool kecil yang reusable jauh lebih murah.
+DB_POOL_SIZE = int(os.environ.get("WT_DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.environ.get("WT_DB_MAX_OVERFLOW", "10"))
+DB_BUSY_TIMEOUT_MS = int(os.environ.get("WT_DB_BUSY_TIMEOUT_MS", "5000"))
+
+engine = create_async_engine(
+    DATABASE_URL,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=30,
 )
 
-SessionLocal = sessionmaker(
-    autocommit=False,
+
+@event.listens_for(engine.sync_engine, "connect")
+def _set_sqlite_pragma(dbapi_connection, connection_record):
+    """PRAGMA per koneksi: WAL + fsync lebih jarang + tunggu lock, bukan langsung error"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
+# expire_on_commit=False: object tetap bisa dibaca setelah commit tanpa lazy load
+AsyncSessionLocal = async_sessionmaker(
+    engine,
+    class_=AsyncSession,
     autoflush=False,
-    bind=engine
+    expire_on_commit=False,
 )
 
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
+
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def init_db():
+    """Buat tabel yang belum ada (dipanggil saat startup)"""
+    # Import di sini supaya semua model terdaftar di Base.metadata
+    from backend import models  # noqa: F401
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_add_missing_columns)
+
+
+def _add_missing_columns(sync_conn):
+    """create_all tidak mengubah tabel lama: tambahkan kolom baru yang belum ada"""
+    inspector = inspect(sync_conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=sync_conn.dialect)
+            sync_conn.exec_driver_sql(
+                f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'
+            )
+
+
+async def dispose_db():
+    await engine.dispose()
@@ -0,0 +1,153 @@
+"""Tracing latency keystroke -> echo (opt-in per websocket).
+
+Client membuka websocket dengan ``?trace=1`` lalu mengirim input sebagai
+``{"type": "input", "data": "a", "seq": 7, "ts": <Date.now()>}``. Satu
+session hanya punya satu sampel in-flight, keystroke lain selama menunggu
+echo dikirim biasa tanpa di-trace.
+
+Timeline satu sampel::
+
+    ts       client mengirim input              (jam client, epoch ms)
+    recv     server menerima pesan
+    written  input selesai ditulis ke shell
+    output   byte output pertama setelah written
+    sent     frame yang berisi output itu terkirim ke websocket
+             -> server kirim {"type": "trace", "seq": 7, "server_ms": {...}}
+             <- client balas {"type": "trace", "seq": 7, "total_ms": ...}
+
+Segmen histogram:
+
+- ``client_to_server`` : recv - ts. Memakai jam client dan server, jadi
+  selisih jam ikut terhitung (di-clamp >= 0).
+- ``remote_echo``      : output - recv (antri + tulis ke shell + remote/PTY)
+- ``server_send``      : sent - output (coalescing di output pump + send)
+- ``server_to_client`` : total - client_to_server - remote_echo
+  (pump + jaringan balik + browser)
+- ``total``            : round trip yang diukur client dengan jamnya sendiri
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from backend.metrics import ECHO_BUCKETS, ECHO_SEGMENTS, Histogram, observe_echo
+
+# Sampel yang tidak menghasilkan output (misal prompt password) dianggap hilang
+ECHO_TRACE_TIMEOUT = float(os.environ.get("WT_ECHO_TRACE_TIMEOUT", "5"))
+# Sampel yang menunggu laporan total dari client
+_MAX_AWAITING_REPORT = 32
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+
+class EchoTracer:
+    """Timeline + histogram latency echo untuk satu TerminalSession"""
+
+    def __init__(self):
+        self.histograms: Dict[str, Histogram] = {
+            segment: Histogram(ECHO_BUCKETS) for segment in ECHO_SEGMENTS
+        }
+        self.pending: Optional[Dict] = None
+        self._awaiting_report: "OrderedDict[object, Dict]" = OrderedDict()
+        self.stats: Dict = {
+            "samples": 0,
+            "reports": 0,
+            "skipped": 0,
+            "expired": 0,
+            "last_ms": {},
+        }
+
+    def _observe(self, segment: str, seconds: float):
+        self.histograms[segment].observe(seconds)
+        observe_echo(segment, seconds)
+        self.stats["last_ms"][segment] = _ms(seconds)
+
+    # ==================== HOOK ====================
+    def on_input(self, message: Dict) -> bool:
+        """Pesan input dari client, True kalau pesan ini mulai di-trace"""
+        seq = message.get("seq")
+        if not isinstance(seq, (int, str)):
+            return False
+
+        now = time.perf_counter()
+        if self.pending is not None:
+            if now - self.pending["recv"] < ECHO_TRACE_TIMEOUT:
+                self.stats["skipped"] += 1
+                return False
+            self.stats["expired"] += 1
+
+        ts = message.get("ts")
+        self.pending = {
+            "seq": seq,
+            "ts": ts if isinstance(ts, (int, float)) else None,
+            "recv_epoch_ms": time.time() * 1000,
+            "recv": now,
+            "written": None,
+            "output": None,
+        }
+        return True
+
+    def on_written(self):
+        if self.pending is not None:
+            self.pending["written"] = time.perf_counter()
+
+    def on_output(self):
+        """Dipanggil reader untuk setiap chunk output (cek murah)"""
+        pending = self.pending
+        if pending is not None and pending["written"] is not None and pending["output"] is None:
+            pending["output"] = time.perf_counter()
+
+    def on_flush(self, flush_started: float) -> Optional[Dict]:
+        """Frame terkirim, return isi pesan 'trace' kalau frame ini memuat echo"""
+        pending = self.pending
+        if pending is None or pending["output"] is None or pending["output"] > flush_started:
+            # Output datang saat frame sebelumnya sedang dikirim, tunggu flush berikutnya
+            return None
+
+        self.pending = None
+        pending["sent"] = time.perf_counter()
+        remote_echo = pending["output"] - pending["recv"]
+        server_send = pending["sent"] - pending["output"]
+        self.stats["samples"] += 1
+        self._observe("remote_echo", remote_echo)
+        self._observe("server_send", server_send)
+
+        self._awaiting_report[pending["seq"]] = pending
+        while len(self._awaiting_report) > _MAX_AWAITING_REPORT:
+            self._awaiting_report.popitem(last=False)
+
+        return {
+            "seq": pending["seq"],
+            "server_ms": {
+                "queue": _ms(pending["written"] - pending["recv"]),
+                "remote_echo": _ms(remote_echo),
+                "send": _ms(server_send),
+            },
+        }
+
+    def on_report(self, message: Dict):
+        """Client melaporkan total round trip untuk seq yang sudah di-echo"""
+        seq = message.get("seq")
+        if not isinstance(seq, (int, str)):
+            return
+        sample = self._awaiting_report.pop(seq, None)
+        total_ms = message.get("total_ms")
+        if sample is None or not isinstance(total_ms, (int, float)) or total_ms < 0:
+            return
+
+        self.stats["reports"] += 1
+        total = total_ms / 1000
+        remote_echo = sample["output"] - sample["recv"]
+        client_to_server = 0.0
+        if sample["ts"] is not None:
+            client_to_server = max(0.0, (sample["recv_epoch_ms"] - sample["ts"]) / 1000)
+            self._observe("client_to_server", client_to_server)
+        self._observe("server_to_client", max(0.0, total - client_to_server - remote_echo))
+        self._observe("total", total)
+
+    def reset(self):
+        """Websocket lepas: sampel yang sedang berjalan tidak akan selesai"""
+        self.pending = None
+        self._awaiting_report.clear()
@@ -0,0 +1,97 @@
+"""Eksekusi satu command di banyak host sekaligus.
+
+Setiap host dijalankan sebagai task terpisah dengan batas concurrency
+(semaphore) dan timeout per host. Koneksi diambil dari pool SSHManager,
+jadi host yang sedang terbuka di tab lain tidak perlu handshake ulang.
+Hasil di-yield begitu satu host selesai (urutan selesai, bukan urutan
+input), cocok untuk di-stream sebagai NDJSON.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import AsyncIterator, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# ==================== KONFIGURASI ====================
+FANOUT_CONCURRENCY = int(os.environ.get("WT_FANOUT_CONCURRENCY", "50"))
+FANOUT_MAX_CONCURRENCY = int(os.environ.get("WT_FANOUT_MAX_CONCURRENCY", "200"))
+FANOUT_TIMEOUT = float(os.environ.get("WT_FANOUT_TIMEOUT", "30"))
+# Output per host (stdout+stderr) dipotong saat dibaca dan channel-nya ditutup,
+# supaya 300 host x log besar tidak menghabiskan memori
+FANOUT_MAX_OUTPUT = int(os.environ.get("WT_FANOUT_MAX_OUTPUT", str(64 * 1024)))
+
+
+async def _run_on_host(ssh_manager, target: Dict, command: str,
+                       timeout: float, semaphore: asyncio.Semaphore) -> Dict:
+    result = {
+        "type": "result",
+        "host_id": target.get("id"),
+        "host": target["host"],
+        "port": target["port"],
+        "username": target["username"],
+    }
+    async with semaphore:
+        started = time.perf_counter()
+        try:
+            completed, reused = await asyncio.wait_for(
+                ssh_manager.run_pooled_command(
+                    target["host"], target["port"], target["username"],
+                    target["password"], command, target.get("transport"),
+                    max_bytes=FANOUT_MAX_OUTPUT
+                ),
+                timeout
+            )
+            exit_status = completed["exit_status"]
+            result.update({
+                # Output terpotong = channel kita tutup sendiri, exit status
+                # tidak pernah datang dan itu bukan kegagalan host
+                "ok": exit_status == 0 or (completed["truncated"] and exit_status is None),
+                "exit_status": exit_status,
+                "stdout": completed["stdout"],
+                "stderr": completed["stderr"],
+                "truncated": completed["truncated"],
+                "pooled": reused,
+            })
+        except asyncio.TimeoutError:
+            result.update({"ok": False, "exit_status": None, "error": f"Timeout after {timeout}s"})
+        except Exception as e:
+            logger.warning(f"Fan-out on {target['host']}:{target['port']} failed: {e}")
+            result.update({"ok": False, "exit_status": None, "error": str(e) or type(e).__name__})
+        result["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+async def fan_out(ssh_manager, targets: List[Dict], command: str,
+                  concurrency: int = FANOUT_CONCURRENCY,
+                  timeout: float = FANOUT_TIMEOUT) -> AsyncIterator[Dict]:
+    """Jalankan command di semua target, yield event start/result/done"""
+    concurrency = max(1, min(concurrency, FANOUT_MAX_CONCURRENCY))
+    semaphore = asyncio.Semaphore(concurrency)
+    started = time.perf_counter()
+
+    yield {"type": "start", "hosts": len(targets), "concurrency": concurrency, "timeout": timeout}
+
+    tasks = [
+        asyncio.create_task(_run_on_host(ssh_manager, target, command, timeout, semaphore))
+        for target in targets
+    ]
+    succeeded = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            succeeded += result["ok"]
+            yield result
+    finally:
+        # Client putus di tengah jalan: batalkan host yang belum selesai
+        for task in tasks:
+            task.cancel()
+
+    yield {
+        "type": "done",
+        "hosts": len(targets),
+        "succeeded": succeeded,
+        "failed": len(targets) - succeeded,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
@@ -1,15 +1,18 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Depends
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, field_validator
 from typing import Optional
 import asyncio
+import codecs
 import json
-import uuid
 import logging
 from backend.ssh_manager import ssh_manager
+from backend.terminal_protocol import (
+    TerminalChannel, negotiate_compression, negotiate_protocol, negotiate_trace
+)
 from pydantic import BaseModel
 from typing import List
-import bcrypt
 
 class HostResponse(BaseModel):
     id: int
@@ -17,21 +20,48 @@ class HostResponse(BaseModel):
     port: int
     username: str
     password: str
+    transport_profile: Optional[str] = None
+    transport_options: Optional[dict] = None
+
+    @field_validator("transport_options", mode="before")
+    @classmethod
+    def _parse_transport_options(cls, value):
+        # Disimpan sebagai JSON text di SQLite
+        return json.loads(value) if isinstance(value, str) and value else None
 
     class Config:
         from_attributes = True
 
 # ================= DATABASE IMPORTS =================
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey
-from sqlalchemy.orm import sessionmaker, declarative_base, relationship, Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from passlib.context import CryptContext
+from backend.database import dispose_db, get_db, init_db
+from backend.models import User, SSHHost
 
 # ================= QUICK COMMAND IMPORTS =================
 from backend.models import QuickCommand  # IMPORT INI
 from backend.schemas import (
     QuickCommandCreate, 
     QuickCommandUpdate, 
-    QuickCommandResponse
+    QuickCommandResponse,
+    ExecStreamRequest,
+    FanoutRequest,
+    TransportProfileUpdate
+)
+from backend.fanout import FANOUT_CONCURRENCY, FANOUT_TIMEOUT, fan_out
+from backend.user_cache import cached_response, user_cache
+from backend.password_hasher import PasswordHasherBusy, password_hasher
+from backend.auth import (
+    authorize_user, create_access_token, get_optional_user, invalidate_user, principal_cache
+)
+from backend import metrics
+from backend.sharding import new_session_id, request_other_shards
+from backend.prewarm import Prewarmer
+from backend.ssh_connect import algorithm_cache, dns_cache
+from backend.session_recorder import get_recording, list_recordings, replay
+from backend.transport_profile import (
+    TRANSPORT_PRESETS, host_transport, resolve_transport, supported_algorithms
 )
 
 
@@ -40,6 +70,7 @@ logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 app = FastAPI(title="XShell Clone API")
+prewarmer = Prewarmer(ssh_manager)
 
 # ================= CORS =================
 app.add_middleware(
@@ -51,70 +82,24 @@ app.add_middleware(
 )
 
 # ================= DATABASE SETUP =================
-
-DATABASE_URL = "sqlite:///./database.db"
-
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False}
-)
-
-SessionLocal = sessionmaker(
-    autocommit=False,
-    autoflush=False,
-    bind=engine
-)
-
-Base = declarative_base()
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Engine async + WAL ada di backend/database.py, model di backend/models.py
+
+@app.on_event("startup")
+async def startup():
+    await init_db()
+    metrics.loop_lag.start()
+    prewarmer.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    # Koneksi aiosqlite punya thread sendiri, tutup supaya proses bisa exit
+    metrics.loop_lag.stop()
+    prewarmer.stop()
+    await dispose_db()
+    password_hasher.shutdown()
 
 # pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-# Ganti fungsi hash_password dan verify_password
-def hash_password(password: str) -> str:
-    """Hash password dengan bcrypt langsung"""
-    salt = bcrypt.gensalt()
-    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verifikasi password dengan bcrypt langsung"""
-    return bcrypt.checkpw(
-        plain_password.encode('utf-8'), 
-        hashed_password.encode('utf-8')
-    )
-
-# ================= DATABASE MODELS =================
-
-class User(Base):
-    __tablename__ = "users"
-
-    id = Column(Integer, primary_key=True, index=True)
-    username = Column(String, unique=True, index=True)
-    password_hash = Column(String)
-
-    ssh_hosts = relationship("SSHHost", back_populates="owner")
-
-
-class SSHHost(Base):
-    __tablename__ = "ssh_hosts"
-
-    id = Column(Integer, primary_key=True, index=True)
-    host = Column(String)
-    port = Column(Integer, default=22)
-    username = Column(String)
-    password = Column(String)  # plaintext (dev mode)
-
-    user_id = Column(Integer, ForeignKey("users.id"))
-    owner = relationship("User", back_populates="ssh_hosts")
-
-# Create tables automatically
-Base.metadata.create_all(bind=engine)
+# Hash/verify password jalan di worker pool bcrypt (backend/password_hasher.py)
 
 # ================= EXISTING MODELS =================
 
@@ -131,115 +116,286 @@ class SSHCommand(BaseModel):
 # ================= AUTH ENDPOINTS =================
 
 @app.post("/api/register")
-def register(username: str, password: str, db: Session = Depends(get_db)):
-    existing = db.query(User).filter(User.username == username).first()
+async def register(username: str, password: str, db: AsyncSession = Depends(get_db)):
+    existing = await db.scalar(select(User).where(User.username == username))
     if existing:
         raise HTTPException(status_code=400, detail="User already exists")
 
+    try:
+        password_hash = await password_hasher.hash(password)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Server busy, try again", headers={"Retry-After": "1"})
+
     user = User(
         username=username,
-        password_hash=hash_password(password)
+        password_hash=password_hash
     )
 
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    # SQLite bisa memakai ulang id user yang sudah dihapus
+    await invalidate_user_everywhere(user.id)
 
     return {"message": "User created"}
 
 
 @app.post("/api/login")
-def login(username: str, password: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == username).first()
+async def login(username: str, password: str, db: AsyncSession = Depends(get_db)):
+    user = await db.scalar(select(User).where(User.username == username))
+    # Lepas koneksi DB selama bcrypt berjalan / antri
+    await db.close()
+
+    try:
+        valid = bool(user) and await password_hasher.verify(password, user.password_hash)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Server busy, try again", headers={"Retry-After": "1"})
 
-    if not user or not verify_password(password, user.password_hash):
+    if not valid:
         raise HTTPException(status_code=400, detail="Invalid credentials")
 
+    if user.prewarm:
+        prewarmer.on_login(user.id)
+
     return {
         "message": "Login success",
-        "user_id": user.id
+        "user_id": user.id,
+        # Opsional untuk client: Authorization: Bearer <token> di request berikutnya
+        "access_token": create_access_token({"user_id": user.id}),
+        "token_type": "bearer"
     }
 
 # ================= SSH HOST STORAGE =================
 
 @app.post("/api/hosts")
-def add_host(
+async def add_host(
     user_id: int,
     host: str,
     port: int,
     username: str,
     password: str,
-    db: Session = Depends(get_db)
+    transport_profile: str = "default",
+    principal: Optional[User] = Depends(get_optional_user),
+    db: AsyncSession = Depends(get_db)
 ):
+    authorize_user(principal, user_id)
+    if transport_profile not in TRANSPORT_PRESETS:
+        raise HTTPException(status_code=400, detail=f"Unknown transport profile '{transport_profile}'")
+
     new_host = SSHHost(
         host=host,
         port=port,
         username=username,
         password=password,
+        transport_profile=transport_profile,
         user_id=user_id
     )
 
     db.add(new_host)
-    db.commit()
-    db.refresh(new_host)
+    await db.commit()
+    user_cache.record_change("hosts", user_id, new_host.id, _host_row(new_host))
 
     return {"message": "Host saved"}
 
 
+def _host_row(host: SSHHost) -> dict:
+    return HostResponse.model_validate(host).model_dump()
+
+
+async def _load_hosts(db: AsyncSession, user_id: int):
+    hosts = (await db.scalars(select(SSHHost).where(SSHHost.user_id == user_id))).all()
+    return [_host_row(host) for host in hosts]
+
+
 @app.get("/api/hosts/{user_id}", response_model=List[HostResponse])
-def get_hosts(user_id: int, db: Session = Depends(get_db)):
-    hosts = db.query(SSHHost).filter(SSHHost.user_id == user_id).all()
-    return hosts
+async def get_hosts(user_id: int, request: Request,
+                    principal: Optional[User] = Depends(get_optional_user),
+                    db: AsyncSession = Depends(get_db)):
+    authorize_user(principal, user_id)
+    rows, version = await user_cache.get_rows("hosts", user_id, lambda: _load_hosts(db, user_id))
+    return cached_response(request, rows, version)
+
+
+@app.get("/api/hosts/{user_id}/changes")
+async def get_host_changes(user_id: int, since: Optional[str] = None,
+                           principal: Optional[User] = Depends(get_optional_user),
+                           db: AsyncSession = Depends(get_db)):
+    """Delta sync: hanya host yang berubah sejak versi ``since``"""
+    authorize_user(principal, user_id)
+    return await _changes("hosts", user_id, since, lambda: _load_hosts(db, user_id))
+
+
+async def _changes(kind: str, user_id: int, since: Optional[str], loader):
+    delta = user_cache.delta(kind, user_id, since)
+    if delta is not None:
+        return delta
+    # Versi tidak dikenal (evicted / restart / terlalu lama): kirim semua
+    rows, version = await user_cache.get_rows(kind, user_id, loader)
+    return {"version": user_cache.token(version), "full": True, "upserted": rows, "deleted": []}
 
 
 @app.post("/api/connect-saved/{host_id}")
-async def connect_saved_host(host_id: int, db: Session = Depends(get_db)):
-    host = db.query(SSHHost).filter(SSHHost.id == host_id).first()
+async def connect_saved_host(host_id: int,
+                             principal: Optional[User] = Depends(get_optional_user),
+                             db: AsyncSession = Depends(get_db)):
+    host = await db.get(SSHHost, host_id)
 
     if not host:
         raise HTTPException(status_code=404, detail="Host not found")
+    authorize_user(principal, host.user_id)
+
+    transport = host_transport(host)
+    owner_id = host.user_id
+    host.connect_count = (host.connect_count or 0) + 1
+    await db.commit()
+    # Kembalikan koneksi DB ke pool sebelum handshake SSH yang bisa lama
+    await db.close()
 
-    session_id = str(uuid.uuid4())
+    session_id = new_session_id()
 
     success = await ssh_manager.create_connection(
         session_id=session_id,
         host=host.host,
         port=host.port,
         username=host.username,
-        password=host.password
+        password=host.password,
+        transport=transport
     )
 
     if not success:
         raise HTTPException(status_code=400, detail="Connection failed")
+    ssh_manager.sessions[session_id]['owner'] = owner_id
+    prewarmer.record_connect(ssh_manager.sessions[session_id]['warm'])
 
     return {
         "session_id": session_id,
         "status": "connected"
     }
 
+# ================= MULTI-HOST EXEC =================
+
+@app.post("/api/exec/stream/{session_id}")
+async def exec_stream(session_id: str, request: ExecStreamRequest):
+    """Jalankan command di session SSH, output di-stream bertahap (NDJSON)
+
+    Session id di path (bukan body) supaya front sharded bisa me-route ke
+    shard pemilik session tanpa membaca body.
+    """
+    if session_id not in ssh_manager.connections:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    async def stream():
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        try:
+            async for event in ssh_manager.stream_command(
+                session_id, request.command,
+                max_bytes=request.max_bytes, max_lines=request.max_lines
+            ):
+                if event["type"] == "output":
+                    text = decoder.decode(event["data"])
+                    if text:
+                        yield json.dumps({"type": "output", "data": text}) + "\n"
+                else:
+                    tail = decoder.decode(b"", final=True)
+                    if tail:
+                        yield json.dumps({"type": "output", "data": tail}) + "\n"
+                    yield json.dumps(event) + "\n"
+        except Exception as e:
+            logger.error(f"Streaming exec failed: {e}")
+            yield json.dumps({"type": "error", "data": str(e)}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@app.post("/api/exec/fanout")
+async def exec_fanout(request: FanoutRequest,
+                      principal: Optional[User] = Depends(get_optional_user),
+                      db: AsyncSession = Depends(get_db)):
+    """Jalankan command di banyak saved host, hasil di-stream per host (NDJSON)"""
+    authorize_user(principal, request.user_id)
+    query = select(SSHHost).where(SSHHost.user_id == request.user_id)
+    if request.host_ids is not None:
+        query = query.where(SSHHost.id.in_(request.host_ids))
+
+    # Salin ke dict biasa, session DB sudah selesai saat streaming berjalan
+    targets = [
+        {
+            "id": host.id,
+            "host": host.host,
+            "port": host.port,
+            "username": host.username,
+            "password": host.password,
+            "transport": host_transport(host),
+        }
+        for host in (await db.scalars(query)).all()
+    ]
+    if not targets:
+        raise HTTPException(status_code=404, detail="No hosts found")
+    # Dependency baru ditutup setelah stream selesai, lepas koneksinya sekarang
+    await db.close()
+
+    async def stream():
+        async for event in fan_out(
+            ssh_manager, targets, request.command,
+            concurrency=request.concurrency or FANOUT_CONCURRENCY,
+            timeout=request.timeout or FANOUT_TIMEOUT,
+        ):
+            yield json.dumps(event) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 # ================= QUICK COMMAND ENDPOINTS =================
 
 @app.get("/api/quick-commands/{user_id}", response_model=List[QuickCommandResponse])
 async def get_quick_commands(
     user_id: int,
-    db: Session = Depends(get_db)
+    request: Request,
+    principal: Optional[User] = Depends(get_optional_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Get all quick commands for user (including defaults)"""
+    authorize_user(principal, user_id)
+    rows, version = await user_cache.get_rows(
+        "quick_commands", user_id, lambda: _load_quick_commands(db, user_id)
+    )
+    return cached_response(request, rows, version)
+
+
+@app.get("/api/quick-commands/{user_id}/changes")
+async def get_quick_command_changes(
+    user_id: int,
+    since: Optional[str] = None,
+    principal: Optional[User] = Depends(get_optional_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Delta sync: hanya command yang berubah sejak versi ``since``"""
+    authorize_user(principal, user_id)
+    return await _changes(
+        "quick_commands", user_id, since, lambda: _load_quick_commands(db, user_id)
+    )
+
+
+def _quick_command_row(command: QuickCommand) -> dict:
+    return QuickCommandResponse.model_validate(command).model_dump()
+
+
+async def _load_quick_commands(db: AsyncSession, user_id: int):
     # Ambil command default (is_default=True) + command milik user
-    commands = db.query(QuickCommand).filter(
-        (QuickCommand.user_id == user_id) | (QuickCommand.is_default == True)
-    ).order_by(QuickCommand.sort_order).all()
-    
-    return commands
+    commands = (await db.scalars(
+        select(QuickCommand).where(
+            (QuickCommand.user_id == user_id) | (QuickCommand.is_default == True)
+        ).order_by(QuickCommand.sort_order)
+    )).all()
+    return [_quick_command_row(command) for command in commands]
 
 
 @app.post("/api/quick-commands", response_model=QuickCommandResponse)
 async def add_quick_command(
     user_id: int,
     command: QuickCommandCreate,
-    db: Session = Depends(get_db)
+    principal: Optional[User] = Depends(get_optional_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Add custom quick command"""
+    authorize_user(principal, user_id)
     new_command = QuickCommand(
         user_id=user_id,
         name=command.name,
@@ -250,8 +406,8 @@ async def add_quick_command(
     )
     
     db.add(new_command)
-    db.commit()
-    db.refresh(new_command)
+    await db.commit()
+    user_cache.record_change("quick_commands", user_id, new_command.id, _quick_command_row(new_command))
     
     return new_command
 
@@ -261,14 +417,16 @@ async def update_quick_command(
     command_id: int,
     command: QuickCommandUpdate,
     user_id: int,
-    db: Session = Depends(get_db)
+    principal: Optional[User] = Depends(get_optional_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Update custom quick command"""
-    db_command = db.query(QuickCommand).filter(
+    authorize_user(principal, user_id)
+    db_command = await db.scalar(select(QuickCommand).where(
         QuickCommand.id == command_id,
         QuickCommand.user_id == user_id,
         QuickCommand.is_default == False  # Tidak bisa update default command
-    ).first()
+    ))
     
     if not db_command:
         raise HTTPException(status_code=404, detail="Command not found")
@@ -278,8 +436,8 @@ async def update_quick_command(
     db_command.category = command.category
     db_command.sort_order = command.sort_order
     
-    db.commit()
-    db.refresh(db_command)
+    await db.commit()
+    user_cache.record_change("quick_commands", user_id, db_command.id, _quick_command_row(db_command))
     
     return db_command
 
@@ -288,26 +446,29 @@ async def update_quick_command(
 async def delete_quick_command(
     command_id: int,
     user_id: int,
-    db: Session = Depends(get_db)
+    principal: Optional[User] = Depends(get_optional_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete custom quick command"""
-    db_command = db.query(QuickCommand).filter(
+    authorize_user(principal, user_id)
+    db_command = await db.scalar(select(QuickCommand).where(
         QuickCommand.id == command_id,
         QuickCommand.user_id == user_id,
         QuickCommand.is_default == False
-    ).first()
+    ))
     
     if not db_command:
         raise HTTPException(status_code=404, detail="Command not found")
     
-    db.delete(db_command)
-    db.commit()
+    await db.delete(db_command)
+    await db.commit()
+    user_cache.record_change("quick_commands", user_id, command_id)
     
     return {"message": "Command deleted"}
 
 
 @app.post("/api/quick-commands/seed-defaults")
-async def seed_default_commands(db: Session = Depends(get_db)):
+async def seed_default_commands(db: AsyncSession = Depends(get_db)):
     """Seed default quick commands (untuk inisialisasi)"""
     default_commands = [
         {"name": "ls -la", "command": "ls -la", "category": "file", "sort_order": 1},
@@ -323,10 +484,10 @@ async def seed_default_commands(db: Session = Depends(get_db)):
     ]
     
     for cmd in default_commands:
-        exists = db.query(QuickCommand).filter(
+        exists = await db.scalar(select(QuickCommand).where(
             QuickCommand.name == cmd["name"],
             QuickCommand.is_default == True
-        ).first()
+        ))
         
         if not exists:
             db_command = QuickCommand(
@@ -339,23 +500,27 @@ async def seed_default_commands(db: Session = Depends(get_db)):
             )
             db.add(db_command)
     
-    db.commit()
+    await db.commit()
+    # Default command terlihat oleh semua user
+    user_cache.invalidate_kind("quick_commands")
     return {"message": "Default commands seeded"}
 
 @app.put("/api/hosts/{host_id}")
-def update_host(
+async def update_host(
     host_id: int,
     user_id: int,
     host: str,
     port: int,
     username: str,
     password: str,
-    db: Session = Depends(get_db)
+    principal: Optional[User] = Depends(get_optional_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    db_host = db.query(SSHHost).filter(
+    authorize_user(principal, user_id)
+    db_host = await db.scalar(select(SSHHost).where(
         SSHHost.id == host_id,
         SSHHost.user_id == user_id
-    ).first()
+    ))
     
     if not db_host:
         raise HTTPException(status_code=404, detail="Host not found")
@@ -365,38 +530,115 @@ def update_host(
     db_host.username = username
     db_host.password = password
     
-    db.commit()
-    db.refresh(db_host)
+    await db.commit()
+    user_cache.record_change("hosts", user_id, db_host.id, _host_row(db_host))
     
     return {"message": "Host updated successfully"}
 
+# ================= PREWARM =================
+
+@app.put("/api/users/{user_id}/prewarm")
+async def set_user_prewarm(user_id: int, enabled: bool,
+                           principal: Optional[User] = Depends(get_optional_user),
+                           db: AsyncSession = Depends(get_db)):
+    """Opt-in/opt-out prewarm koneksi ke host favorit saat login"""
+    authorize_user(principal, user_id)
+    user = await db.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    user.prewarm = enabled
+    await db.commit()
+    await invalidate_user_everywhere(user_id)
+    if enabled:
+        prewarmer.on_login(user_id)
+
+    return {"message": "Prewarm updated", "prewarm": enabled}
+
+@app.post("/api/prewarm/{user_id}")
+async def prewarm_user(user_id: int, local: bool = False,
+                       principal: Optional[User] = Depends(get_optional_user)):
+    """Prewarm sekarang (tanpa cek opt-in), local=true hanya shard ini"""
+    authorize_user(principal, user_id)
+    summary = await prewarmer.warm_user(user_id)
+    if not local:
+        for result in await request_other_shards("POST", f"/api/prewarm/{user_id}?local=true"):
+            if not isinstance(result, BaseException) and result[0] == 200:
+                for name, count in json.loads(result[2]).items():
+                    summary[name] = summary.get(name, 0) + count
+    return summary
+
+@app.get("/api/prewarm")
+async def get_prewarm_status():
+    """Konfigurasi, hit rate dan pemborosan warm pool (mode sharded: per shard)"""
+    return prewarmer.get_status()
+
+@app.get("/api/transport-profiles")
+async def get_transport_profiles():
+    """Preset profil transport SSH + algoritma yang didukung"""
+    return {"presets": TRANSPORT_PRESETS, "algorithms": supported_algorithms()}
+
+@app.put("/api/hosts/{host_id}/transport")
+async def update_host_transport(
+    host_id: int,
+    user_id: int,
+    update: TransportProfileUpdate,
+    principal: Optional[User] = Depends(get_optional_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Ganti profil transport host, berlaku untuk koneksi berikutnya"""
+    authorize_user(principal, user_id)
+    try:
+        transport = resolve_transport(update.profile, update.options)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    db_host = await db.scalar(select(SSHHost).where(
+        SSHHost.id == host_id,
+        SSHHost.user_id == user_id
+    ))
+    if not db_host:
+        raise HTTPException(status_code=404, detail="Host not found")
+
+    db_host.transport_profile = update.profile
+    db_host.transport_options = json.dumps(update.options) if update.options else None
+
+    await db.commit()
+    user_cache.record_change("hosts", user_id, db_host.id, _host_row(db_host))
+
+    return {"message": "Transport profile updated", "transport": transport}
+
 @app.delete("/api/hosts/{host_id}")
-def delete_host(
+async def delete_host(
     host_id: int,
     user_id: int,
-    db: Session = Depends(get_db)
+    principal: Optional[User] = Depends(get_optional_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    db_host = db.query(SSHHost).filter(
+    authorize_user(principal, user_id)
+    db_host = await db.scalar(select(SSHHost).where(
         SSHHost.id == host_id,
         SSHHost.user_id == user_id
-    ).first()
+    ))
     
     if not db_host:
         raise HTTPException(status_code=404, detail="Host not found")
     
-    db.delete(db_host)
-    db.commit()
+    await db.delete(db_host)
+    await db.commit()
+    user_cache.record_change("hosts", user_id, host_id)
     
     return {"message": "Host deleted successfully"}
 
 @app.post("/api/connect-local")
-async def connect_local():
+async def connect_local(principal: Optional[User] = Depends(get_optional_user)):
     """Connect ke terminal lokal"""
-    session_id = str(uuid.uuid4())
+    session_id = new_session_id()
     
     success = await ssh_manager.create_local_shell(session_id)
     
     if success:
+        ssh_manager.sessions[session_id]['owner'] = principal.id if principal else None
         return {
             "session_id": session_id,
             "status": "connected",
@@ -416,8 +658,9 @@ async def root():
     return {"message": "XShell Clone API is running"}
 
 @app.post("/api/connect")
-async def connect_ssh(connection: SSHConnection):
-    session_id = str(uuid.uuid4())
+async def connect_ssh(connection: SSHConnection,
+                      principal: Optional[User] = Depends(get_optional_user)):
+    session_id = new_session_id()
     
     success = await ssh_manager.create_connection(
         session_id=session_id,
@@ -428,6 +671,7 @@ async def connect_ssh(connection: SSHConnection):
     )
     
     if success:
+        ssh_manager.sessions[session_id]['owner'] = principal.id if principal else None
         return {
             "session_id": session_id,
             "status": "connected",
@@ -445,101 +689,166 @@ async def disconnect_ssh(session_id: str):
 async def get_sessions():
     return ssh_manager.get_all_sessions()
 
+@app.get("/api/ssh-pool")
+async def get_ssh_pool():
+    return ssh_manager.get_pool_status()
+
+@app.get("/api/session-reaper")
+async def get_session_reaper():
+    return ssh_manager.get_reaper_status()
+
+@app.get("/api/password-hasher")
+async def get_password_hasher():
+    return password_hasher.get_status()
+
+@app.get("/api/auth-cache")
+async def get_auth_cache():
+    return principal_cache.get_status()
+
+async def invalidate_user_everywhere(user_id: int):
+    """invalidate_user di shard ini dan semua shard lain (mode sharded)
+
+    Tiap shard punya principal_cache sendiri; tanpa broadcast shard lain
+    tetap melayani principal lama sampai TTL habis. Ditunggu sampai semua
+    shard menjawab, jadi setelah endpoint return tidak ada shard yang stale.
+    """
+    invalidate_user(user_id)
+    for result in await request_other_shards("POST", f"/api/auth-cache/invalidate/{user_id}?local=true"):
+        if isinstance(result, BaseException) or result[0] != 200:
+            # Shard yang gagal dihubungi tetap dibatasi AUTH_CACHE_TTL
+            logger.warning(f"⚠️ Auth cache invalidation for user {user_id} failed on a shard: {result}")
+
+@app.post("/api/auth-cache/invalidate/{user_id}")
+async def invalidate_auth_cache(user_id: int, local: bool = False):
+    """Buang principal user dari cache, local=true hanya shard ini"""
+    if local:
+        invalidate_user(user_id)
+    else:
+        await invalidate_user_everywhere(user_id)
+    return {"message": "Auth cache invalidated"}
+
+@app.get("/api/connect-cache")
+async def get_connect_cache():
+    """DNS cache + cache algoritma per host dari pipeline connect"""
+    return {"dns": dns_cache.get_status(), "algorithms": algorithm_cache.get_status()}
+
+@app.get("/api/diagnostics/connect/{host_id}")
+async def get_connect_diagnostics(host_id: int,
+                                  principal: Optional[User] = Depends(get_optional_user),
+                                  db: AsyncSession = Depends(get_db)):
+    """Breakdown fase connect (dns/tcp/kex/auth/pty) untuk saved host"""
+    host = await db.get(SSHHost, host_id)
+    if not host:
+        raise HTTPException(status_code=404, detail="Host not found")
+    authorize_user(principal, host.user_id)
+
+    diagnostics = ssh_manager.get_connect_diagnostics(host.host, host.port)
+    if diagnostics is None:
+        return {"host": host.host, "port": host.port, "connects": 0, "phases": {}, "recent": []}
+    return diagnostics
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(
+        metrics.render_metrics(
+            ssh_manager, len(getattr(terminal_websocket, "active_connections", {}))
+        ),
+        media_type="text/plain; version=0.0.4",
+    )
+
+def _owned_recording(session_id: str, user_id: int) -> dict:
+    """Rekaman milik user_id; rekaman user lain / tanpa owner dianggap tidak ada"""
+    recording = get_recording(session_id)
+    if recording is None or recording.get("info", {}).get("owner") != user_id:
+        raise HTTPException(status_code=404, detail="Recording not found")
+    return recording
+
+@app.get("/api/recordings")
+async def get_recordings(user_id: int, principal: Optional[User] = Depends(get_optional_user)):
+    authorize_user(principal, user_id)
+    return [
+        recording for recording in list_recordings()
+        if recording.get("info", {}).get("owner") == user_id
+    ]
+
+@app.get("/api/recordings/{session_id}")
+async def get_recording_info(session_id: str, user_id: int,
+                             principal: Optional[User] = Depends(get_optional_user)):
+    authorize_user(principal, user_id)
+    return _owned_recording(session_id, user_id)
+
+@app.get("/api/recordings/{session_id}/replay")
+async def replay_recording(session_id: str, user_id: int, start: float = 0.0, speed: float = 1.0,
+                           include_input: bool = False,
+                           principal: Optional[User] = Depends(get_optional_user)):
+    """Stream rekaman (asciicast v2) real time atau dipercepat, seek ke detik start"""
+    authorize_user(principal, user_id)
+    if start < 0 or speed < 0:
+        raise HTTPException(status_code=400, detail="start and speed must be >= 0")
+    _owned_recording(session_id, user_id)
+
+    return StreamingResponse(
+        replay(session_id, start=start, speed=speed, include_input=include_input),
+        media_type="application/x-asciicast",
+    )
+
 @app.get("/api/session/{session_id}")
 async def get_session(session_id: str):
     return ssh_manager.get_session_status(session_id)
 
 @app.websocket("/ws/terminal/{session_id}")
 async def terminal_websocket(websocket: WebSocket, session_id: str):
+    # Client yang reconnect membawa ?resume=<token>&offset=<n>
+    resume_token = websocket.query_params.get("resume")
+    try:
+        offset = int(websocket.query_params["offset"])
+    except (KeyError, ValueError):
+        offset = None
+    resuming = ssh_manager.can_resume(session_id, resume_token)
+
+    # Inisialisasi dict active connections jika belum ada
+    if not hasattr(terminal_websocket, "active_connections"):
+        terminal_websocket.active_connections = {}
+
     # 🔥 CEK APAKAH SUDAH ADA KONEKSI AKTIF UNTUK SESSION INI
-    if hasattr(terminal_websocket, "active_connections") and session_id in terminal_websocket.active_connections:
+    # (kecuali client yang resume, websocket lama yang setengah mati diambil alih)
+    if session_id in terminal_websocket.active_connections and not resuming:
         logger.warning(f"Session {session_id} already has active connection, rejecting new one")
+        metrics.WEBSOCKETS["rejected"] += 1
         await websocket.close(code=1008, reason="Session already connected")
         return
     
-    # Inisialisasi set active connections jika belum ada
-    if not hasattr(terminal_websocket, "active_connections"):
-        terminal_websocket.active_connections = set()
-    
-    terminal_websocket.active_connections.add(session_id)
+    terminal_websocket.active_connections[session_id] = websocket
+    metrics.WEBSOCKETS["accepted"] += 1
     
     await websocket.accept()
     logger.info(f"WebSocket connected for session {session_id}")
 
-    try:
-        # 🔥 CEK APAKAH INI LOCAL SESSION (TAMBAHAN BARU)
-        if session_id in ssh_manager.local_sessions:
-            await ssh_manager.handle_local_shell(session_id, websocket)
-            return
+    # Mode json tetap default untuk client lama, client baru minta ?protocol=binary
+    protocol = negotiate_protocol(websocket)
+    channel = TerminalChannel(
+        websocket, protocol,
+        trace=negotiate_trace(websocket),
+        compression=negotiate_compression(websocket, protocol),
+    )
+    if channel.is_binary:
+        await channel.send_hello()
 
-        # 🔥 EXISTING CODE - TIDAK DIUBAH
-        if session_id not in ssh_manager.connections:
-            await websocket.send_json({
-                "type": "error",
-                "data": "Session not found"
-            })
+    try:
+        if session_id not in ssh_manager.local_sessions and session_id not in ssh_manager.connections:
+            await channel.send_error("Session not found")
             await websocket.close()
             return
 
-        conn = ssh_manager.connections[session_id]
+        # Shell tetap hidup setelah websocket putus, reconnect hanya attach ulang
+        await ssh_manager.attach_terminal(session_id, channel, resume_token, offset)
 
-        try:
-            process = await conn.create_process(
-                term_type="xterm",
-                term_size=(80, 24)
-            )
-
-            logger.info("PTY process started")
-
-            async def read_from_shell():
-                try:
-                    while True:
-                        data = await process.stdout.read(1024)
-                        if not data:
-                            break
-                        await websocket.send_json({
-                            "type": "data",
-                            "data": data
-                        })
-                except Exception as e:
-                    logger.error(f"Read error: {e}")
-
-            async def write_to_shell():
-                try:
-                    async for message in websocket.iter_json():
-                        if message["type"] == "input":
-                            process.stdin.write(message["data"])
-                            await process.stdin.drain()
-
-                        elif message["type"] == "resize":
-                            cols = int(message.get("cols", 80))
-                            rows = int(message.get("rows", 24))
-                            process.change_terminal_size(cols, rows)
-
-                except Exception as e:
-                    logger.error(f"Write error: {e}")
-
-            await asyncio.gather(
-                read_from_shell(),
-                write_to_shell()
-            )
-
-        except Exception as e:
-            logger.error(f"Terminal error: {e}")
-            await websocket.send_json({
-                "type": "error",
-                "data": str(e)
-            })
-
-        finally:
-            try:
-                process.close()
-                await process.wait_closed()
-            except:
-                pass
+    except Exception as e:
+        logger.error(f"Terminal error: {e}")
+        await channel.send_error(str(e))
 
     finally:
         # 🔥 HAPUS DARI ACTIVE CONNECTIONS SAAT KONEKSI DITUTUP
-        if hasattr(terminal_websocket, "active_connections") and session_id in terminal_websocket.active_connections:
-            terminal_websocket.active_connections.remove(session_id)
+        if terminal_websocket.active_connections.get(session_id) is websocket:
+            del terminal_websocket.active_connections[session_id]
         logger.info(f"Session {session_id} closed")
\ No newline at end of file
@@ -0,0 +1,359 @@
+"""Metrik runtime dalam format text Prometheus (``GET /metrics``).
+
+Hot path (setiap chunk input / frame output) hanya menaikkan integer di
+dict biasa: satu dict milik session (``TerminalSession.counters``) dan satu
+dict global (``TOTALS``). Semua kode berjalan di satu event loop, jadi
+tidak perlu lock. Gauge (jumlah session, kedalaman antrian kirim, dll)
+tidak disimpan sama sekali, dihitung saat di-scrape dari state SSHManager.
+
+Histogram pakai bucket tetap (bisect + increment), tanpa library tambahan.
+``LoopLagMonitor`` mengukur keterlambatan event loop: task yang tidur
+``interval`` detik, selisih waktu bangun dengan jadwalnya adalah lag.
+"""
+import asyncio
+import logging
+import os
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ==================== KONFIGURASI ====================
+METRICS_LAG_INTERVAL = float(os.environ.get("WT_METRICS_LAG_INTERVAL", "0.5"))
+# Series per session bisa dimatikan kalau jumlah session sangat banyak
+METRICS_PER_SESSION = os.environ.get("WT_METRICS_PER_SESSION", "1").lower() in ("1", "true", "yes")
+
+CONNECT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+ECHO_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+ECHO_SEGMENTS = ("client_to_server", "remote_echo", "server_send", "server_to_client", "total")
+
+# in  = client -> shell (input), out = server -> client (frame websocket)
+TOTALS: Dict[str, int] = {
+    "bytes_in": 0,
+    "bytes_out": 0,
+    "frames_in": 0,
+    "frames_out": 0,
+}
+
+# Dinaikkan oleh terminal_websocket
+WEBSOCKETS: Dict[str, int] = {
+    "accepted": 0,
+    "rejected": 0,
+}
+
+
+# Kompresi output mode binary (backend/terminal_protocol.py). input = byte
+# output terminal sebelum kompresi, output = payload deflate yang terkirim.
+# raw_frames = frame di bawah threshold yang dikirim tanpa kompresi.
+COMPRESSION: Dict[str, float] = {
+    "frames": 0,
+    "raw_frames": 0,
+    "input_bytes": 0,
+    "output_bytes": 0,
+    "cpu_seconds": 0.0,
+}
+
+
+# Warm pool (backend/prewarm.py). hits = koneksi warm yang terpakai session,
+# expired = ditutup TTL tanpa pernah dipakai (idle/handshake-nya terbuang).
+# saved_connects = connect ke saved host, saved_warm_connects = yang dapat koneksi warm.
+PREWARM: Dict[str, float] = {
+    "opened": 0,
+    "failed": 0,
+    "hits": 0,
+    "expired": 0,
+    "handshake_seconds": 0.0,
+    "wasted_idle_seconds": 0.0,
+    "wasted_handshake_seconds": 0.0,
+    "saved_connects": 0,
+    "saved_warm_connects": 0,
+}
+
+
+def new_session_counters() -> Dict[str, int]:
+    return dict.fromkeys(TOTALS, 0)
+
+
+def new_compression_counters() -> Dict[str, float]:
+    return dict.fromkeys(COMPRESSION, 0)
+
+
+class Histogram:
+    """Histogram kumulatif ala Prometheus dengan bucket tetap"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Batas atas bucket yang memuat kuantil q, None kalau di bucket +Inf"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return None
+
+    def samples(self, name: str, labels: str = "") -> Iterable[str]:
+        sep = "," if labels else ""
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels}{sep}le="+Inf"}} {self.count}'
+        suffix = f"{{{labels}}}" if labels else ""
+        yield f"{name}_sum{suffix} {self.sum:.6f}"
+        yield f"{name}_count{suffix} {self.count}"
+
+
+# (type, result) -> Histogram, result: ok / reused / error
+CONNECT_DURATIONS: Dict[Tuple[str, str], Histogram] = {}
+
+
+def observe_connect(kind: str, result: str, seconds: float):
+    histogram = CONNECT_DURATIONS.get((kind, result))
+    if histogram is None:
+        histogram = CONNECT_DURATIONS[(kind, result)] = Histogram(CONNECT_BUCKETS)
+    histogram.observe(seconds)
+
+
+# Fase connect SSH gabungan semua host (backend/connect_trace.py)
+CONNECT_PHASES: Dict[str, Histogram] = {}
+
+
+def observe_connect_phase(phase: str, seconds: float):
+    histogram = CONNECT_PHASES.get(phase)
+    if histogram is None:
+        histogram = CONNECT_PHASES[phase] = Histogram(CONNECT_BUCKETS)
+    histogram.observe(seconds)
+
+
+# Connect yang gagal per alasan (backend/ssh_connect.py classify_connect_error)
+CONNECT_ERRORS: Dict[str, int] = {}
+
+
+def observe_connect_error(reason: str):
+    CONNECT_ERRORS[reason] = CONNECT_ERRORS.get(reason, 0) + 1
+
+
+# Gabungan semua session yang di-trace (backend/echo_trace.py)
+ECHO_LATENCY: Dict[str, Histogram] = {segment: Histogram(ECHO_BUCKETS) for segment in ECHO_SEGMENTS}
+
+
+def observe_echo(segment: str, seconds: float):
+    ECHO_LATENCY[segment].observe(seconds)
+
+
+# ==================== EVENT LOOP LAG ====================
+class LoopLagMonitor:
+    """Ukur lag event loop + hitung frame/byte per detik dari TOTALS"""
+
+    def __init__(self, interval: float = METRICS_LAG_INTERVAL):
+        self.interval = interval
+        self.lag = Histogram(LAG_BUCKETS)
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.rates: Dict[str, float] = dict.fromkeys(TOTALS, 0.0)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        rate_started = time.monotonic()
+        rate_base = dict(TOTALS)
+        while True:
+            scheduled = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - scheduled)
+            self.lag.observe(lag)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+
+            # Rate dihitung per ~1 detik, bukan per scrape
+            now = time.monotonic()
+            elapsed = now - rate_started
+            if elapsed >= 1.0:
+                for key, value in TOTALS.items():
+                    self.rates[key] = (value - rate_base[key]) / elapsed
+                rate_base = dict(TOTALS)
+                rate_started = now
+
+
+loop_lag = LoopLagMonitor()
+
+
+# ==================== EXPOSITION ====================
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Writer:
+    def __init__(self):
+        self.lines: List[str] = []
+
+    def metric(self, name: str, metric_type: str, help_text: str,
+               samples: Iterable[Tuple[Dict, float]]):
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in samples:
+            if labels:
+                label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                self.lines.append(f"{name}{{{label_text}}} {value}")
+            else:
+                self.lines.append(f"{name} {value}")
+
+    def histogram(self, name: str, help_text: str,
+                  histograms: Iterable[Tuple[Dict, Histogram]]):
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} histogram")
+        for labels, histogram in histograms:
+            label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+            self.lines.extend(histogram.samples(name, label_text))
+
+    def render(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+def render_metrics(ssh_manager, websocket_count: int) -> str:
+    """Snapshot semua metrik sebagai text Prometheus 0.0.4"""
+    out = _Writer()
+    directions = (("in", "bytes_in", "frames_in"), ("out", "bytes_out", "frames_out"))
+
+    out.metric("webterm_bytes_total", "counter",
+               "Terminal bytes, in = client input to shell, out = sent to websocket",
+               (({"direction": d}, TOTALS[b]) for d, b, _ in directions))
+    out.metric("webterm_frames_total", "counter",
+               "Terminal websocket frames, in = received, out = sent",
+               (({"direction": d}, TOTALS[f]) for d, _, f in directions))
+    out.metric("webterm_frames_per_second", "gauge",
+               "Terminal websocket frames per second over the last ~1s",
+               (({"direction": d}, round(loop_lag.rates[f], 2)) for d, _, f in directions))
+    out.metric("webterm_bytes_per_second", "gauge",
+               "Terminal bytes per second over the last ~1s",
+               (({"direction": d}, round(loop_lag.rates[b], 2)) for d, b, _ in directions))
+
+    terminals = list(ssh_manager.terminals.values())
+    if METRICS_PER_SESSION:
+        out.metric("webterm_session_bytes_total", "counter", "Terminal bytes per session",
+                   (({"session_id": t.session_id, "direction": d}, t.counters[b])
+                    for t in terminals for d, b, _ in directions))
+        out.metric("webterm_session_frames_total", "counter", "Terminal websocket frames per session",
+                   (({"session_id": t.session_id, "direction": d}, t.counters[f])
+                    for t in terminals for d, _, f in directions))
+        out.metric("webterm_ws_send_queue_bytes", "gauge",
+                   "Bytes buffered or in flight in the websocket output pump",
+                   (({"session_id": t.session_id}, t.pump.stats["buffered_bytes"])
+                    for t in terminals if t.pump is not None))
+
+    pumps = [t.pump for t in terminals if t.pump is not None]
+    out.metric("webterm_ws_send_queue_bytes_total", "gauge",
+               "Bytes buffered across all websocket output pumps",
+               [({}, sum(pump.stats["buffered_bytes"] for pump in pumps))])
+    out.metric("webterm_ws_send_queue_paused", "gauge",
+               "Output pumps currently applying backpressure to the shell",
+               [({}, sum(1 for pump in pumps if pump.stats["paused"]))])
+
+    sessions = ssh_manager.sessions.values()
+    ssh_active = sum(1 for s in sessions if s.get('type') == 'ssh' and s.get('connected'))
+    out.metric("webterm_active_sessions", "gauge", "Connected sessions by type",
+               [({"type": "ssh"}, ssh_active), ({"type": "local"}, len(ssh_manager.local_sessions))])
+    out.metric("webterm_ssh_connections", "gauge",
+               "Open SSH transport connections (pooled, shared by sessions)",
+               [({}, sum(len(entries) for entries in ssh_manager.pool.values()))])
+    out.metric("webterm_attached_terminals", "gauge", "Terminals with a websocket attached",
+               [({}, sum(1 for t in terminals if t.attached))])
+    out.metric("webterm_websocket_connections", "gauge", "Open terminal websockets",
+               [({}, websocket_count)])
+    out.metric("webterm_websocket_connections_total", "counter",
+               "Terminal websocket handshakes, rejected = session already connected",
+               (({"result": result}, count) for result, count in WEBSOCKETS.items()))
+
+    out.metric("webterm_compression_frames_total", "counter",
+               "Binary output frames on compressed websockets, raw = below size threshold",
+               [({"result": "compressed"}, COMPRESSION["frames"]),
+                ({"result": "raw"}, COMPRESSION["raw_frames"])])
+    out.metric("webterm_compression_bytes_total", "counter",
+               "Deflate input (terminal output) and output (payload on the wire) bytes",
+               [({"stage": "input"}, COMPRESSION["input_bytes"]),
+                ({"stage": "output"}, COMPRESSION["output_bytes"])])
+    out.metric("webterm_compression_cpu_seconds_total", "counter",
+               "Time spent compressing terminal output",
+               [({}, round(COMPRESSION["cpu_seconds"], 6))])
+    if METRICS_PER_SESSION:
+        compressed = [t for t in terminals if t.compression is not None]
+        out.metric("webterm_session_compression_bytes_total", "counter",
+                   "Deflate input and output bytes per session",
+                   (({"session_id": t.session_id, "stage": stage}, t.compression[f"{stage}_bytes"])
+                    for t in compressed for stage in ("input", "output")))
+        out.metric("webterm_session_compression_cpu_seconds_total", "counter",
+                   "Time spent compressing output per session",
+                   (({"session_id": t.session_id}, round(t.compression["cpu_seconds"], 6))
+                    for t in compressed))
+
+    out.metric("webterm_prewarm_connections_total", "counter",
+               "Prewarmed SSH connections, hit = used by a session, expired = closed unused",
+               (({"result": result}, PREWARM[key]) for result, key in
+                (("opened", "opened"), ("failed", "failed"), ("hit", "hits"), ("expired", "expired"))))
+    out.metric("webterm_prewarm_warm_connections", "gauge",
+               "Prewarmed SSH connections waiting for a session",
+               [({}, len(ssh_manager.warm_entries()))])
+    out.metric("webterm_prewarm_wasted_seconds_total", "counter",
+               "Time spent on prewarmed connections that expired unused",
+               [({"kind": "idle"}, round(PREWARM["wasted_idle_seconds"], 3)),
+                ({"kind": "handshake"}, round(PREWARM["wasted_handshake_seconds"], 3))])
+    out.metric("webterm_saved_host_connects_total", "counter",
+               "Saved host connects, warm = served from the prewarm pool",
+               [({"result": "warm"}, PREWARM["saved_warm_connects"]),
+                ({"result": "cold"}, PREWARM["saved_connects"] - PREWARM["saved_warm_connects"])])
+
+    out.histogram("webterm_connect_duration_seconds",
+                  "Time to open a session, result = ok / reused (pooled SSH) / error",
+                  (({"type": kind, "result": result}, histogram)
+                   for (kind, result), histogram in sorted(CONNECT_DURATIONS.items())))
+
+    out.metric("webterm_connect_errors_total", "counter",
+               "Failed SSH connects by reason (auth, refused, timeout, negotiation, ...)",
+               (({"reason": reason}, count) for reason, count in sorted(CONNECT_ERRORS.items())))
+
+    out.histogram("webterm_connect_phase_seconds",
+                  "SSH connect time by phase (dns, tcp, kex, auth, retry, pty, total)",
+                  (({"phase": phase}, histogram) for phase, histogram in sorted(CONNECT_PHASES.items())))
+
+    out.histogram("webterm_echo_latency_seconds",
+                  "Keystroke to echo latency by segment (traced websockets only)",
+                  (({"segment": segment}, histogram) for segment, histogram in ECHO_LATENCY.items()))
+    if METRICS_PER_SESSION:
+        out.histogram("webterm_session_echo_latency_seconds",
+                      "Keystroke to echo latency by segment per traced session",
+                      (({"session_id": t.session_id, "segment": segment}, histogram)
+                       for t in terminals if t.tracer is not None
+                       for segment, histogram in t.tracer.histograms.items()))
+
+    out.histogram("webterm_event_loop_lag_seconds",
+                  "Delay between scheduled and actual wakeup of the event loop",
+                  [({}, loop_lag.lag)])
+    out.metric("webterm_event_loop_lag_last_seconds", "gauge", "Most recent event loop lag",
+               [({}, round(loop_lag.last_lag, 6))])
+    out.metric("webterm_event_loop_lag_max_seconds", "gauge", "Highest event loop lag seen",
+               [({}, round(loop_lag.max_lag, 6))])
+    return out.render()
@@ -8,6 +8,8 @@ class User(Base):
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String, unique=True, index=True)
     password_hash = Column(String)
+    # Opt-in: buka koneksi warm ke host favorit saat login (backend/prewarm.py)
+    prewarm = Column(Boolean, default=False)
 
     ssh_hosts = relationship("SSHHost", back_populates="owner")
     quick_commands = relationship("QuickCommand", back_populates="owner")  # ✅ TAMBAH
@@ -21,6 +23,11 @@ class SSHHost(Base):
     port = Column(Integer, default=22)
     username = Column(String)
     password = Column(String)  # plaintext (dev mode)
+    # Profil transport SSH (backend/transport_profile.py), options = JSON override
+    transport_profile = Column(String, default="default")
+    transport_options = Column(Text, nullable=True)
+    # Jumlah connect, dipakai prewarm untuk memilih host yang paling sering dipakai
+    connect_count = Column(Integer, default=0)
 
     user_id = Column(Integer, ForeignKey("users.id"))
     owner = relationship("User", back_populates="ssh_hosts")
@@ -0,0 +1,277 @@
+"""Coalescing output shell -> websocket.
+
+Reader shell memanggil ``feed()`` untuk setiap chunk, sedangkan task sender
+milik pump menggabungkan chunk-chunk itu jadi satu frame websocket. Frame
+di-flush kalau:
+
+- ``interactive`` : output kecil datang setelah shell idle (read sebelumnya
+                    lebih dari latency budget yang lalu, misal echo
+                    keystroke), langsung dikirim tanpa menunggu
+- ``size``        : buffer sudah mencapai batas ukuran frame
+- ``latency``     : latency budget habis sejak byte pertama di buffer
+- ``eof``         : shell selesai, sisa buffer dikirim
+
+Buffer per session dibatasi dengan high/low watermark. Kalau client lambat
+dan isi buffer (termasuk frame yang sedang dikirim) melewati high watermark,
+``feed()`` menahan reader sampai buffer turun ke low watermark. Karena reader
+berhenti membaca channel asyncssh / pipe proses lokal, backpressure diteruskan
+ke window SSH / pipe sehingga sisi remote ikut melambat.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Callable, Dict, Optional, Union
+
+from backend.metrics import TOTALS
+from backend.terminal_protocol import BytesLike
+
+logger = logging.getLogger(__name__)
+
+# ==================== KONFIGURASI ====================
+# Latency budget dibatasi 2-8 ms supaya echo tetap terasa instan
+OUTPUT_LATENCY_BUDGET_MS = min(8.0, max(2.0, float(os.environ.get("WT_OUTPUT_LATENCY_MS", "4"))))
+OUTPUT_MAX_FRAME_BYTES = int(os.environ.get("WT_OUTPUT_MAX_FRAME_BYTES", str(64 * 1024)))
+OUTPUT_INTERACTIVE_BYTES = 256
+OUTPUT_HIGH_WATERMARK = max(
+    OUTPUT_MAX_FRAME_BYTES,
+    int(os.environ.get("WT_OUTPUT_HIGH_WATERMARK", str(256 * 1024)))
+)
+OUTPUT_LOW_WATERMARK = min(
+    OUTPUT_HIGH_WATERMARK // 2,
+    int(os.environ.get("WT_OUTPUT_LOW_WATERMARK", str(64 * 1024)))
+)
+
+READ_SIZE_MIN = 1024
+READ_SIZE_MAX = 64 * 1024
+
+FLUSH_REASONS = ("interactive", "size", "latency", "eof")
+
+
+class OutputPump:
+    """Gabungkan output shell jadi frame websocket yang lebih besar"""
+
+    def __init__(self, channel, latency_budget_ms: float = OUTPUT_LATENCY_BUDGET_MS,
+                 max_frame_bytes: int = OUTPUT_MAX_FRAME_BYTES,
+                 high_watermark: int = OUTPUT_HIGH_WATERMARK,
+                 low_watermark: int = OUTPUT_LOW_WATERMARK,
+                 counters: Optional[Dict[str, int]] = None):
+        self.channel = channel
+        # Counter milik session (backend.metrics), hidup lebih lama dari pump
+        self.counters = counters
+        # Hook tracing echo (backend/echo_trace.py), dipanggil setelah frame terkirim
+        self.on_flush: Optional[Callable[[float], Optional[Dict]]] = None
+        self.latency_budget = latency_budget_ms / 1000
+        self.max_frame_bytes = max_frame_bytes
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark
+
+        self._chunks = []
+        self._buffered = 0
+        self._inflight = 0
+        self._resume = asyncio.Event()
+        self._resume.set()
+        self._first_byte_at = 0.0
+        self._last_read_at = float("-inf")
+        # Jeda antara read pertama di buffer dan read sebelumnya
+        self._idle_before = float("inf")
+        self._closed = False
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+        self.read_size = READ_SIZE_MIN
+        self.stats: Dict = {
+            "frames_sent": 0,
+            "bytes_sent": 0,
+            "bytes_per_frame": 0.0,
+            "max_frame_bytes": 0,
+            "reads": 0,
+            "read_size": self.read_size,
+            "flush_reasons": {reason: 0 for reason in FLUSH_REASONS},
+            "buffered_bytes": 0,
+            "peak_buffered_bytes": 0,
+            "paused": False,
+            "pauses": 0,
+            "paused_seconds": 0.0,
+        }
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def feed(self, data: Union[BytesLike, str]):
+        """Masukkan satu chunk hasil read dari shell (disimpan tanpa copy)"""
+        if self._task is not None and self._task.done():
+            # Sender sudah mati (websocket tertutup), hentikan reader
+            raise ConnectionError("Output pump is closed")
+
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+
+        self._adapt_read_size(len(data))
+        occupancy = self._append(data)
+
+        if occupancy >= self.high_watermark:
+            await self._pause()
+        else:
+            # Beri kesempatan sender jalan di antara read beruntun
+            await asyncio.sleep(0)
+
+    def feed_nowait(self, data: BytesLike):
+        """Masukkan data tanpa backpressure (misal replay scrollback saat attach)"""
+        self._append(data)
+
+    def _append(self, data: BytesLike) -> int:
+        now = asyncio.get_running_loop().time()
+        if not self._chunks:
+            self._first_byte_at = now
+            self._idle_before = now - self._last_read_at
+            self._wakeup.set()
+        self._last_read_at = now
+        self._chunks.append(data)
+        self._buffered += len(data)
+
+        occupancy = self._buffered + self._inflight
+        self.stats["buffered_bytes"] = occupancy
+        if occupancy > self.stats["peak_buffered_bytes"]:
+            self.stats["peak_buffered_bytes"] = occupancy
+
+        if self._buffered >= self.max_frame_bytes:
+            self._wakeup.set()
+        return occupancy
+
+    async def _pause(self):
+        """Tahan reader sampai sender menguras buffer ke low watermark"""
+        loop = asyncio.get_running_loop()
+        self._resume.clear()
+        self._wakeup.set()
+        self.stats["paused"] = True
+        self.stats["pauses"] += 1
+        started = loop.time()
+        try:
+            await self._resume.wait()
+        finally:
+            self.stats["paused"] = False
+            self.stats["paused_seconds"] = round(
+                self.stats["paused_seconds"] + loop.time() - started, 3
+            )
+
+        if self._task is not None and self._task.done():
+            raise ConnectionError("Output pump is closed")
+
+    async def close(self):
+        """Flush sisa buffer lalu hentikan sender"""
+        self._closed = True
+        self._wakeup.set()
+        if self._task is not None:
+            try:
+                await self._task
+            except Exception as e:
+                logger.debug(f"Output pump sender ended with error: {e}")
+
+    def _adapt_read_size(self, size: int):
+        """Read size naik kalau read selalu penuh, turun kalau output jarang"""
+        self.stats["reads"] += 1
+        if size >= self.read_size and self.read_size < READ_SIZE_MAX:
+            self.read_size = min(READ_SIZE_MAX, self.read_size * 2)
+        elif size < self.read_size // 4 and self.read_size > READ_SIZE_MIN:
+            self.read_size = max(READ_SIZE_MIN, self.read_size // 2)
+        self.stats["read_size"] = self.read_size
+
+    def _is_interactive(self) -> bool:
+        # Diukur dari read, bukan flush: flush yang menunggu budget tidak
+        # membuat echo berikutnya ikut menunggu
+        return (
+            self._buffered <= OUTPUT_INTERACTIVE_BYTES
+            and self._idle_before > self.latency_budget
+        )
+
+    async def _run(self):
+        try:
+            await self._run_sender()
+        finally:
+            # Jangan biarkan reader tertahan selamanya kalau sender berhenti
+            self._resume.set()
+
+    async def _run_sender(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+            if not self._chunks:
+                if self._closed:
+                    return
+                continue
+
+            now = loop.time()
+            if self._closed:
+                reason = "eof"
+            elif self._buffered >= self.max_frame_bytes:
+                reason = "size"
+            elif self._is_interactive():
+                reason = "interactive"
+            else:
+                reason = "latency"
+                remaining = self._first_byte_at + self.latency_budget - now
+                while remaining > 0:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                    self._wakeup.clear()
+                    if self._closed:
+                        reason = "eof"
+                        break
+                    if self._buffered >= self.max_frame_bytes:
+                        reason = "size"
+                        break
+                    remaining = self._first_byte_at + self.latency_budget - loop.time()
+
+            await self._flush(reason)
+
+    async def _flush(self, reason: str):
+        flush_started = time.perf_counter() if self.on_flush is not None else 0.0
+        # Ambil chunk sampai batas ukuran frame, sisanya untuk frame berikutnya
+        count = 0
+        size = 0
+        for chunk in self._chunks:
+            count += 1
+            size += len(chunk)
+            if size >= self.max_frame_bytes:
+                break
+        chunks = self._chunks[:count]
+        del self._chunks[:count]
+        self._buffered -= size
+        self._inflight = size
+
+        try:
+            await self.channel.send_output_chunks(chunks)
+        finally:
+            self._inflight = 0
+
+        if self.on_flush is not None:
+            trace = self.on_flush(flush_started)
+            if trace is not None:
+                await self.channel.send_control("trace", **trace)
+
+        self.stats["buffered_bytes"] = self._buffered
+        if not self._resume.is_set() and self._buffered <= self.low_watermark:
+            self._resume.set()
+
+        TOTALS["frames_out"] += 1
+        TOTALS["bytes_out"] += size
+        if self.counters is not None:
+            self.counters["frames_out"] += 1
+            self.counters["bytes_out"] += size
+
+        stats = self.stats
+        stats["frames_sent"] += 1
+        stats["bytes_sent"] += size
+        stats["bytes_per_frame"] = round(stats["bytes_sent"] / stats["frames_sent"], 1)
+        stats["max_frame_bytes"] = max(stats["max_frame_bytes"], size)
+        stats["flush_reasons"][reason] += 1
+
+        # Data baru mungkin masuk selama send, proses di putaran berikutnya
+        if self._chunks or self._closed:
+            self._wakeup.set()
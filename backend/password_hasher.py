@@ -0,0 +1,184 @@
+"""Hash/verifikasi password bcrypt di worker pool khusus.
+
+bcrypt sengaja mahal (~250 ms per operasi di cost 12). Kalau dijalankan
+lewat ``asyncio.to_thread`` semua login berbagi default executor dengan
+pekerjaan lain (DNS, file, dll), dan lonjakan login setelah outage bisa
+menahan semuanya. Di sini:
+
+- executor terpisah dengan jumlah worker tetap (thread, atau process pool
+  lewat ``WT_BCRYPT_PROCESS_POOL=1``)
+- antrian dibatasi: kalau sudah ``WT_BCRYPT_MAX_QUEUE`` request menunggu,
+  request baru langsung ditolak (``PasswordHasherBusy`` -> HTTP 503)
+  daripada menumpuk dan timeout semua
+- request yang dibatalkan (client putus) selagi antri tidak pernah
+  menjalankan bcrypt
+- metrik antrian: jumlah antri, in-flight, waktu tunggu dan waktu hash
+
+Cost factor diatur lewat ``WT_BCRYPT_ROUNDS``. Hash lama dengan cost
+berbeda tetap bisa diverifikasi karena cost tersimpan di dalam hash.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Optional
+
+import bcrypt
+
+logger = logging.getLogger(__name__)
+
+# ==================== KONFIGURASI ====================
+BCRYPT_ROUNDS = int(os.environ.get("WT_BCRYPT_ROUNDS", "12"))
+BCRYPT_WORKERS = int(os.environ.get("WT_BCRYPT_WORKERS", str(min(4, os.cpu_count() or 1))))
+BCRYPT_MAX_QUEUE = int(os.environ.get("WT_BCRYPT_MAX_QUEUE", "64"))
+BCRYPT_PROCESS_POOL = os.environ.get("WT_BCRYPT_PROCESS_POOL", "0").lower() in ("1", "true", "yes")
+
+# Jumlah sampel terakhir untuk hitung persentil
+_SAMPLE_WINDOW = 1024
+
+
+class PasswordHasherBusy(Exception):
+    """Antrian hash penuh, client sebaiknya coba lagi nanti"""
+
+
+# Fungsi module-level supaya bisa di-pickle untuk process pool
+def hash_password(password: str, rounds: int = BCRYPT_ROUNDS) -> str:
+    """Hash password dengan bcrypt (blocking)"""
+    salt = bcrypt.gensalt(rounds)
+    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verifikasi password dengan bcrypt (blocking)"""
+    try:
+        return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    except ValueError:
+        # Hash di DB rusak / bukan bcrypt
+        return False
+
+
+def _percentile(samples, p: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))], 2)
+
+
+class PasswordHasher:
+    """Executor bcrypt dengan concurrency tetap dan antrian terbatas"""
+
+    def __init__(self, workers: int = BCRYPT_WORKERS, max_queue: int = BCRYPT_MAX_QUEUE,
+                 use_processes: bool = BCRYPT_PROCESS_POOL, rounds: int = BCRYPT_ROUNDS):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.use_processes = use_processes
+        self.rounds = rounds
+
+        self._executor: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._queued = 0
+        self._in_flight = 0
+        self._wait_ms = deque(maxlen=_SAMPLE_WINDOW)
+        self._run_ms = deque(maxlen=_SAMPLE_WINDOW)
+        self.stats = {
+            "submitted": 0,
+            "completed": 0,
+            "rejected": 0,
+            "cancelled": 0,
+            "errors": 0,
+            "peak_queued": 0,
+        }
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.use_processes:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="bcrypt"
+                )
+            logger.info(
+                f"🔐 Password hasher: {self.workers} "
+                f"{'process' if self.use_processes else 'thread'} worker(s), "
+                f"cost {self.rounds}, max queue {self.max_queue}"
+            )
+        return self._executor
+
+    async def _run(self, fn, *args):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+
+        # Semua worker sibuk: request ini harus antri
+        waiting = self._slots.locked()
+        if waiting and self._queued >= self.max_queue:
+            self.stats["rejected"] += 1
+            raise PasswordHasherBusy("Password hasher queue is full")
+
+        self.stats["submitted"] += 1
+        queued_at = time.perf_counter()
+        if waiting:
+            self._queued += 1
+            self.stats["peak_queued"] = max(self.stats["peak_queued"], self._queued)
+        try:
+            await self._slots.acquire()
+        except asyncio.CancelledError:
+            self.stats["cancelled"] += 1
+            raise
+        finally:
+            if waiting:
+                self._queued -= 1
+
+        started = time.perf_counter()
+        self._wait_ms.append((started - queued_at) * 1000)
+        self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._get_executor(), fn, *args)
+        except asyncio.CancelledError:
+            self.stats["cancelled"] += 1
+            raise
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        finally:
+            self._in_flight -= 1
+            self._slots.release()
+        self._run_ms.append((time.perf_counter() - started) * 1000)
+        self.stats["completed"] += 1
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password, self.rounds)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def get_status(self) -> Dict:
+        status = dict(self.stats)
+        status.update({
+            "workers": self.workers,
+            "executor": "process" if self.use_processes else "thread",
+            "rounds": self.rounds,
+            "max_queue": self.max_queue,
+            "queued": self._queued,
+            "in_flight": self._in_flight,
+            "wait_ms": {
+                "p50": _percentile(self._wait_ms, 0.50),
+                "p99": _percentile(self._wait_ms, 0.99),
+            },
+            "run_ms": {
+                "p50": _percentile(self._run_ms, 0.50),
+                "p99": _percentile(self._run_ms, 0.99),
+            },
+        })
+        return status
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,162 @@
+"""Prewarm koneksi SSH ke saved host yang paling sering dipakai user.
+
+Opt-in per user (``User.prewarm``). Saat user login, atau berkala kalau
+``WT_PREWARM_INTERVAL`` > 0, backend membuka koneksi terautentikasi ke
+``WT_PREWARM_MAX_HOSTS`` saved host dengan ``connect_count`` tertinggi dan
+memarkirnya di pool SSH selama ``WT_PREWARM_TTL`` detik. Klik pertama di
+host itu (``/api/connect-saved``) lalu cukup membuka channel baru di koneksi
+warm, tanpa DNS/TCP/kex/auth.
+
+Koneksi warm yang tidak terpakai sampai TTL habis ditutup dan dihitung
+sebagai pemborosan (waktu idle + waktu handshake) di ``metrics.PREWARM``,
+bersama hit rate, supaya batas host dan TTL bisa disetel dari data.
+
+Di mode sharded setiap shard hanya memanaskan host yang di-route ke dirinya
+(``host_shard``); login di shard 0 meneruskan permintaan ke shard lain.
+"""
+import asyncio
+import logging
+import os
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+
+from backend.database import AsyncSessionLocal
+from backend.metrics import PREWARM
+from backend.models import SSHHost, User
+from backend.sharding import SHARD_COUNT, SHARD_INDEX, host_shard, request_other_shards
+from backend.transport_profile import host_transport
+
+logger = logging.getLogger(__name__)
+
+# ==================== KONFIGURASI ====================
+# Saklar global, user tetap harus opt-in sendiri
+PREWARM_ENABLED = os.environ.get("WT_PREWARM", "1").lower() in ("1", "true", "yes")
+PREWARM_MAX_HOSTS = int(os.environ.get("WT_PREWARM_MAX_HOSTS", "3"))
+# Batas koneksi warm di seluruh proses (semua user)
+PREWARM_MAX_TOTAL = int(os.environ.get("WT_PREWARM_MAX_TOTAL", "50"))
+PREWARM_TTL = float(os.environ.get("WT_PREWARM_TTL", "300"))
+# 0 = hanya saat login
+PREWARM_INTERVAL = float(os.environ.get("WT_PREWARM_INTERVAL", "0"))
+# Host yang baru sekali dipakai belum layak dipanaskan
+PREWARM_MIN_CONNECTS = int(os.environ.get("WT_PREWARM_MIN_CONNECTS", "2"))
+PREWARM_CONCURRENCY = int(os.environ.get("WT_PREWARM_CONCURRENCY", "4"))
+
+
+class Prewarmer:
+    """Pilih host per user dan buka koneksi warm lewat SSHManager"""
+
+    def __init__(self, ssh_manager):
+        self.ssh_manager = ssh_manager
+        self._running: Dict[int, asyncio.Task] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # ==================== LIFECYCLE ====================
+    def start(self):
+        if PREWARM_ENABLED and PREWARM_INTERVAL > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._schedule_loop())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for task in self._running.values():
+            task.cancel()
+
+    async def _schedule_loop(self):
+        while True:
+            await asyncio.sleep(PREWARM_INTERVAL)
+            try:
+                async with AsyncSessionLocal() as db:
+                    user_ids = (await db.scalars(select(User.id).where(User.prewarm == True))).all()  # noqa: E712
+                for user_id in user_ids:
+                    await self.warm_user(user_id)
+            except Exception as e:
+                logger.error(f"❌ Scheduled prewarm failed: {e}")
+
+    # ==================== TRIGGER ====================
+    def on_login(self, user_id: int):
+        """Prewarm di background, login tidak menunggu handshake"""
+        if not PREWARM_ENABLED or user_id in self._running:
+            return
+        task = asyncio.get_running_loop().create_task(self._warm_everywhere(user_id))
+        self._running[user_id] = task
+        task.add_done_callback(lambda _: self._running.pop(user_id, None))
+
+    async def _warm_everywhere(self, user_id: int):
+        results = await asyncio.gather(
+            self.warm_user(user_id),
+            request_other_shards("POST", f"/api/prewarm/{user_id}?local=true"),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                logger.error(f"❌ Prewarm for user {user_id} failed: {result}")
+
+    async def warm_user(self, user_id: int) -> Dict[str, int]:
+        """Buka koneksi warm ke host teratas user (yang dimiliki shard ini)"""
+        summary = {"opened": 0, "exists": 0, "failed": 0, "skipped": 0}
+        if not PREWARM_ENABLED:
+            return summary
+
+        async with AsyncSessionLocal() as db:
+            hosts = (await db.scalars(
+                select(SSHHost)
+                .where(SSHHost.user_id == user_id, SSHHost.connect_count >= PREWARM_MIN_CONNECTS)
+                .order_by(SSHHost.connect_count.desc(), SSHHost.id)
+                .limit(PREWARM_MAX_HOSTS)
+            )).all()
+            targets: List[Dict] = [
+                {
+                    "host": host.host,
+                    "port": host.port,
+                    "username": host.username,
+                    "password": host.password,
+                    "transport": host_transport(host),
+                }
+                for host in hosts
+                if SHARD_COUNT <= 1 or host_shard(host.id) == SHARD_INDEX
+            ]
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(PREWARM_CONCURRENCY)
+
+        async def warm(target: Dict) -> str:
+            async with self._semaphore:
+                if len(self.ssh_manager.warm_entries()) >= PREWARM_MAX_TOTAL:
+                    return "skipped"
+                return await self.ssh_manager.prewarm_connection(
+                    target["host"], target["port"], target["username"], target["password"],
+                    ttl=PREWARM_TTL, transport=target["transport"], owner=user_id,
+                )
+
+        for result in await asyncio.gather(*(warm(target) for target in targets)):
+            summary[result] += 1
+        if summary["opened"]:
+            logger.info(f"🔥 Prewarm user {user_id}: {summary}")
+        return summary
+
+    # ==================== STATISTIK ====================
+    def record_connect(self, warm: bool):
+        PREWARM["saved_connects"] += 1
+        if warm:
+            PREWARM["saved_warm_connects"] += 1
+
+    def get_status(self) -> Dict:
+        opened = PREWARM["opened"]
+        connects = PREWARM["saved_connects"]
+        return {
+            "enabled": PREWARM_ENABLED,
+            "max_hosts": PREWARM_MAX_HOSTS,
+            "max_total": PREWARM_MAX_TOTAL,
+            "ttl": PREWARM_TTL,
+            "interval": PREWARM_INTERVAL,
+            "min_connects": PREWARM_MIN_CONNECTS,
+            "counters": dict(PREWARM),
+            # Porsi koneksi warm yang akhirnya dipakai
+            "hit_rate": round(PREWARM["hits"] / opened, 4) if opened else None,
+            # Porsi connect saved host yang tidak perlu handshake
+            "warm_connect_ratio": round(PREWARM["saved_warm_connects"] / connects, 4) if connects else None,
+            "warm_connections": len(self.ssh_manager.warm_entries()),
+        }
@@ -0,0 +1,198 @@
+"""Local shell berbasis PTY untuk Linux.
+
+Shell dijalankan dengan slave PTY sebagai controlling terminal, sehingga
+program full-screen, job control dan resize jalan normal. Master fd dibaca
+non-blocking lewat ``loop.add_reader`` dengan buffer besar, dan reader
+dilepas sementara kalau buffer penuh (backpressure ke proses shell).
+"""
+import asyncio
+import errno
+import fcntl
+import logging
+import os
+import struct
+import termios
+from typing import Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+PTY_READ_SIZE = 64 * 1024
+PTY_BUFFER_LIMIT = 256 * 1024
+
+
+def _set_winsize(fd: int, cols: int, rows: int):
+    fcntl.ioctl(fd, termios.TIOCSWINSZ, struct.pack("HHHH", rows, cols, 0, 0))
+
+
+def _controlling_tty_setup(slave_name: str):
+    """preexec_fn untuk child: session baru + slave PTY sebagai controlling tty.
+
+    Slave dibuka ulang lewat namanya, karena uvloop memanggil preexec_fn
+    sebelum stdin/stdout di-dup2 (fd 0 belum tentu PTY).
+    """
+    def setup():
+        try:
+            os.setsid()
+        except OSError:
+            # Sudah jadi session leader (start_new_session dijalankan duluan)
+            pass
+        fd = os.open(slave_name, os.O_RDWR)
+        fcntl.ioctl(fd, termios.TIOCSCTTY, 0)
+        os.close(fd)
+    return setup
+
+
+class PtyShell:
+    """Proses shell yang terhubung ke master fd PTY"""
+
+    def __init__(self, process: asyncio.subprocess.Process, master_fd: int):
+        self.process = process
+        self.master_fd = master_fd
+        self._loop = asyncio.get_running_loop()
+        self._chunks: List[Union[bytes, memoryview]] = []
+        self._buffered = 0
+        self._eof = False
+        self._reading = False
+        self._waiter: Optional[asyncio.Future] = None
+        self._resume_reading()
+
+    @classmethod
+    async def spawn(cls, argv: List[str], env: Dict[str, str],
+                    cols: int = 80, rows: int = 24) -> "PtyShell":
+        master_fd, slave_fd = os.openpty()
+        try:
+            _set_winsize(slave_fd, cols, rows)
+            process = await asyncio.create_subprocess_exec(
+                *argv,
+                stdin=slave_fd,
+                stdout=slave_fd,
+                stderr=slave_fd,
+                env=env,
+                preexec_fn=_controlling_tty_setup(os.ttyname(slave_fd)),
+            )
+        except Exception:
+            os.close(master_fd)
+            raise
+        finally:
+            # Child sudah pegang slave fd sendiri
+            os.close(slave_fd)
+
+        os.set_blocking(master_fd, False)
+        return cls(process, master_fd)
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    @property
+    def returncode(self) -> Optional[int]:
+        return self.process.returncode
+
+    # ==================== READ ====================
+    def _resume_reading(self):
+        if not self._reading and not self._eof and self.master_fd >= 0:
+            self._loop.add_reader(self.master_fd, self._on_readable)
+            self._reading = True
+
+    def _pause_reading(self):
+        if self._reading:
+            self._loop.remove_reader(self.master_fd)
+            self._reading = False
+
+    def _on_readable(self):
+        try:
+            data = os.read(self.master_fd, PTY_READ_SIZE)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            # EIO = semua slave fd sudah tertutup (shell exit)
+            if e.errno != errno.EIO:
+                logger.error(f"PTY read error: {e}")
+            data = b""
+
+        if data:
+            self._chunks.append(data)
+            self._buffered += len(data)
+            if self._buffered >= PTY_BUFFER_LIMIT:
+                self._pause_reading()
+        else:
+            self._eof = True
+            self._pause_reading()
+
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def read(self, n: int = PTY_READ_SIZE) -> Union[bytes, memoryview]:
+        """Baca sampai n byte, b'' kalau shell sudah selesai"""
+        while not self._chunks:
+            if self._eof:
+                return b""
+            self._waiter = self._loop.create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+
+        first = self._chunks[0]
+        if len(first) > n:
+            # Potong lewat memoryview supaya tidak ada copy
+            view = memoryview(first)
+            data = view[:n]
+            self._chunks[0] = view[n:]
+        else:
+            # Satu chunk per read, penggabungan frame urusan OutputPump
+            data = self._chunks.pop(0)
+
+        self._buffered -= len(data)
+        if self._buffered < PTY_BUFFER_LIMIT:
+            self._resume_reading()
+        return data
+
+    # ==================== WRITE ====================
+    async def write(self, data: bytes):
+        view = memoryview(data)
+        while view:
+            try:
+                written = os.write(self.master_fd, view)
+                view = view[written:]
+            except BlockingIOError:
+                # Buffer input PTY penuh (paste besar), tunggu sampai writable
+                writable = self._loop.create_future()
+                self._loop.add_writer(self.master_fd, writable.set_result, None)
+                try:
+                    await writable
+                finally:
+                    self._loop.remove_writer(self.master_fd)
+
+    def resize(self, cols: int, rows: int):
+        """Set ukuran PTY, kernel kirim SIGWINCH ke foreground process group"""
+        _set_winsize(self.master_fd, cols, rows)
+
+    # ==================== LIFECYCLE ====================
+    def terminate(self):
+        if self.process.returncode is None:
+            try:
+                self.process.terminate()
+            except ProcessLookupError:
+                pass
+        self.close()
+
+    def kill(self):
+        if self.process.returncode is None:
+            try:
+                self.process.kill()
+            except ProcessLookupError:
+                pass
+
+    async def wait(self) -> int:
+        return await self.process.wait()
+
+    def close(self):
+        if self.master_fd < 0:
+            return
+        self._pause_reading()
+        os.close(self.master_fd)
+        self.master_fd = -1
+        self._eof = True
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
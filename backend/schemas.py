@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 
 # User schemas
 class UserCreate(BaseModel):
@@ -50,6 +50,25 @@ class SSHCommand(BaseModel):
     session_id: str
     command: str
 
+# Streaming exec: output dikirim bertahap, limit opsional menghentikan proses remote
+class ExecStreamRequest(BaseModel):
+    command: str
+    max_bytes: Optional[int] = None
+    max_lines: Optional[int] = None
+
+# Fan-out: satu command ke banyak saved host (default: semua host milik user)
+class FanoutRequest(BaseModel):
+    user_id: int
+    command: str
+    host_ids: Optional[List[int]] = None
+    concurrency: Optional[int] = None
+    timeout: Optional[float] = None
+
+# Profil transport SSH per host: preset + override (lihat backend/transport_profile.py)
+class TransportProfileUpdate(BaseModel):
+    profile: str = "default"
+    options: Optional[Dict[str, Any]] = None
+
 # QuickCommand schemas
 class QuickCommandBase(BaseModel):
     name: str
@@ -0,0 +1,123 @@
+"""Reaper untuk session yang idle.
+
+Setiap session punya paling banyak satu deadline aktif, dijadwalkan ulang
+setiap kali statusnya berubah:
+
+- ``never_attached`` : session dibuat tapi websocket tidak pernah attach
+- ``detached``       : websocket terakhir lepas, shell masih hidup
+- ``disconnected``   : resource sudah ditutup, tinggal entry di registry
+
+Deadline disimpan di heap (min-heap per waktu). Reaper hanya bangun saat
+deadline terdekat jatuh tempo, tanpa scan semua session secara berkala.
+Entry heap yang sudah dibatalkan/dijadwalkan ulang dibiarkan dan dilewati
+saat di-pop (lazy deletion).
+"""
+import asyncio
+import heapq
+import logging
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ==================== KONFIGURASI ====================
+IDLE_TTL_NEVER_ATTACHED = float(os.environ.get("WT_IDLE_TTL_NEVER_ATTACHED", "300"))
+IDLE_TTL_DETACHED = float(os.environ.get("WT_IDLE_TTL_DETACHED", "900"))
+IDLE_TTL_DISCONNECTED = float(os.environ.get("WT_IDLE_TTL_DISCONNECTED", "300"))
+# Batas entry disconnected di registry, yang paling lama dibuang duluan
+MAX_DISCONNECTED_SESSIONS = int(os.environ.get("WT_MAX_DISCONNECTED_SESSIONS", "1000"))
+
+REAP_REASONS = ("never_attached", "detached", "disconnected", "evicted")
+
+
+class SessionReaper:
+    """Timer heap: session_id -> deadline, panggil on_reap saat jatuh tempo"""
+
+    def __init__(self, on_reap: Callable[[str, str], None],
+                 ttls: Optional[Dict[str, float]] = None):
+        self.on_reap = on_reap
+        self.ttls = {
+            "never_attached": IDLE_TTL_NEVER_ATTACHED,
+            "detached": IDLE_TTL_DETACHED,
+            "disconnected": IDLE_TTL_DISCONNECTED,
+        }
+        if ttls:
+            self.ttls.update(ttls)
+
+        self._heap: List[Tuple[float, str, str]] = []
+        self._deadlines: Dict[str, Tuple[float, str]] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.reaped: Dict[str, int] = {reason: 0 for reason in REAP_REASONS}
+
+    def schedule(self, session_id: str, reason: str):
+        """(Re)jadwalkan session untuk di-reap setelah TTL reason-nya habis"""
+        deadline = time.monotonic() + self.ttls[reason]
+        self._deadlines[session_id] = (deadline, reason)
+        heapq.heappush(self._heap, (deadline, session_id, reason))
+
+        # Buang entry basi kalau heap membengkak (attach/detach berulang)
+        if len(self._heap) > 2 * len(self._deadlines) + 64:
+            self._heap = [(d, sid, r) for sid, (d, r) in self._deadlines.items()]
+            heapq.heapify(self._heap)
+
+        self._ensure_running()
+        if self._heap[0][1] == session_id:
+            # Deadline baru jadi yang terdekat, reaper perlu tidur lebih pendek
+            self._wakeup.set()
+
+    def cancel(self, session_id: str):
+        """Session aktif lagi (websocket attach), tidak ada deadline"""
+        self._deadlines.pop(session_id, None)
+
+    def reap_now(self, session_id: str, reason: str):
+        self._deadlines.pop(session_id, None)
+        self._reap(session_id, reason)
+
+    def _reap(self, session_id: str, reason: str):
+        self.reaped[reason] += 1
+        logger.info(f"🧹 Reaping session {session_id} ({reason})")
+        try:
+            self.on_reap(session_id, reason)
+        except Exception as e:
+            logger.error(f"Error reaping session {session_id}: {e}")
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            now = time.monotonic()
+            while self._heap and self._heap[0][0] <= now:
+                deadline, session_id, reason = heapq.heappop(self._heap)
+                if self._deadlines.get(session_id) != (deadline, reason):
+                    # Sudah dibatalkan atau dijadwalkan ulang
+                    continue
+                del self._deadlines[session_id]
+                self._reap(session_id, reason)
+
+            timeout = self._heap[0][0] - now if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def get_status(self) -> Dict:
+        pending = {reason: 0 for reason in self.ttls}
+        for _, reason in self._deadlines.values():
+            pending[reason] += 1
+        next_deadline = min((d for d, _ in self._deadlines.values()), default=None)
+        return {
+            "ttl_seconds": dict(self.ttls),
+            "pending": pending,
+            "next_reap_in": (
+                round(max(0.0, next_deadline - time.monotonic()), 1)
+                if next_deadline is not None else None
+            ),
+            "heap_size": len(self._heap),
+            "reaped": dict(self.reaped),
+        }
@@ -0,0 +1,400 @@
+"""Rekaman session terminal (gaya asciicast v2) untuk audit dan review insiden.
+
+Aktif kalau ``WT_RECORDING_DIR`` diisi. Setiap session menghasilkan tiga file:
+
+- ``<id>.cast.z``   : chunk zlib berurutan (append-only). Setiap chunk berisi
+  event asciicast v2 per baris: ``[t, "o", data]`` output, ``[t, "i", data]``
+  input, ``[t, "r", "COLSxROWS"]`` resize, ``[t, "m", text]`` marker
+  (misal data yang di-drop). ``t`` = detik sejak rekaman mulai.
+- ``<id>.idx``      : index record ukuran tetap per chunk
+  (t pertama, t terakhir, offset, panjang, jumlah event), jadi replay bisa
+  binary search lewat mmap lalu decompress hanya chunk yang diperlukan.
+- ``<id>.json``     : header asciicast + info session, diperbarui saat selesai.
+
+Terminal SSH yang dibuka ulang tanpa resume token mendapat recorder baru
+dengan session id yang sama. Recorder itu melanjutkan file yang ada: offset
+data, waktu (dari ``t_last`` index terakhir), header dan counter diambil dari
+rekaman sebelumnya, lalu ditandai marker ``reopened``.
+
+Hot path (reader loop / serve) hanya append ke list. Encode JSON, kompresi
+dan tulis file dikerjakan satu thread writer bersama, per batch (setiap
+``WT_RECORDING_FLUSH_INTERVAL`` detik atau saat batch mencapai
+``WT_RECORDING_CHUNK_BYTES``). Kalau writer tertinggal lebih dari
+``WT_RECORDING_MAX_PENDING`` byte, output di-drop dan dicatat sebagai marker,
+terminal tidak ikut melambat.
+"""
+import asyncio
+import codecs
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ==================== KONFIGURASI ====================
+RECORDING_DIR = os.environ.get("WT_RECORDING_DIR", "")
+# Input bisa berisi password (sudo, ssh ke host lain): opt-in
+RECORDING_INPUT = os.environ.get("WT_RECORDING_INPUT", "0") == "1"
+RECORDING_CHUNK_BYTES = int(os.environ.get("WT_RECORDING_CHUNK_BYTES", str(256 * 1024)))
+RECORDING_FLUSH_INTERVAL = float(os.environ.get("WT_RECORDING_FLUSH_INTERVAL", "1.0"))
+RECORDING_MAX_PENDING = int(os.environ.get("WT_RECORDING_MAX_PENDING", str(8 * 1024 * 1024)))
+RECORDING_COMPRESS_LEVEL = int(os.environ.get("WT_RECORDING_COMPRESS_LEVEL", "6"))
+# Metadata rekaman yang masih berjalan diperbarui paling sering setiap N detik
+RECORDING_META_INTERVAL = 5.0
+
+# t_first, t_last, offset, length, events
+INDEX_RECORD = struct.Struct("<ddQII")
+_RECORDING_ID = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+
+# Satu thread untuk semua rekaman: file tiap session hanya disentuh thread ini
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="recorder")
+
+
+def recording_paths(directory: str, session_id: str) -> Tuple[str, str, str]:
+    base = os.path.join(directory, session_id)
+    return base + ".cast.z", base + ".idx", base + ".json"
+
+
+class SessionRecorder:
+    """Buffer event satu session + flush batch ke thread writer"""
+
+    def __init__(self, session_id: str, info: Dict, directory: str = RECORDING_DIR,
+                 cols: int = 80, rows: int = 24):
+        self.session_id = session_id
+        self.data_path, self.index_path, self.meta_path = recording_paths(directory, session_id)
+        self.started = time.monotonic()
+        self.header = {
+            "version": 2,
+            "width": cols,
+            "height": rows,
+            "timestamp": int(time.time()),
+            "env": {"TERM": "xterm-256color"},
+            "title": f"{info.get('username', '')}@{info.get('host', '')}",
+        }
+        # owner = user_id pemilik session, endpoint /api/recordings hanya menampilkan miliknya
+        self.info = {k: info.get(k) for k in ("host", "port", "username", "type", "owner")}
+        # Hanya diubah di event loop (counter writer disalin lewat callback
+        # _submit), jadi aman diserialisasi endpoint /api/session(s)
+        self.stats: Dict = {
+            "events": 0,
+            "output_bytes": 0,
+            "input_bytes": 0,
+            "dropped_bytes": 0,
+            "chunks": 0,
+            "compressed_bytes": 0,
+            "write_errors": 0,
+        }
+
+        self._batch: List[Tuple[float, str, object]] = []
+        self._batch_bytes = 0
+        self._pending_bytes = 0
+        self._dropped_since_marker = 0
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._last_write: Optional[asyncio.Future] = None
+        self._closed = False
+
+        # State milik thread writer
+        self._writer_stats = {"chunks": 0, "compressed_bytes": 0, "write_errors": 0}
+        self._decoders = {
+            "o": codecs.getincrementaldecoder("utf-8")(errors="replace"),
+            "i": codecs.getincrementaldecoder("utf-8")(errors="replace"),
+        }
+        self._offset = 0
+        self._meta_written = 0.0
+
+        os.makedirs(directory, exist_ok=True)
+        resumed = self._resume_previous()
+        self._submit(self._write_meta, False, dict(self.stats))
+        if resumed:
+            self._add("m", "reopened", 0)
+
+    def _resume_previous(self) -> bool:
+        """Lanjutkan rekaman session yang sama dari run sebelumnya, kalau ada"""
+        try:
+            self._offset = os.path.getsize(self.data_path)
+        except FileNotFoundError:
+            return False
+
+        with open(self.index_path, "ab+") as f:
+            # Buang record terakhir yang tidak lengkap supaya append tetap sejajar
+            size = f.seek(0, os.SEEK_END)
+            size -= size % INDEX_RECORD.size
+            f.truncate(size)
+            if size:
+                f.seek(size - INDEX_RECORD.size)
+                t_last = INDEX_RECORD.unpack(f.read(INDEX_RECORD.size))[1]
+                self.started = time.monotonic() - t_last
+
+        try:
+            with open(self.meta_path) as f:
+                previous = json.load(f)
+        except (OSError, ValueError):
+            previous = None
+        if previous is not None:
+            self.header = previous.get("header", self.header)
+            for name, value in previous.get("stats", {}).items():
+                if name in self.stats:
+                    self.stats[name] = value
+            self.stats["compressed_bytes"] = self._offset
+            for name in self._writer_stats:
+                self._writer_stats[name] = self.stats[name]
+            # Durasi lanjut dari rekaman sebelumnya kalau index masih kosong
+            self.started = min(self.started, time.monotonic() - previous.get("duration", 0.0))
+        return True
+
+    # ==================== HOT PATH ====================
+    def _add(self, kind: str, data, size: int):
+        if self._closed:
+            return
+        self._batch.append((time.monotonic() - self.started, kind, data))
+        self._batch_bytes += size
+        self._pending_bytes += size
+        self.stats["events"] += 1
+        if self._batch_bytes >= RECORDING_CHUNK_BYTES:
+            self.flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(
+                RECORDING_FLUSH_INTERVAL, self.flush
+            )
+
+    def record_output(self, data):
+        size = len(data)
+        if self._pending_bytes + size > RECORDING_MAX_PENDING:
+            # Writer tertinggal: jangan tahan reader, catat yang hilang
+            self._dropped_since_marker += size
+            self.stats["dropped_bytes"] += size
+            return
+        if self._dropped_since_marker:
+            self._add("m", f"dropped {self._dropped_since_marker} bytes of output", 0)
+            self._dropped_since_marker = 0
+        self.stats["output_bytes"] += size
+        self._add("o", bytes(data), size)
+
+    def record_input(self, data: bytes):
+        if RECORDING_INPUT:
+            self.stats["input_bytes"] += len(data)
+            self._add("i", data, len(data))
+
+    def record_resize(self, cols: int, rows: int):
+        if not self.stats["output_bytes"]:
+            # Resize pertama dari client = ukuran awal terminal
+            self.header.update(width=cols, height=rows)
+        self._add("r", f"{cols}x{rows}", 0)
+
+    # ==================== FLUSH ====================
+    def flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._batch:
+            return
+        batch, size = self._batch, self._batch_bytes
+        self._batch, self._batch_bytes = [], 0
+        future = self._submit(self._write_chunk, batch, dict(self.stats))
+        future.add_done_callback(lambda _: self._written(size))
+
+    def _written(self, size: int):
+        # Callback di event loop, jadi counter tidak diubah dari dua thread
+        self._pending_bytes -= size
+
+    def _submit(self, fn, *args) -> asyncio.Future:
+        """Jalankan fn di thread writer; fn return salinan _writer_stats"""
+        future = asyncio.get_running_loop().run_in_executor(_writer, fn, *args)
+        future.add_done_callback(self._update_writer_stats)
+        self._last_write = future
+        return future
+
+    def _update_writer_stats(self, future: asyncio.Future):
+        if not future.cancelled() and future.exception() is None:
+            self.stats.update(future.result())
+
+    async def close(self):
+        """Flush sisa batch, tulis metadata akhir, tunggu writer selesai"""
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._submit(self._write_meta, True, dict(self.stats))
+        try:
+            await self._last_write
+        except Exception as e:
+            logger.error(f"Recording close failed ({self.session_id}): {e}")
+
+    # ==================== THREAD WRITER ====================
+    def _write_chunk(self, batch: List[Tuple[float, str, object]], stats: Dict) -> Dict:
+        lines = []
+        for t, kind, data in batch:
+            if kind in self._decoders:
+                data = self._decoders[kind].decode(data)
+                if not data:
+                    continue
+            lines.append(json.dumps([round(t, 6), kind, data], ensure_ascii=False))
+        try:
+            if lines:
+                raw = ("\n".join(lines) + "\n").encode("utf-8")
+                compressed = zlib.compress(raw, RECORDING_COMPRESS_LEVEL)
+                with open(self.data_path, "ab") as f:
+                    f.write(compressed)
+                with open(self.index_path, "ab") as f:
+                    f.write(INDEX_RECORD.pack(
+                        batch[0][0], batch[-1][0], self._offset, len(compressed), len(lines)
+                    ))
+                self._offset += len(compressed)
+                self._writer_stats["chunks"] += 1
+                self._writer_stats["compressed_bytes"] = self._offset
+            if time.monotonic() - self._meta_written >= RECORDING_META_INTERVAL:
+                self._write_meta(False, stats)
+        except OSError as e:
+            self._writer_stats["write_errors"] += 1
+            logger.error(f"Recording write failed ({self.session_id}): {e}")
+        return dict(self._writer_stats)
+
+    def _write_meta(self, finished: bool, stats: Dict) -> Dict:
+        self._meta_written = time.monotonic()
+        meta = {
+            "session_id": self.session_id,
+            "header": self.header,
+            "info": self.info,
+            "finished": finished,
+            "duration": round(time.monotonic() - self.started, 3),
+            # Snapshot dari event loop saat submit + counter writer terbaru
+            "stats": {**stats, **self._writer_stats},
+        }
+        tmp = self.meta_path + ".tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(meta, f)
+            os.replace(tmp, self.meta_path)
+        except OSError as e:
+            self._writer_stats["write_errors"] += 1
+            logger.error(f"Recording meta write failed ({self.session_id}): {e}")
+        return dict(self._writer_stats)
+
+
+def start_recording(session_id: str, info: Dict) -> Optional[SessionRecorder]:
+    """Recorder untuk session baru, None kalau rekaman tidak diaktifkan"""
+    if not RECORDING_DIR or not _RECORDING_ID.match(session_id):
+        return None
+    try:
+        return SessionRecorder(session_id, info)
+    except OSError as e:
+        logger.error(f"Cannot start recording for {session_id}: {e}")
+        return None
+
+
+# ==================== REPLAY ====================
+def _valid_id(session_id: str) -> bool:
+    return bool(RECORDING_DIR) and bool(_RECORDING_ID.match(session_id))
+
+
+def list_recordings() -> List[Dict]:
+    if not RECORDING_DIR or not os.path.isdir(RECORDING_DIR):
+        return []
+    recordings = []
+    for name in sorted(os.listdir(RECORDING_DIR)):
+        if name.endswith(".json"):
+            meta = get_recording(name[:-len(".json")])
+            if meta is not None:
+                recordings.append(meta)
+    return recordings
+
+
+def get_recording(session_id: str) -> Optional[Dict]:
+    if not _valid_id(session_id):
+        return None
+    _, _, meta_path = recording_paths(RECORDING_DIR, session_id)
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class RecordingReader:
+    """Baca rekaman lewat mmap: cari chunk dari index, decompress seperlunya"""
+
+    def __init__(self, session_id: str, directory: Optional[str] = None):
+        self.data_path, self.index_path, _ = recording_paths(directory or RECORDING_DIR, session_id)
+        self._data = self._map(self.data_path)
+        self._index = self._map(self.index_path)
+        # Rekaman yang masih berjalan: record terakhir bisa belum lengkap
+        self.chunks = len(self._index) // INDEX_RECORD.size if self._index is not None else 0
+
+    @staticmethod
+    def _map(path: str) -> Optional[mmap.mmap]:
+        try:
+            with open(path, "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return None
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            # Belum ada chunk yang ditulis
+            return None
+
+    def close(self):
+        for mapped in (self._data, self._index):
+            if mapped is not None:
+                mapped.close()
+
+    def record(self, i: int) -> Tuple[float, float, int, int, int]:
+        return INDEX_RECORD.unpack_from(self._index, i * INDEX_RECORD.size)
+
+    def find_chunk(self, start: float) -> int:
+        """Chunk pertama yang masih punya event di t >= start"""
+        lo, hi = 0, self.chunks
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.record(mid)[1] < start:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def events(self, start: float = 0.0):
+        """Generator event (t, kind, data) sejak detik ke-start"""
+        for i in range(self.find_chunk(start), self.chunks):
+            _, _, offset, length, _ = self.record(i)
+            if self._data is None or offset + length > len(self._data):
+                break
+            raw = zlib.decompress(self._data[offset:offset + length])
+            # Split di b"\n" saja: newline di data sudah di-escape json,
+            # str.splitlines() juga memotong di U+2028 dan sejenisnya
+            for line in raw.split(b"\n"):
+                if not line:
+                    continue
+                t, kind, data = json.loads(line)
+                if t >= start:
+                    yield t, kind, data
+
+
+async def replay(session_id: str, start: float = 0.0, speed: float = 1.0,
+                 include_input: bool = False) -> AsyncIterator[str]:
+    """Stream rekaman sebagai baris asciicast v2, waktu relatif terhadap start.
+
+    speed 1 = real time, 2 = dua kali lebih cepat, 0 = secepatnya.
+    """
+    meta = get_recording(session_id)
+    if meta is None:
+        raise FileNotFoundError(session_id)
+    reader = RecordingReader(session_id)
+    try:
+        yield json.dumps(meta["header"]) + "\n"
+        began = time.monotonic()
+        for t, kind, data in reader.events(start):
+            if kind == "i" and not include_input:
+                continue
+            at = t - start
+            if speed > 0:
+                delay = at / speed - (time.monotonic() - began)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            yield json.dumps([round(at, 6), kind, data], ensure_ascii=False) + "\n"
+    finally:
+        reader.close()
@@ -0,0 +1,484 @@
+"""Mode sharded: session dibagi ke beberapa proses worker (satu per core).
+
+``ssh_manager`` adalah singleton per proses, jadi semua crypto SSH dan
+pumping websocket berbagi satu event loop. Menjalankan ``uvicorn
+--workers N`` biasa tidak bisa, karena ``/api/connect`` dan
+``/ws/terminal/{id}`` bisa jatuh ke worker yang berbeda.
+
+Di mode ini::
+
+    browser --TCP--> front (proses ini) --Unix socket--> shard 0..N-1
+                                                         (uvicorn backend.main:app)
+
+- Worker ``i`` dijalankan dengan ``WT_SHARD_INDEX=i`` dan
+  ``WT_SHARD_COUNT=N``. Session id yang dibuat worker tetap berbentuk UUID,
+  tapi dipilih supaya ``shard_of(id) == i`` (crc32 % N). Front cukup
+  menghitung ulang untuk tahu pemilik session, tanpa tabel routing.
+- Front adalah proxy byte ringan: hanya membaca request line, lalu
+  menyambung koneksi ke shard pemilik dan meneruskan byte dua arah.
+  Websocket tidak di-parse ulang, crypto SSH dan JSON tetap di shard.
+
+Routing:
+
+- ``/ws/terminal/{id}``, ``/api/session/{id}``, ``/api/disconnect/{id}``,
+  ``/api/exec/stream/{id}`` -> ``shard_of(id)``
+- ``/api/connect``, ``/api/connect-local``, ``/api/exec/fanout`` -> round
+  robin (session baru / kerja tanpa state)
+- ``/api/connect-saved/{host_id}`` -> ``host_shard(host_id)``: tab ke saved
+  host yang sama berbagi koneksi pool (dan koneksi prewarm) di satu shard.
+  ``/api/diagnostics/connect/{host_id}`` ikut ke sana, tempat trace
+  connect host itu dicatat
+- ``GET /api/sessions`` dan ``GET /metrics`` -> digabung dari semua shard
+  (sample metrics diberi label ``shard``)
+- ``GET /api/ssh-pool`` -> gabungan entry pool semua shard (diberi field
+  ``shard``); ``GET /api/connect-cache`` dan ``GET /api/prewarm`` -> status
+  per shard, ``{"<i>": {...}}``
+- ``GET /api/shards`` -> status worker dari front
+- lainnya (auth, hosts, quick commands, ...) -> shard 0, supaya cache
+  per proses (user_cache, principal_cache) tetap konsisten
+- header ``X-WT-Shard: <i>`` memaksa request ke shard tertentu, misal untuk
+  ``/api/session-reaper`` atau ``/api/auth-cache`` per shard
+- perubahan user di-broadcast worker ke shard lain lewat
+  ``POST /api/auth-cache/invalidate/{user_id}?local=true``, principal_cache
+  di semua shard langsung dibuang (tidak menunggu TTL)
+
+Request non-websocket diteruskan dengan ``Connection: close`` (satu request
+per koneksi ke front). Butuh Unix socket, jadi hanya Linux/macOS.
+
+Jalankan dari root repo:
+    python -m backend.sharding --host 0.0.0.0 --port 8000 --shards 4
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ==================== KONFIGURASI ====================
+# Diisi oleh front untuk setiap worker; default = mode satu proses biasa
+SHARD_INDEX = int(os.environ.get("WT_SHARD_INDEX", "0"))
+SHARD_COUNT = int(os.environ.get("WT_SHARD_COUNT", "1"))
+
+SHARD_SOCKET_DIR = os.environ.get("WT_SHARD_SOCKET_DIR", "")
+SHARD_START_TIMEOUT = float(os.environ.get("WT_SHARD_START_TIMEOUT", "30"))
+SHARD_HEAD_LIMIT = 64 * 1024
+PIPE_CHUNK = 64 * 1024
+
+SHARD_HEADER = "x-wt-shard"
+
+_SESSION_PATH = re.compile(r"^/(?:ws/terminal|api/session|api/disconnect|api/exec/stream)/([^/]+)$")
+_NEW_SESSION_PATH = re.compile(r"^/api/(?:connect|connect-local|exec/fanout)$")
+_SAVED_HOST_PATH = re.compile(r"^/api/(?:connect-saved|diagnostics/connect)/([^/]+)$")
+# State per proses yang dijawab front dengan menggabungkan semua shard
+_MERGED_PATHS = ("/api/sessions", "/metrics", "/api/ssh-pool", "/api/connect-cache", "/api/prewarm")
+
+
+# ==================== SESSION ID ====================
+def shard_of(session_id: str, count: int = SHARD_COUNT) -> int:
+    """Shard pemilik session id (stabil di semua proses)"""
+    if count <= 1:
+        return 0
+    return zlib.crc32(session_id.encode("utf-8", "replace")) % count
+
+
+def new_session_id() -> str:
+    """UUID baru yang dimiliki shard proses ini (rata-rata SHARD_COUNT percobaan)"""
+    while True:
+        session_id = str(uuid.uuid4())
+        if shard_of(session_id) == SHARD_INDEX:
+            return session_id
+
+
+def host_shard(host_id, count: int = SHARD_COUNT) -> int:
+    """Shard yang melayani connect ke saved host ini"""
+    return shard_of(f"host:{host_id}", count)
+
+
+# ==================== WORKER ====================
+class ShardWorker:
+    """Satu proses uvicorn backend.main:app di Unix socket"""
+
+    def __init__(self, index: int, count: int, socket_dir: str, log_level: str):
+        self.index = index
+        self.count = count
+        self.socket_path = os.path.join(socket_dir, f"shard-{index}.sock")
+        self.log_level = log_level
+        self.process: Optional[subprocess.Popen] = None
+        self.started_at = 0.0
+        self.restarts = 0
+        self.active = 0
+        self.proxied = 0
+
+    def spawn(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        env = dict(os.environ, WT_SHARD_INDEX=str(self.index), WT_SHARD_COUNT=str(self.count),
+                   WT_SHARD_SOCKET_DIR=os.path.dirname(self.socket_path))
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "backend.main:app",
+             "--uds", self.socket_path, "--log-level", self.log_level],
+            env=env,
+        )
+        self.started_at = time.time()
+        logger.info(f"🚀 Shard {self.index} started (pid {self.process.pid})")
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    async def wait_ready(self, timeout: float = SHARD_START_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if not self.alive:
+                raise RuntimeError(f"Shard {self.index} exited during startup")
+            try:
+                status, _, _ = await shard_request(self, "GET", "/")
+                if status == 200:
+                    return
+            except OSError:
+                pass
+            await asyncio.sleep(0.1)
+        raise RuntimeError(f"Shard {self.index} did not become ready in {timeout}s")
+
+    def stop(self):
+        if self.alive:
+            self.process.terminate()
+
+    def get_status(self) -> Dict:
+        return {
+            "shard": self.index,
+            "pid": self.process.pid if self.process else None,
+            "alive": self.alive,
+            "started_at": self.started_at,
+            "restarts": self.restarts,
+            "active_connections": self.active,
+            "proxied_connections": self.proxied,
+        }
+
+
+# ==================== HTTP KECIL ====================
+async def shard_request(worker: ShardWorker, method: str, target: str,
+                        headers: Optional[List[Tuple[str, str]]] = None) -> Tuple[int, Dict, bytes]:
+    """Request sekali pakai ke shard (Connection: close, body dibaca sampai EOF)"""
+    reader, writer = await asyncio.open_unix_connection(worker.socket_path)
+    try:
+        lines = [f"{method} {target} HTTP/1.1", "Host: shard", "Connection: close"]
+        lines += [f"{name}: {value}" for name, value in headers or []]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        await writer.drain()
+        raw = await reader.read()
+    finally:
+        writer.close()
+
+    head, _, body = raw.partition(b"\r\n\r\n")
+    status_line, *header_lines = head.decode("latin-1").split("\r\n")
+    response_headers = {}
+    for line in header_lines:
+        name, _, value = line.partition(":")
+        response_headers[name.strip().lower()] = value.strip()
+    return int(status_line.split()[1]), response_headers, body
+
+
+async def request_other_shards(method: str, target: str) -> list:
+    """Dari dalam worker: request ke semua shard lain, hasil/exception per shard"""
+    if SHARD_COUNT <= 1 or not SHARD_SOCKET_DIR:
+        return []
+    workers = [ShardWorker(i, SHARD_COUNT, SHARD_SOCKET_DIR, "warning")
+               for i in range(SHARD_COUNT) if i != SHARD_INDEX]
+    return await asyncio.gather(
+        *(shard_request(worker, method, target) for worker in workers),
+        return_exceptions=True,
+    )
+
+
+def _response(status: int, reason: str, body: bytes, content_type: str) -> bytes:
+    head = (
+        f"HTTP/1.1 {status} {reason}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Access-Control-Allow-Origin: *\r\n"
+        "Connection: close\r\n\r\n"
+    )
+    return head.encode("latin-1") + body
+
+
+def _json_response(status: int, reason: str, payload) -> bytes:
+    return _response(status, reason, json.dumps(payload).encode(), "application/json")
+
+
+def merge_metrics(texts: List[Tuple[int, str]]) -> str:
+    """Gabung exposition (shard, text): sample diberi label shard, family tetap berurutan"""
+    families: Dict[str, Dict] = {}
+    for shard, text in texts:
+        family = None
+        for line in text.splitlines():
+            if line.startswith("# HELP ") or line.startswith("# TYPE "):
+                name = line.split(" ", 3)[2]
+                family = families.setdefault(name, {"meta": [], "samples": []})
+                if line not in family["meta"]:
+                    family["meta"].append(line)
+            elif line and not line.startswith("#") and family is not None:
+                family["samples"].append(_label_sample(line, shard))
+
+    lines = []
+    for family in families.values():
+        lines += family["meta"] + family["samples"]
+    return "\n".join(lines) + "\n"
+
+
+def _label_sample(line: str, shard: int) -> str:
+    name, brace, rest = line.partition("{")
+    if brace and " " not in name:
+        return f'{name}{{shard="{shard}",{rest}'
+    name, _, value = line.partition(" ")
+    return f'{name}{{shard="{shard}"}} {value}'
+
+
+# ==================== FRONT ====================
+class ShardFront:
+    """Terima koneksi TCP, teruskan ke shard pemilik lewat Unix socket"""
+
+    def __init__(self, shards: int, socket_dir: str, log_level: str = "info"):
+        self.workers = [ShardWorker(i, shards, socket_dir, log_level) for i in range(shards)]
+        self.socket_dir = socket_dir
+        self._next = 0
+        self._stopping = False
+        self._supervisor: Optional[asyncio.Task] = None
+
+    # ==================== LIFECYCLE ====================
+    async def start_workers(self):
+        # Shard 0 dulu: dia yang membuat tabel database (init_db)
+        self.workers[0].spawn()
+        await self.workers[0].wait_ready()
+        for worker in self.workers[1:]:
+            worker.spawn()
+        await asyncio.gather(*(worker.wait_ready() for worker in self.workers[1:]))
+        self._supervisor = asyncio.get_running_loop().create_task(self._supervise())
+
+    async def _supervise(self):
+        """Worker yang mati di-restart; session miliknya memang sudah hilang"""
+        while not self._stopping:
+            await asyncio.sleep(1.0)
+            for worker in self.workers:
+                if not worker.alive and not self._stopping:
+                    logger.warning(
+                        f"⚠️ Shard {worker.index} exited with {worker.process.returncode}, restarting"
+                    )
+                    worker.restarts += 1
+                    worker.spawn()
+                    try:
+                        await worker.wait_ready()
+                    except RuntimeError as e:
+                        logger.error(f"❌ {e}")
+
+    def stop_workers(self):
+        self._stopping = True
+        if self._supervisor is not None:
+            self._supervisor.cancel()
+        for worker in self.workers:
+            worker.stop()
+        for worker in self.workers:
+            if worker.process is None:
+                continue
+            try:
+                worker.process.wait(10)
+            except subprocess.TimeoutExpired:
+                worker.process.kill()
+
+    # ==================== ROUTING ====================
+    def _round_robin(self) -> ShardWorker:
+        for _ in range(len(self.workers)):
+            worker = self.workers[self._next % len(self.workers)]
+            self._next += 1
+            if worker.alive:
+                return worker
+        return self.workers[0]
+
+    def route(self, method: str, path: str, headers: Dict[str, str]) -> Optional[ShardWorker]:
+        """Shard tujuan, None kalau request dijawab front sendiri"""
+        pinned = headers.get(SHARD_HEADER)
+        if pinned is not None and pinned.isdigit() and int(pinned) < len(self.workers):
+            return self.workers[int(pinned)]
+
+        match = _SESSION_PATH.match(path)
+        if match:
+            return self.workers[shard_of(match.group(1), len(self.workers))]
+        match = _SAVED_HOST_PATH.match(path)
+        if match:
+            return self.workers[host_shard(match.group(1), len(self.workers))]
+        if _NEW_SESSION_PATH.match(path):
+            return self._round_robin()
+        if method == "GET" and (path in _MERGED_PATHS or path == "/api/shards"):
+            return None
+        return self.workers[0]
+
+    async def _answer(self, path: str, writer: asyncio.StreamWriter):
+        if path == "/api/shards":
+            payload = [worker.get_status() for worker in self.workers]
+            writer.write(_json_response(200, "OK", payload))
+            return
+
+        results = await asyncio.gather(
+            *(shard_request(worker, "GET", path) for worker in self.workers),
+            return_exceptions=True,
+        )
+        # Shard yang sedang restart dilewati, bukan bikin seluruh response gagal
+        bodies = [
+            (worker.index, result[2]) for worker, result in zip(self.workers, results)
+            if not isinstance(result, BaseException) and result[0] == 200
+        ]
+        if path == "/metrics":
+            text = merge_metrics([(shard, body.decode()) for shard, body in bodies])
+            writer.write(_response(200, "OK", text.encode(), "text/plain; version=0.0.4"))
+        elif path == "/api/sessions":
+            sessions = {}
+            for _, body in bodies:
+                sessions.update(json.loads(body))
+            writer.write(_json_response(200, "OK", sessions))
+        elif path == "/api/ssh-pool":
+            entries = [
+                {"shard": shard, **entry}
+                for shard, body in bodies for entry in json.loads(body)
+            ]
+            writer.write(_json_response(200, "OK", entries))
+        else:
+            # Status per proses (cache, counter) tidak bisa dijumlah begitu saja
+            writer.write(_json_response(200, "OK", {str(shard): json.loads(body) for shard, body in bodies}))
+
+    # ==================== PROXY ====================
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except asyncio.LimitOverrunError:
+                writer.write(_json_response(431, "Request Header Fields Too Large",
+                                            {"detail": "Request header too large"}))
+                return
+            except asyncio.IncompleteReadError:
+                return
+
+            request_line, *header_lines = head[:-4].decode("latin-1").split("\r\n")
+            try:
+                method, target, _ = request_line.split(" ", 2)
+            except ValueError:
+                writer.write(_json_response(400, "Bad Request", {"detail": "Bad request line"}))
+                return
+            headers = {}
+            for line in header_lines:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            path = target.split("?", 1)[0]
+            worker = self.route(method, path, headers)
+            if worker is None:
+                await self._answer(path, writer)
+                return
+            await self._proxy(worker, head, header_lines, request_line, headers, reader, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # Front sedang shutdown, koneksi yang masih terbuka ikut ditutup
+            pass
+        except Exception as e:
+            logger.error(f"❌ Shard front error: {e}", exc_info=True)
+        finally:
+            writer.close()
+
+    async def _proxy(self, worker: ShardWorker, head: bytes, header_lines: List[str],
+                     request_line: str, headers: Dict[str, str],
+                     reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            upstream_reader, upstream_writer = await asyncio.open_unix_connection(
+                worker.socket_path, limit=SHARD_HEAD_LIMIT
+            )
+        except OSError:
+            writer.write(_json_response(502, "Bad Gateway",
+                                        {"detail": f"Shard {worker.index} unavailable"}))
+            return
+
+        if "upgrade" not in headers.get("connection", "").lower():
+            # Satu request per koneksi: front tidak perlu mem-parse batas response
+            kept = [
+                line for line in header_lines
+                if line.split(":", 1)[0].strip().lower() not in ("connection", "keep-alive")
+            ]
+            head = ("\r\n".join([request_line, *kept, "Connection: close"]) + "\r\n\r\n").encode("latin-1")
+
+        worker.active += 1
+        worker.proxied += 1
+        upstream_writer.write(head)
+        to_shard = asyncio.ensure_future(_pipe(reader, upstream_writer))
+        try:
+            # Response/websocket selesai saat shard menutup koneksi
+            await _pipe(upstream_reader, writer)
+        finally:
+            worker.active -= 1
+            to_shard.cancel()
+            upstream_writer.close()
+
+
+async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        while True:
+            data = await reader.read(PIPE_CHUNK)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+        if writer.can_write_eof():
+            writer.write_eof()
+    except (ConnectionError, OSError):
+        pass
+
+
+# ==================== ENTRY POINT ====================
+async def serve(host: str, port: int, shards: int, log_level: str):
+    socket_dir = SHARD_SOCKET_DIR or tempfile.mkdtemp(prefix="wt-shards-")
+    os.makedirs(socket_dir, exist_ok=True)
+    front = ShardFront(shards, socket_dir, log_level)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    try:
+        await front.start_workers()
+        server = await asyncio.start_server(front.handle, host, port, limit=SHARD_HEAD_LIMIT)
+        logger.info(f"✅ Shard front on http://{host}:{port} with {shards} shard(s)")
+        async with server:
+            await stop.wait()
+    finally:
+        front.stop_workers()
+        if not SHARD_SOCKET_DIR:
+            shutil.rmtree(socket_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--shards", type=int,
+                        default=int(os.environ.get("WT_SHARDS", str(os.cpu_count() or 1))),
+                        help="jumlah proses worker (default: jumlah core)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper())
+    asyncio.run(serve(args.host, args.port, max(1, args.shards), args.log_level))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""Pipeline connect SSH: DNS cache, happy eyeballs, klasifikasi error, cache algoritma.
+
+Dipakai ``SSHManager._open_connection`` / ``_connect_attempt``:
+
+- ``dns_cache``: hasil getaddrinfo per (host, port) disimpan
+  ``WT_DNS_CACHE_TTL`` detik (LRU ``WT_DNS_CACHE_SIZE``). Dibuang kalau
+  semua alamatnya gagal di-connect, supaya host yang pindah IP cepat pulih.
+- ``open_socket``: happy eyeballs (RFC 8305) di atas alamat hasil resolve.
+  Alamat diselang-seling per family (IPv6, IPv4, IPv6, ...), percobaan
+  berikutnya dimulai setelah ``WT_HAPPY_EYEBALLS_DELAY`` atau langsung saat
+  percobaan sebelumnya gagal. Yang pertama tersambung menang, sisanya
+  dibatalkan. IPv6 yang di-blackhole tidak lagi menghabiskan seluruh timeout.
+- ``classify_connect_error``: alasan gagal (auth, refused, timeout, ...).
+  Hanya ``negotiation`` (tidak ada algoritma yang cocok) yang layak dicoba
+  ulang dengan daftar algoritma lengkap, sisanya langsung gagal.
+- ``algorithm_cache``: per (host, port, profil transport), apakah connect
+  terakhir butuh fallback semua algoritma dan algoritma apa yang dipakai.
+  Connect berikutnya ke host lama langsung memakai set itu tanpa percobaan
+  pertama yang pasti gagal.
+"""
+import asyncio
+import os
+import socket
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import asyncssh
+
+from backend.transport_profile import connect_options
+
+# ==================== KONFIGURASI ====================
+DNS_CACHE_TTL = float(os.environ.get("WT_DNS_CACHE_TTL", "60"))
+DNS_CACHE_SIZE = int(os.environ.get("WT_DNS_CACHE_SIZE", "256"))
+HAPPY_EYEBALLS_DELAY = float(os.environ.get("WT_HAPPY_EYEBALLS_DELAY", "0.25"))
+ALGORITHM_CACHE_SIZE = int(os.environ.get("WT_ALGORITHM_CACHE_SIZE", "1024"))
+# Server yang di-upgrade tidak terkunci selamanya di algoritma lama
+ALGORITHM_CACHE_TTL = float(os.environ.get("WT_ALGORITHM_CACHE_TTL", "86400"))
+
+CONNECT_ERROR_REASONS = (
+    "auth", "host_key", "negotiation", "lost", "protocol", "disconnected",
+    "dns", "refused", "timeout", "unreachable", "other",
+)
+# Retry dengan semua algoritma hanya menolong kalau negosiasi yang gagal
+RETRYABLE_REASONS = frozenset({"negotiation"})
+
+CONNECT_ERROR_HINTS = {
+    "auth": "Authentication failed - cek username/password",
+    "host_key": "Host key verification failed - pastikan known_hosts=None",
+    "refused": "Connection refused - cek host/port dan firewall",
+    "timeout": "Timeout - server tidak merespon",
+    "dns": "DNS lookup failed - cek nama host",
+    "unreachable": "Host unreachable - cek jaringan/route",
+    "lost": "Server menutup koneksi sebelum handshake selesai (MaxStartups/fail2ban?)",
+}
+
+
+def classify_connect_error(error: BaseException) -> str:
+    """Alasan connect gagal, salah satu CONNECT_ERROR_REASONS"""
+    if isinstance(error, asyncssh.PermissionDenied):
+        return "auth"
+    if isinstance(error, asyncssh.HostKeyNotVerifiable):
+        return "host_key"
+    if isinstance(error, asyncssh.KeyExchangeFailed):
+        return "negotiation"
+    if isinstance(error, asyncssh.ConnectionLost):
+        return "lost"
+    if isinstance(error, asyncssh.ProtocolError):
+        return "protocol"
+    if isinstance(error, asyncssh.Error):
+        return "disconnected"
+    if isinstance(error, socket.gaierror):
+        return "dns"
+    if isinstance(error, ConnectionRefusedError):
+        return "refused"
+    # TimeoutError turunan OSError, cek lebih dulu
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError)):
+        return "timeout"
+    if isinstance(error, OSError):
+        return "unreachable"
+    return "other"
+
+
+# ==================== DNS CACHE ====================
+class DNSCache:
+    """(host, port) -> hasil getaddrinfo, dengan TTL dan batas LRU"""
+
+    def __init__(self, ttl: float = DNS_CACHE_TTL, size: int = DNS_CACHE_SIZE):
+        self.ttl = ttl
+        self.size = size
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[float, List]]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "invalidated": 0}
+
+    async def resolve(self, host: str, port: int) -> List:
+        key = (host, port)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[1]
+
+        self.stats["misses"] += 1
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        if self.ttl > 0:
+            self._entries[key] = (time.monotonic() + self.ttl, infos)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return infos
+
+    def invalidate(self, host: str, port: int):
+        if self._entries.pop((host, port), None) is not None:
+            self.stats["invalidated"] += 1
+
+    def get_status(self) -> Dict:
+        return {"entries": len(self._entries), "ttl": self.ttl, "size": self.size, **self.stats}
+
+
+dns_cache = DNSCache()
+
+
+# ==================== HAPPY EYEBALLS ====================
+def _interleave(infos: List) -> List:
+    """Selang-seling family, mulai dari family alamat pertama (RFC 8305 4)"""
+    by_family: "OrderedDict[int, List]" = OrderedDict()
+    for info in infos:
+        by_family.setdefault(info[0], []).append(info)
+    queues = list(by_family.values())
+    ordered = []
+    while any(queues):
+        for queue in queues:
+            if queue:
+                ordered.append(queue.pop(0))
+    return ordered
+
+
+async def _connect_address(info) -> socket.socket:
+    family, type_, proto, _, address = info
+    sock = socket.socket(family, type_, proto)
+    sock.setblocking(False)
+    try:
+        await asyncio.get_running_loop().sock_connect(sock, address)
+    except BaseException:
+        sock.close()
+        raise
+    return sock
+
+
+def _close_late_winner(task: asyncio.Task):
+    # Percobaan yang tersambung setelah pemenang dipilih
+    if not task.cancelled() and task.exception() is None:
+        task.result().close()
+
+
+async def open_socket(host: str, port: int, trace, delay: float = HAPPY_EYEBALLS_DELAY) -> socket.socket:
+    """DNS (lewat cache) + TCP connect happy eyeballs, fase dicatat di trace"""
+    infos = await dns_cache.resolve(host, port)
+    trace.mark('dns')
+    candidates = _interleave(infos)
+    if not candidates:
+        raise OSError(f"No address for {host}:{port}")
+
+    loop = asyncio.get_running_loop()
+    pending = set()
+    errors: List[BaseException] = []
+    next_index = 0
+
+    def start_next():
+        nonlocal next_index
+        pending.add(loop.create_task(_connect_address(candidates[next_index])))
+        next_index += 1
+
+    try:
+        start_next()
+        while pending:
+            timeout = delay if next_index < len(candidates) else None
+            done, _ = await asyncio.wait(pending, timeout=timeout,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                # Percobaan yang berjalan belum selesai: mulai alamat berikutnya
+                start_next()
+                continue
+
+            winner = None
+            for task in done:
+                pending.discard(task)
+                if task.exception() is not None:
+                    errors.append(task.exception())
+                elif winner is None:
+                    winner = task.result()
+                else:
+                    task.result().close()
+            if winner is not None:
+                trace.mark('tcp')
+                return winner
+            if next_index < len(candidates):
+                start_next()
+    finally:
+        # Termasuk saat dibatalkan timeout dari luar: jangan tinggalkan socket
+        for task in pending:
+            task.cancel()
+            task.add_done_callback(_close_late_winner)
+
+    # Semua alamat gagal: mungkin host pindah IP, resolve ulang lain kali
+    dns_cache.invalidate(host, port)
+    raise errors[-1]
+
+
+# ==================== CACHE ALGORITMA ====================
+class AlgorithmCache:
+    """(host, port, transport_key) -> set algoritma connect terakhir yang berhasil"""
+
+    def __init__(self, size: int = ALGORITHM_CACHE_SIZE, ttl: float = ALGORITHM_CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self._entries: "OrderedDict[tuple, Dict]" = OrderedDict()
+        self.stats = {"hits": 0, "stale": 0}
+
+    def get(self, key: tuple) -> Optional[Dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry["expires"] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def remember(self, key: tuple, conn, compat: bool):
+        self._entries[key] = {
+            "compat": compat,
+            "encryption_alg": conn.get_extra_info('send_cipher'),
+            "mac_alg": conn.get_extra_info('send_mac'),
+            "compression_alg": conn.get_extra_info('send_compression'),
+            "updated_at": time.time(),
+            "expires": time.monotonic() + self.ttl,
+        }
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def forget(self, key: tuple):
+        if self._entries.pop(key, None) is not None:
+            self.stats["stale"] += 1
+
+    def first_attempt(self, key: tuple, transport: Optional[Dict]) -> Tuple[int, Dict]:
+        """(method, opsi asyncssh) untuk percobaan pertama
+
+        Host yang terakhir butuh fallback langsung memakai daftar lengkap
+        dengan algoritma yang dulu terpilih di depan.
+        """
+        entry = self.get(key)
+        if entry is None or not entry["compat"]:
+            return 1, connect_options(transport)
+
+        self.stats["hits"] += 1
+        options = connect_options(transport, compat=True)
+        for name, alg in (("encryption_algs", entry["encryption_alg"]),
+                          ("mac_algs", entry["mac_alg"]),
+                          ("compression_algs", entry["compression_alg"])):
+            if alg in options[name]:
+                options[name] = [alg] + [other for other in options[name] if other != alg]
+        return 2, options
+
+    def get_status(self) -> Dict:
+        return {
+            "entries": len(self._entries),
+            "compat_hosts": sum(1 for entry in self._entries.values() if entry["compat"]),
+            **self.stats,
+        }
+
+
+algorithm_cache = AlgorithmCache()
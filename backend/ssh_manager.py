@@ -2,13 +2,27 @@ import asyncio
 import asyncssh
 import subprocess
 import platform
-from typing import Dict, Optional
+from typing import AsyncIterator, Dict, Optional, Tuple
 import logging
 import asyncio.subprocess as asp
 import os
 import threading
 import queue
 import signal
+import hashlib
+import time
+import hmac
+
+from backend.connect_trace import ConnectTrace, connect_diagnostics
+from backend.metrics import PREWARM, observe_connect
+from backend.session_reaper import MAX_DISCONNECTED_SESSIONS, SessionReaper
+from backend.session_recorder import start_recording
+from backend.terminal_protocol import TerminalChannel, input_as_text
+from backend.ssh_connect import (
+    CONNECT_ERROR_HINTS, RETRYABLE_REASONS, algorithm_cache, classify_connect_error, open_socket
+)
+from backend.transport_profile import connect_options, negotiated_transport, transport_key
+from backend.terminal_session import PipeShellIO, SSHShellIO, TerminalSession, WinptyShellIO
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -24,103 +38,486 @@ except ImportError:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# ==================== PTY IMPORT (Linux) ====================
+try:
+    from backend.pty_shell import PtyShell
+    PTY_AVAILABLE = True
+except ImportError:
+    PTY_AVAILABLE = False
+
+# ==================== SSH CONNECTION POOL ====================
+# Tab-tab ke host+user+credential yang sama berbagi satu SSHClientConnection,
+# masing-masing tab cukup membuka channel baru
+SSH_MAX_CHANNELS_PER_CONNECTION = int(os.environ.get("WT_SSH_MAX_CHANNELS", "8"))
+SSH_POOL_LINGER_SECONDS = float(os.environ.get("WT_SSH_POOL_LINGER", "30"))
+
+# ==================== EXEC STREAMING ====================
+EXEC_READ_SIZE = 64 * 1024
+# Batas output execute_command (versi buffered), stream endpoint pakai limit sendiri
+EXEC_MAX_BYTES = int(os.environ.get("WT_EXEC_MAX_BYTES", str(8 * 1024 * 1024)))
+
+# ==================== CONNECT ====================
+# Batas total satu connect (DNS + TCP + kex + auth, termasuk retry)
+SSH_CONNECT_TIMEOUT = float(os.environ.get("WT_SSH_CONNECT_TIMEOUT", "30"))
+
+# Salt per proses, supaya fingerprint tidak bisa dipakai menebak password
+_CREDENTIAL_SALT = os.urandom(16)
+
+def credential_fingerprint(password: str) -> str:
+    return hmac.new(_CREDENTIAL_SALT, password.encode('utf-8'), hashlib.sha256).hexdigest()[:16]
+
+def _limit_chunk(data: bytes, sent_bytes: int, sent_lines: int,
+                 max_bytes: Optional[int], max_lines: Optional[int]) -> Tuple[bytes, int, bool]:
+    """Potong chunk ke sisa limit byte/baris, return (data, jumlah newline, truncated)"""
+    truncated = False
+    if max_bytes is not None and sent_bytes + len(data) > max_bytes:
+        data = data[:max_bytes - sent_bytes]
+        truncated = True
+    newlines = 0
+    if max_lines is not None:
+        remaining = max_lines - sent_lines
+        newlines = data.count(b"\n")
+        if newlines >= remaining:
+            # Potong tepat setelah newline ke-max_lines
+            cut = -1
+            for _ in range(remaining):
+                cut = data.index(b"\n", cut + 1)
+            if cut + 1 < len(data):
+                data = data[:cut + 1]
+                truncated = True
+            newlines = remaining
+    return data, newlines, truncated
+
+class _PoolClient(asyncssh.SSHClient):
+    """Tandai koneksi yang putus supaya tidak diambil lagi dari pool"""
+    def __init__(self, trace: Optional[ConnectTrace] = None):
+        self.closed = False
+        self.trace = trace
+    
+    def connection_made(self, conn):
+        if self.trace is None:
+            return
+        # Client minta service ssh-userauth tepat setelah key exchange pertama
+        # selesai. SSHClient tidak punya callback publik di titik ini:
+        # validate_host_public_key butuh known_hosts (ikut memvalidasi host
+        # cert) dan callback auth_* baru datang setelah percobaan auth
+        # pertama. Jadi method internal ini dibungkus; asyncssh di-pin di
+        # requirements.txt dan tests/test_connect_trace.py menjaga fase kex
+        # tetap tercatat. Kalau method-nya hilang, kex ikut terhitung di auth.
+        send_service_request = getattr(conn, 'send_service_request', None)
+        if send_service_request is None:
+            logger.warning("asyncssh has no send_service_request, kex phase will not be traced")
+            return
+        
+        def service_requested(service):
+            del conn.send_service_request
+            self.trace.mark('kex')
+            return send_service_request(service)
+        
+        conn.send_service_request = service_requested
+    
+    def auth_completed(self):
+        if self.trace is not None:
+            self.trace.mark('auth')
+    
+    def connection_lost(self, exc):
+        self.closed = True
+
 class SSHManager:
     def __init__(self):
         self.connections: Dict[str, asyncssh.SSHClientConnection] = {}
         self.local_sessions: Dict[str, Dict] = {}
         self.sessions: Dict[str, Dict] = {}
+        self.pool: Dict[tuple, list] = {}
+        self.pool_pending: Dict[tuple, asyncio.Future] = {}
+        self.session_pool: Dict[str, Dict] = {}
+        self.terminals: Dict[str, TerminalSession] = {}
+        self.connect_traces: Dict[str, ConnectTrace] = {}
+        # Urutan disconnect (lama -> baru) untuk membatasi isi registry
+        self.disconnected: Dict[str, float] = {}
+        self.reaper = SessionReaper(self._reap_session)
     
     async def create_connection(self, session_id: str, host: str, port: int, 
-                                username: str, password: str) -> bool:
+                                username: str, password: str,
+                                transport: Optional[Dict] = None) -> bool:
+        key = (host, port, username, credential_fingerprint(password), transport_key(transport))
+        started = time.perf_counter()
+        trace = ConnectTrace(host, port, username)
+        
         try:
-            logger.info(f"Attempting to connect to {host}:{port} as {username}")
+            entry, reused = await self._acquire_pooled_connection(
+                key, host, port, username, password, trace, transport
+            )
+            warm = self._take_warm(entry)
+        
+        except Exception as e:
+            observe_connect('ssh', 'error', time.perf_counter() - started)
+            trace.finish(False, error=e)
+            connect_diagnostics.record(trace)
+            logger.error(f"❌ SSH connection failed ({trace.reason}): {str(e) or type(e).__name__}")
             
-            # Method 1: Coba dengan opsi minimal dulu
-            try:
-                conn = await asyncssh.connect(
-                    host=host,
-                    port=port,
-                    username=username,
-                    password=password,
-                    known_hosts=None,
-                    connect_timeout=30,
-                    keepalive_interval=15,
-                    keepalive_count_max=3,
-                )
-                
-                logger.info(f"✅ Connected to {host}:{port}")
-                
-                self.connections[session_id] = conn
-                self.sessions[session_id] = {
-                    'host': host,
-                    'port': port,
-                    'username': username,
-                    'connected': True,
-                    'type': 'ssh'
-                }
-                
-                return True
-                
-            except asyncssh.Error as e:
-                logger.error(f"Method 1 failed: {e}")
-                
-                # Method 2: Coba dengan opsi yang lebih lengkap
-                logger.info("Trying method 2 with more options...")
-                
-                options = {
-                    'host': host,
-                    'port': port,
-                    'username': username,
-                    'password': password,
-                    'known_hosts': None,
-                    'connect_timeout': 30,
-                    'keepalive_interval': 15,
-                    'keepalive_count_max': 3,
-                    'kex_algs': None,
-                    'encryption_algs': None,
-                    'mac_algs': None,
-                    'compression_algs': None,
-                }
-                
-                conn = await asyncssh.connect(**options)
-                
-                logger.info(f"✅ Connected to {host}:{port} with method 2")
-                
-                self.connections[session_id] = conn
-                self.sessions[session_id] = {
-                    'host': host,
-                    'port': port,
-                    'username': username,
-                    'connected': True,
-                    'type': 'ssh'
-                }
-                
-                return True
-                
-        except asyncssh.Error as e:
-            error_msg = str(e)
-            logger.error(f"❌ SSH connection failed: {error_msg}")
-            
-            if "Host key" in error_msg:
-                logger.error("Host key verification failed - pastikan known_hosts=None")
-            elif "authentication" in error_msg.lower():
-                logger.error("Authentication failed - cek username/password")
-            elif "Connection refused" in error_msg:
-                logger.error("Connection refused - cek host/port dan firewall")
-            elif "Timeout" in error_msg:
-                logger.error("Timeout - server tidak merespon")
+            if trace.reason in CONNECT_ERROR_HINTS:
+                logger.error(CONNECT_ERROR_HINTS[trace.reason])
+            elif trace.reason == 'other':
+                import traceback
+                traceback.print_exc()
             
             return False
         
+        observe_connect('ssh', 'reused' if reused else 'ok', time.perf_counter() - started)
+        trace.finish(True, reused=reused)
+        connect_diagnostics.record(trace)
+        # Fase pty menyusul saat websocket pertama attach
+        self.connect_traces[session_id] = trace
+        entry['sessions'].add(session_id)
+        self.session_pool[session_id] = entry
+        self.connections[session_id] = entry['conn']
+        self.sessions[session_id] = {
+            'host': host,
+            'port': port,
+            'username': username,
+            'connected': True,
+            'type': 'ssh',
+            'pooled': reused,
+            'warm': warm,
+            'transport': negotiated_transport(entry['conn'], transport),
+        }
+        self.reaper.schedule(session_id, 'never_attached')
+        
+        return True
+    
+    async def _connect_attempt(self, host: str, port: int, username: str, password: str,
+                               trace: ConnectTrace, method: int, timeout: float,
+                               **transport_options):
+        """Satu percobaan connect (DNS, TCP, kex, auth), return (conn, client)"""
+        trace.begin_attempt(method)
+        try:
+            return await asyncio.wait_for(
+                self._handshake(host, port, username, password, trace, timeout, transport_options),
+                timeout
+            )
+        except BaseException as e:
+            trace.fail_attempt(e)
+            raise
+    
+    async def _handshake(self, host: str, port: int, username: str, password: str,
+                         trace: ConnectTrace, timeout: float, transport_options: Dict):
+        sock = await open_socket(host, port, trace)
+        client = _PoolClient(trace)
+        try:
+            conn = await asyncssh.connect(
+                host=host,
+                port=port,
+                sock=sock,
+                username=username,
+                password=password,
+                known_hosts=None,
+                connect_timeout=timeout,
+                client_factory=lambda: client,
+                **transport_options,
+            )
+        except BaseException:
+            sock.close()
+            raise
+        return conn, client
+    
+    async def _open_connection(self, host: str, port: int, username: str, password: str,
+                               trace: Optional[ConnectTrace] = None,
+                               transport: Optional[Dict] = None):
+        """Buka koneksi SSH baru, return (conn, client)
+
+        Method 1 memakai profil transport host. Method 2 (semua algoritma
+        yang didukung) hanya dicoba kalau Method 1 gagal negosiasi; auth,
+        refused, timeout dll langsung gagal. Host yang terakhir butuh Method 2
+        langsung mulai dari Method 2 (algorithm_cache). Kedua percobaan
+        berbagi satu batas waktu SSH_CONNECT_TIMEOUT.
+        """
+        logger.info(f"Attempting to connect to {host}:{port} as {username}")
+        if trace is None:
+            trace = ConnectTrace(host, port, username)
+        deadline = time.monotonic() + SSH_CONNECT_TIMEOUT
+        cache_key = (host, port, transport_key(transport))
+        
+        method, options = algorithm_cache.first_attempt(cache_key, transport)
+        try:
+            conn, client = await self._connect_attempt(
+                host, port, username, password, trace, method,
+                deadline - time.monotonic(), **options
+            )
+        except asyncssh.Error as e:
+            if classify_connect_error(e) not in RETRYABLE_REASONS:
+                raise
+            if method == 2:
+                # Server berubah sejak connect terakhir, set lama tidak berlaku
+                algorithm_cache.forget(cache_key)
+                raise
+            logger.error(f"Method 1 failed: {e}")
+            logger.info("Trying method 2 with all supported algorithms...")
+            
+            method = 2
+            conn, client = await self._connect_attempt(
+                host, port, username, password, trace, method,
+                deadline - time.monotonic(), **connect_options(transport, compat=True)
+            )
+        
+        algorithm_cache.remember(cache_key, conn, compat=method == 2)
+        logger.info(f"✅ Connected to {host}:{port}" + (" with method 2" if method == 2 else ""))
+        return conn, client
+    
+    # ==================== CONNECTION POOL ====================
+    async def _acquire_pooled_connection(self, key: tuple, host: str, port: int,
+                                         username: str, password: str,
+                                         trace: Optional[ConnectTrace] = None,
+                                         transport: Optional[Dict] = None):
+        """Ambil koneksi dari pool atau buka baru, return (entry, reused)"""
+        while True:
+            entry = self._find_pool_entry(key)
+            if entry is not None:
+                if entry['linger'] is not None:
+                    entry['linger'].cancel()
+                    entry['linger'] = None
+                logger.info(f"♻️ Reusing pooled SSH connection to {host}:{port} "
+                            f"({len(entry['sessions']) + 1} channels)")
+                return entry, True
+            
+            # Tab lain sedang connect ke host yang sama, tunggu hasilnya dulu
+            pending = self.pool_pending.get(key)
+            if pending is None:
+                break
+            await pending
+        
+        pending = asyncio.get_running_loop().create_future()
+        self.pool_pending[key] = pending
+        try:
+            conn, client = await self._open_connection(
+                host, port, username, password, trace, transport
+            )
+            entry = {
+                'key': key,
+                'conn': conn,
+                'client': client,
+                'sessions': set(),
+                'linger': None,
+                'profile': (transport or {}).get('profile', 'default'),
+                'warm': None,
+            }
+            self.pool.setdefault(key, []).append(entry)
+            return entry, False
+        finally:
+            del self.pool_pending[key]
+            pending.set_result(None)
+    
+    def _find_pool_entry(self, key: tuple) -> Optional[Dict]:
+        entries = self.pool.get(key)
+        if not entries:
+            return None
+        
+        # Buang koneksi yang sudah putus
+        entries[:] = [entry for entry in entries if not entry['client'].closed]
+        for entry in entries:
+            if len(entry['sessions']) < SSH_MAX_CHANNELS_PER_CONNECTION:
+                return entry
+        return None
+    
+    def _release_pooled_connection(self, session_id: str):
+        """Lepas satu referensi, koneksi ditutup setelah linger kalau tidak dipakai"""
+        entry = self.session_pool.pop(session_id, None)
+        if entry is None:
+            return
+        
+        entry['sessions'].discard(session_id)
+        if entry['sessions']:
+            return
+        
+        if entry['client'].closed:
+            self._close_pool_entry(entry)
+        else:
+            entry['linger'] = asyncio.get_event_loop().call_later(
+                SSH_POOL_LINGER_SECONDS, self._close_pool_entry, entry
+            )
+    
+    def _close_pool_entry(self, entry: Dict):
+        entry['linger'] = None
+        if entry['sessions']:
+            return
+        
+        warm = entry['warm']
+        if warm is not None:
+            # TTL habis tanpa pernah dipakai session
+            entry['warm'] = None
+            PREWARM['expired'] += 1
+            PREWARM['wasted_idle_seconds'] += time.monotonic() - warm['opened']
+            PREWARM['wasted_handshake_seconds'] += warm['handshake']
+        
+        entries = self.pool.get(entry['key'], [])
+        if entry in entries:
+            entries.remove(entry)
+        if not entries:
+            self.pool.pop(entry['key'], None)
+        
+        host, port = entry['key'][:2]
+        try:
+            entry['conn'].close()
+            logger.info(f"SSH connection to {host}:{port} closed (idle)")
+        except Exception as e:
+            logger.error(f"Error closing pooled SSH connection: {e}")
+    
+    def get_pool_status(self) -> list:
+        return [
+            {
+                'host': key[0],
+                'port': key[1],
+                'username': key[2],
+                'profile': entry['profile'],
+                'channels': len(entry['sessions']),
+                'max_channels': SSH_MAX_CHANNELS_PER_CONNECTION,
+                'lingering': entry['linger'] is not None,
+                'warm': entry['warm'] is not None,
+            }
+            for key, entries in self.pool.items()
+            for entry in entries
+        ]
+    
+    # ==================== WARM POOL ====================
+    # Koneksi prewarm adalah entry pool biasa tanpa session, dengan linger =
+    # TTL prewarm. create_connection mengambilnya lewat jalur reuse pool.
+    async def prewarm_connection(self, host: str, port: int, username: str, password: str,
+                                 ttl: float, transport: Optional[Dict] = None,
+                                 owner: Optional[int] = None) -> str:
+        """Buka koneksi terautentikasi ke pool tanpa session, return opened/exists/failed"""
+        key = (host, port, username, credential_fingerprint(password), transport_key(transport))
+        loop = asyncio.get_running_loop()
+        entry = self._find_pool_entry(key)
+        if entry is not None and not entry['sessions'] and entry['warm'] is None:
+            # Koneksi idle yang sedang linger: jadikan warm, tanpa handshake baru
+            entry['linger'].cancel()
+            entry['warm'] = {'owner': owner, 'opened': time.monotonic(), 'handshake': 0.0}
+            entry['linger'] = loop.call_later(ttl, self._close_pool_entry, entry)
+            PREWARM['opened'] += 1
+            return 'opened'
+        # Sudah ada koneksi (tab terbuka / warm) atau sedang connect
+        if entry is not None or key in self.pool_pending:
+            return 'exists'
+
+        trace = ConnectTrace(host, port, username)
+        started = time.perf_counter()
+        try:
+            entry, reused = await self._acquire_pooled_connection(
+                key, host, port, username, password, trace, transport
+            )
         except Exception as e:
-            logger.error(f"❌ Unexpected error: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            trace.finish(False, error=e)
+            connect_diagnostics.record(trace)
+            PREWARM['failed'] += 1
+            logger.warning(f"Prewarm {username}@{host}:{port} failed: {e}")
+            return 'failed'
+        handshake = time.perf_counter() - started
+        trace.finish(True, reused=reused)
+        connect_diagnostics.record(trace)
+        
+        if reused:
+            # Dibuka tab lain selagi menunggu: kembalikan linger yang dibatalkan acquire
+            if not entry['sessions'] and entry['linger'] is None:
+                entry['linger'] = loop.call_later(
+                    SSH_POOL_LINGER_SECONDS, self._close_pool_entry, entry
+                )
+            return 'exists'
+        
+        entry['warm'] = {'owner': owner, 'opened': time.monotonic(), 'handshake': handshake}
+        entry['linger'] = loop.call_later(ttl, self._close_pool_entry, entry)
+        PREWARM['opened'] += 1
+        PREWARM['handshake_seconds'] += handshake
+        logger.info(f"🔥 Prewarmed SSH connection to {username}@{host}:{port} "
+                    f"({handshake * 1000:.0f} ms, ttl {ttl:.0f}s)")
+        return 'opened'
+    
+    def _take_warm(self, entry: Dict) -> bool:
+        """Koneksi warm dipakai pertama kali: hitung hit, return True kalau warm"""
+        if entry['warm'] is None:
             return False
+        entry['warm'] = None
+        PREWARM['hits'] += 1
+        return True
+    
+    def warm_entries(self, owner: Optional[int] = None) -> list:
+        """Entry warm yang masih hidup dan belum dipakai"""
+        return [
+            entry
+            for entries in self.pool.values()
+            for entry in entries
+            if entry['warm'] is not None and not entry['client'].closed
+            and (owner is None or entry['warm']['owner'] == owner)
+        ]
+    
+    # ==================== ONE-SHOT COMMAND (POOLED) ====================
+    async def run_pooled_command(self, host: str, port: int, username: str,
+                                 password: str, command: str,
+                                 transport: Optional[Dict] = None,
+                                 max_bytes: Optional[int] = None):
+        """Jalankan satu command lewat koneksi pool, tanpa membuat session terminal.
+        
+        Return ({'exit_status', 'stdout', 'stderr', 'truncated'}, reused).
+        stdout+stderr berbagi satu batas max_bytes; begitu tercapai channel
+        ditutup, jadi output raksasa tidak pernah di-buffer utuh.
+        """
+        key = (host, port, username, credential_fingerprint(password), transport_key(transport))
+        trace = ConnectTrace(host, port, username)
+        try:
+            entry, reused = await self._acquire_pooled_connection(
+                key, host, port, username, password, trace, transport
+            )
+            self._take_warm(entry)
+        except BaseException as e:
+            trace.finish(False, error=e)
+            connect_diagnostics.record(trace)
+            raise
+        trace.finish(True, reused=reused)
+        connect_diagnostics.record(trace)
+        
+        # Lease sementara supaya koneksi tidak ditutup/dipakai melebihi batas channel
+        lease_id = f"exec-{os.urandom(8).hex()}"
+        entry['sessions'].add(lease_id)
+        self.session_pool[lease_id] = entry
+        try:
+            process = await entry['conn'].create_process(command, encoding=None)
+            output = {'stdout': [], 'stderr': []}
+            state = {'bytes': 0, 'truncated': False}
+            
+            async def drain(name: str, stream) -> None:
+                while not state['truncated']:
+                    data = await stream.read(EXEC_READ_SIZE)
+                    if not data:
+                        return
+                    data, _, truncated = _limit_chunk(data, state['bytes'], 0, max_bytes, None)
+                    state['bytes'] += len(data)
+                    output[name].append(data)
+                    if truncated:
+                        state['truncated'] = True
+                        # Tutup channel, stream satunya ikut dapat EOF
+                        process.close()
+            
+            try:
+                await asyncio.gather(drain('stdout', process.stdout),
+                                     drain('stderr', process.stderr))
+                if not state['truncated']:
+                    await process.wait_closed()
+            finally:
+                process.close()
+            
+            return {
+                'exit_status': process.exit_status,
+                'stdout': b"".join(output['stdout']).decode('utf-8', errors='replace'),
+                'stderr': b"".join(output['stderr']).decode('utf-8', errors='replace'),
+                'truncated': state['truncated'],
+            }, reused
+        finally:
+            self._release_pooled_connection(lease_id)
     
     # ==================== LOCAL TERMINAL DENGAN PYWINPTY ====================
     async def create_local_shell(self, session_id: str) -> bool:
         """Buat shell lokal dengan deteksi OS"""
+        started = time.perf_counter()
+        created = False
         try:
             logger.info(f"Creating local shell for session {session_id}")
             
@@ -131,18 +528,24 @@ class SSHManager:
                 if not WINPTY_AVAILABLE:
                     logger.error("pywinpty not installed. Please run: pip install pywinpty")
                     return False
-                return await self._create_windows_local_shell_pywinpty(session_id)
+                created = await self._create_windows_local_shell_pywinpty(session_id)
             elif system == "Linux":
-                return await self._create_linux_local_shell(session_id)
+                created = await self._create_linux_local_shell(session_id)
             elif system == "Darwin":
-                return await self._create_mac_local_shell(session_id)
+                created = await self._create_mac_local_shell(session_id)
             else:
                 logger.error(f"Unsupported OS: {system}")
                 return False
+            
+            if created:
+                self.reaper.schedule(session_id, 'never_attached')
+            return created
                 
         except Exception as e:
             logger.error(f"❌ Failed to create local shell: {e}", exc_info=True)
             return False
+        finally:
+            observe_connect('local', 'ok' if created else 'error', time.perf_counter() - started)
     
     # ==================== WINDOWS DENGAN PYWINPTY ====================
     async def _create_windows_local_shell_pywinpty(self, session_id: str) -> bool:
@@ -293,26 +696,43 @@ class SSHManager:
                 logger.error("No suitable shell found")
                 return False
             
-            process = await asyncio.create_subprocess_exec(
-                *shell_cmd,
-                stdin=asp.PIPE,
-                stdout=asp.PIPE,
-                stderr=asp.STDOUT,
-                env={
-                    "TERM": "xterm-256color",
-                    "LANG": "en_US.UTF-8",
-                    "PATH": os.environ.get("PATH", ""),
-                    "HOME": os.environ.get("HOME", ""),
-                    "USER": os.environ.get("USER", "user"),
-                }
-            )
+            env = {
+                "TERM": "xterm-256color",
+                "LANG": "en_US.UTF-8",
+                "PATH": os.environ.get("PATH", ""),
+                "HOME": os.environ.get("HOME", ""),
+                "USER": os.environ.get("USER", "user"),
+            }
             
-            logger.info(f"Linux shell process started with PID: {process.pid}")
+            # Utamakan PTY asli (full-screen app, job control, resize)
+            shell = None
+            if PTY_AVAILABLE:
+                try:
+                    shell = await PtyShell.spawn(shell_cmd, env)
+                except (OSError, subprocess.SubprocessError) as e:
+                    logger.warning(f"PTY unavailable, falling back to pipes: {e}")
             
-            self.local_sessions[session_id] = {
-                'process': process,
-                'type': 'asyncio'
-            }
+            if shell is not None:
+                logger.info(f"Linux PTY shell started with PID: {shell.pid}")
+                self.local_sessions[session_id] = {
+                    'process': shell,
+                    'type': 'pty'
+                }
+            else:
+                process = await asyncio.create_subprocess_exec(
+                    *shell_cmd,
+                    stdin=asp.PIPE,
+                    stdout=asp.PIPE,
+                    stderr=asp.STDOUT,
+                    env=env
+                )
+                
+                logger.info(f"Linux shell process started with PID: {process.pid}")
+                
+                self.local_sessions[session_id] = {
+                    'process': process,
+                    'type': 'asyncio'
+                }
             
             self.sessions[session_id] = {
                 'host': 'localhost',
@@ -321,7 +741,7 @@ class SSHManager:
                 'connected': True,
                 'type': 'local',
                 'platform': 'Linux',
-                'shell': 'bash'
+                'shell': 'bash (pty)' if shell is not None else 'bash'
             }
             
             logger.info(f"✅ Linux local shell created for session {session_id}")
@@ -385,253 +805,256 @@ class SSHManager:
             logger.error(f"❌ Failed to create macOS local shell: {e}", exc_info=True)
             return False
     
-    # ==================== HANDLE LOCAL SHELL ====================
-    async def handle_local_shell(self, session_id: str, websocket):
-        """Handle local shell session"""
-        if session_id not in self.local_sessions:
-            await websocket.send_json({
-                "type": "error",
-                "data": "Local session not found"
-            })
-            return
-        
+    # ==================== PERSISTENT TERMINAL ====================
+    async def attach_terminal(self, session_id: str, channel: TerminalChannel,
+                              resume_token: Optional[str] = None,
+                              offset: Optional[int] = None):
+        """Attach websocket ke terminal session, buka shell baru kalau belum ada.
+
+        Dengan resume_token yang cocok, client lanjut dari offset (hanya byte
+        yang terlewat dikirim ulang). Tanpa token: terminal SSH lama ditutup
+        dan shell baru dibuka (perilaku lama), shell lokal di-attach ulang
+        dengan replay scrollback penuh.
+        """
+        terminal = self.terminals.get(session_id)
+        resumed = self.can_resume(session_id, resume_token)
+        self.reaper.cancel(session_id)
+
+        if terminal is not None and not resumed:
+            offset = None
+            if session_id in self.connections:
+                terminal.close()
+                await terminal.wait_closed()
+                terminal = None
+
+        if terminal is None:
+            terminal = await self._open_terminal(session_id, channel)
+            if terminal is None:
+                if self.sessions.get(session_id, {}).get('connected'):
+                    self.reaper.schedule(session_id, 'detached')
+                return
+
+        logger.info(
+            f"Terminal {session_id} attached "
+            f"({'resume from ' + str(offset) if resumed else 'new client'})"
+        )
+        await terminal.serve(channel, offset)
+
+    def can_resume(self, session_id: str, resume_token: Optional[str]) -> bool:
+        terminal = self.terminals.get(session_id)
+        return (
+            terminal is not None
+            and bool(resume_token)
+            and hmac.compare_digest(terminal.resume_token, resume_token)
+        )
+
+    async def _open_terminal(self, session_id: str,
+                             channel: TerminalChannel) -> Optional[TerminalSession]:
+        info = self.sessions.setdefault(session_id, {})
+
+        if session_id in self.connections:
+            trace = self.connect_traces.pop(session_id, None)
+            started = time.perf_counter()
+            try:
+                # encoding=None: output tetap bytes sampai ke websocket
+                process = await self.connections[session_id].create_process(
+                    term_type="xterm",
+                    term_size=(80, 24),
+                    encoding=None
+                )
+                if trace is not None:
+                    connect_diagnostics.record_phase(trace, 'pty', time.perf_counter() - started)
+            except Exception as e:
+                logger.error(f"SSH Shell error: {e}")
+                await channel.send_error(f"Shell error: {str(e)}")
+                return None
+            logger.info(f"SSH Shell created for session {session_id}")
+            shell_io = SSHShellIO(process)
+
+        elif session_id in self.local_sessions:
+            session = self.local_sessions[session_id]
+            if session.get('type') == 'pty':
+                shell_io = session['process']
+            elif session.get('type') == 'asyncio':
+                shell_io = PipeShellIO(session['process'])
+            elif session.get('type') == 'winpty':
+                shell_io = WinptyShellIO(session['process'])
+            else:
+                # winpty_fallback (thread + queue) tetap pakai handler lama
+                await self.handle_local_shell(session_id, channel)
+                return None
+
+        else:
+            await channel.send_error("Session not found")
+            return None
+
+        terminal = TerminalSession(
+            session_id, shell_io, info=info,
+            on_exit=self._on_terminal_exit, on_detach=self._on_terminal_detach
+        )
+        self.terminals[session_id] = terminal
+        return terminal
+
+    def _on_terminal_exit(self, terminal: TerminalSession):
+        """Shell selesai sendiri (exit / koneksi SSH putus)"""
+        if self.terminals.get(terminal.session_id) is terminal:
+            del self.terminals[terminal.session_id]
+
+        # Shell lokal tidak bisa dibuka ulang, session-nya ikut selesai
+        if terminal.session_id in self.local_sessions:
+            session = self.local_sessions.pop(terminal.session_id)
+            if session.get('type') == 'pty':
+                session['process'].close()
+            self._mark_disconnected(terminal.session_id)
+            logger.info(f"Local session {terminal.session_id} exited with code {terminal.exit_code}")
+
+    def _on_terminal_detach(self, terminal: TerminalSession):
+        """Websocket terakhir lepas: mulai hitung idle TTL detached"""
+        if self.sessions.get(terminal.session_id, {}).get('connected'):
+            self.reaper.schedule(terminal.session_id, 'detached')
+
+    # ==================== HANDLE LOCAL SHELL (LEGACY FALLBACK) ====================
+    async def handle_local_shell(self, session_id: str, channel: TerminalChannel):
+        """Handle local shell winpty_fallback (thread + queue, tanpa scrollback)"""
         session = self.local_sessions[session_id]
-        session_info = self.sessions.get(session_id, {})
-        platform_name = session_info.get('platform', 'Unknown')
-        shell_name = session_info.get('shell', 'Shell')
-        
-        # Kirim welcome message
-        # await websocket.send_json({
-        #     "type": "data",
-        #     "data": f"\r\n\u001b[1;32m🔌 Local Terminal ({platform_name} - {shell_name})\u001b[0m\r\n"
-        # })
-        # await websocket.send_json({
-        #     "type": "data",
-        #     "data": f"\u001b[1;34m📡 Connected to {platform.node()}\u001b[0m\r\n\r\n"
-        # })
+        output_queue = session['output_queue']
+        input_queue = session['input_queue']
+        running = session['running']
+        # Jalur ini tidak lewat TerminalSession, jadi rekaman dipasang di sini
+        info = self.sessions.get(session_id, {})
+        recorder = start_recording(session_id, info)
+        if recorder is not None:
+            info['recording'] = recorder.stats
         
-        # ==================== PYWINPTY HANDLER ====================
-        if session.get('type') == 'winpty':
-            proc = session['process']
-            
-            # Baca output awal
-            try:
-                await asyncio.sleep(0.5)
-                initial_data = proc.read()
-                if initial_data:
-                    # Bersihkan output agar tidak menggabungkan baris
-                    lines = initial_data.split('\n')
-                    for i, line in enumerate(lines):
-                        if line.strip() or line == '':
-                            # Tambahkan newline kecuali baris terakhir yang kosong
-                            if i < len(lines) - 1 or (i == len(lines) - 1 and line.strip()):
-                                await websocket.send_json({
-                                    "type": "data",
-                                    "data": line + '\r\n'
-                                })
-            except:
-                pass
-            
-            async def read_task():
+        async def read_task():
+            while running.is_set():
                 try:
-                    while True:
-                        data = await asyncio.get_event_loop().run_in_executor(
-                            None, proc.read
-                        )
-                        if data:
-                            # Pastikan setiap baris diakhiri dengan newline yang benar
-                            await websocket.send_json({
-                                "type": "data",
-                                "data": data
-                            })
-                        else:
-                            await asyncio.sleep(0.05)
+                    line = await asyncio.get_event_loop().run_in_executor(
+                        None, output_queue.get, True, 0.1
+                    )
+                    if line:
+                        cleaned_line = line.replace('\r\n', '\n').replace('\r', '\n')
+                        if recorder is not None:
+                            recorder.record_output(cleaned_line.encode('utf-8'))
+                        await channel.send_output(cleaned_line)
+                except queue.Empty:
+                    await asyncio.sleep(0.05)
                 except Exception as e:
                     logger.error(f"Read task error: {e}")
-            
-            async def write_task():
-                try:
-                    async for message in websocket.iter_json():
-                        if message['type'] == 'input':
-                            input_data = message['data']
-                            
-                            # Kirim ke process
-                            proc.write(input_data)
-                            
-                            # Untuk debugging
-                            logger.debug(f"Sent to PowerShell: {repr(input_data)}")
-                            
-                except Exception as e:
-                    logger.error(f"Write task error: {e}")
-            
-            await asyncio.gather(read_task(), write_task())
+                    break
         
-        # ==================== ASYNCIO HANDLER (Linux/macOS) ====================
-        elif session.get('type') == 'asyncio':
-            process = session['process']
-            
-            # Baca output awal
+        async def write_task():
             try:
-                initial_data = await asyncio.wait_for(process.stdout.read(1024), timeout=0.5)
-                if initial_data:
-                    await websocket.send_json({
-                        "type": "data",
-                        "data": initial_data.decode('utf-8', errors='replace')
-                    })
-            except asyncio.TimeoutError:
-                pass
-            
-            async def read_task():
-                try:
-                    while True:
-                        data = await process.stdout.read(1024)
-                        if not data:
-                            break
-                        await websocket.send_json({
-                            "type": "data",
-                            "data": data.decode('utf-8', errors='replace')
-                        })
-                except Exception as e:
-                    logger.error(f"Read error: {e}")
-            
-            async def write_task():
-                try:
-                    async for message in websocket.iter_json():
-                        if message['type'] == 'input':
-                            input_data = message['data']
-                            process.stdin.write(input_data.encode())
-                            await process.stdin.drain()
-                except Exception as e:
-                    logger.error(f"Write error: {e}")
-            
-            await asyncio.gather(read_task(), write_task())
+                async for message in channel.iter_messages():
+                    if message['type'] == 'input':
+                        text = input_as_text(message['data'])
+                        if recorder is not None:
+                            recorder.record_input(text.encode('utf-8'))
+                        input_queue.put(text)
+            except Exception as e:
+                logger.error(f"Write task error: {e}")
         
-        # ==================== LEGACY HANDLER (fallback) ====================
-        elif session.get('type') == 'winpty_fallback':
-            output_queue = session['output_queue']
-            input_queue = session['input_queue']
-            running = session['running']
-            
-            async def read_task():
-                while running.is_set():
-                    try:
-                        line = await asyncio.get_event_loop().run_in_executor(
-                            None, output_queue.get, True, 0.1
-                        )
-                        if line:
-                            cleaned_line = line.replace('\r\n', '\n').replace('\r', '\n')
-                            await websocket.send_json({
-                                "type": "data",
-                                "data": cleaned_line
-                            })
-                    except queue.Empty:
-                        await asyncio.sleep(0.05)
-                    except Exception as e:
-                        logger.error(f"Read task error: {e}")
-                        break
-            
-            async def write_task():
-                try:
-                    async for message in websocket.iter_json():
-                        if message['type'] == 'input':
-                            input_queue.put(message['data'])
-                except Exception as e:
-                    logger.error(f"Write task error: {e}")
-            
+        try:
             await asyncio.gather(read_task(), write_task())
+        finally:
             running.clear()
+            if recorder is not None:
+                await recorder.close()
         
         # Cleanup
         if session_id in self.local_sessions:
             try:
-                if session.get('type') == 'winpty':
-                    session['process'].terminate()
-                elif session.get('type') == 'asyncio':
-                    process = session['process']
-                    if process.returncode is None:
-                        process.terminate()
-                        try:
-                            await asyncio.wait_for(process.wait(), timeout=2.0)
-                        except asyncio.TimeoutError:
-                            process.kill()
-                elif session.get('type') == 'winpty_fallback':
-                    process = session.get('process')
-                    if process:
-                        process.terminate()
+                process = session.get('process')
+                if process:
+                    process.terminate()
             except:
                 pass
             finally:
                 del self.local_sessions[session_id]
+                self._mark_disconnected(session_id)
     
-    # ==================== SSH METHODS (TIDAK DIUBAH) ====================
+    # ==================== SSH METHODS ====================
     async def execute_command(self, session_id: str, command: str) -> str:
         if session_id not in self.connections:
             return "Not connected to any server"
         
         try:
-            conn = self.connections[session_id]
-            result = await conn.run(command, check=False)
-            return result.stdout + result.stderr
+            # Lewat stream supaya output raksasa tetap dibatasi EXEC_MAX_BYTES
+            output = []
+            async for event in self.stream_command(session_id, command, max_bytes=EXEC_MAX_BYTES):
+                if event['type'] == 'output':
+                    output.append(event['data'])
+            return b"".join(output).decode('utf-8', errors='replace')
         except Exception as e:
             logger.error(f"Command execution failed: {str(e)}")
             return f"Error: {str(e)}"
     
-    async def create_shell(self, session_id: str, websocket):
-        """Buat SSH shell - TIDAK DIUBAH"""
-        if session_id not in self.connections:
-            await websocket.send_json({
-                "type": "error",
-                "data": "Session not found"
-            })
-            return
-
+    async def stream_command(self, session_id: str, command: str,
+                             max_bytes: Optional[int] = None,
+                             max_lines: Optional[int] = None) -> AsyncIterator[Dict]:
+        """Jalankan command di exec channel terpisah dan stream output-nya.
+        
+        Yield {'type': 'output', 'data': bytes} per chunk lalu satu
+        {'type': 'exit', ...}. Kalau limit byte/baris tercapai, channel
+        ditutup sehingga proses remote ikut berhenti.
+        """
         conn = self.connections[session_id]
-        session_info = self.sessions.get(session_id, {})
-
+        # Channel baru di koneksi yang sama, PTY interaktif tidak terganggu
+        process = await conn.create_process(
+            command, encoding=None, stderr=asyncssh.STDOUT
+        )
+        
+        sent_bytes = 0
+        sent_lines = 0
+        truncated = False
+        finished = False
         try:
-            process = await conn.create_process(
-                term_type='xterm-256color'
-            )
-
-            logger.info(f"SSH Shell created for session {session_id}")
-
-            async def read_task():
-                async for data in process.stdout:
-                    if data:
-                        logger.info(f"📥 RAW from server: {repr(data)}")
-                        await websocket.send_json({
-                            "type": "data",
-                            "data": data
-                        })
-
-            async def write_task():
-                async for message in websocket.iter_json():
-                    if message['type'] == 'input':
-                        process.stdin.write(message['data'])
-
-                    elif message['type'] == 'resize':
-                        cols = message.get('cols')
-                        rows = message.get('rows')
-                        if cols and rows:
-                            process.change_terminal_size(
-                                max(10, int(cols)),
-                                max(10, int(rows))
-                            )
-
-            await asyncio.gather(read_task(), write_task())
-
-        except Exception as e:
-            logger.error(f"SSH Shell error: {e}")
-            await websocket.send_json({
-                "type": "error",
-                "data": f"Shell error: {str(e)}"
-            })
+            while True:
+                data = await process.stdout.read(EXEC_READ_SIZE)
+                if not data:
+                    finished = True
+                    break
+                
+                data, newlines, truncated = _limit_chunk(
+                    data, sent_bytes, sent_lines, max_bytes, max_lines
+                )
+                sent_lines += newlines
+                
+                sent_bytes += len(data)
+                if data:
+                    yield {'type': 'output', 'data': data}
+                if truncated:
+                    break
         finally:
-            if 'process' in locals():
-                process.close()
+            if finished:
                 await process.wait_closed()
+            else:
+                # Limit tercapai / client pergi: tutup channel tanpa menunggu
+                # remote selesai menguras output-nya
+                process.close()
+        
+        yield {
+            'type': 'exit',
+            'exit_status': process.exit_status,
+            'truncated': truncated,
+            'bytes': sent_bytes,
+            'lines': sent_lines if max_lines is not None else None,
+        }
+    
+    async def create_shell(self, session_id: str, channel: TerminalChannel):
+        """Buat SSH shell"""
+        if session_id not in self.connections:
+            await channel.send_error("Session not found")
+            return
+
+        await self.attach_terminal(session_id, channel)
     
     def disconnect(self, session_id: str):
+        # Terminal yang masih hidup (attached atau tidak) ikut ditutup
+        terminal = self.terminals.pop(session_id, None)
+        if terminal is not None:
+            terminal.close()
+        
         # Cek apakah ini local session
         if session_id in self.local_sessions:
             try:
@@ -642,6 +1065,8 @@ class SSHManager:
                     process = session['process']
                     if process.returncode is None:
                         process.terminate()
+                elif session.get('type') == 'pty':
+                    session['process'].terminate()
                 elif session.get('type') == 'winpty_fallback':
                     process = session.get('process')
                     if process:
@@ -651,11 +1076,13 @@ class SSHManager:
             except Exception as e:
                 logger.error(f"Error terminating local session: {e}")
         
+        self.connect_traces.pop(session_id, None)
+        
         # Cek apakah ini SSH session
         if session_id in self.connections:
             try:
-                self.connections[session_id].close()
-                asyncio.create_task(self.connections[session_id].wait_closed())
+                # Koneksi bisa dipakai tab lain, cukup lepas referensinya
+                self._release_pooled_connection(session_id)
                 logger.info(f"SSH session {session_id} closed")
             except Exception as e:
                 logger.error(f"Error closing SSH session: {e}")
@@ -663,8 +1090,42 @@ class SSHManager:
                 del self.connections[session_id]
         
         # Update session status
-        if session_id in self.sessions:
-            self.sessions[session_id]['connected'] = False
+        self._mark_disconnected(session_id)
+    
+    # ==================== IDLE REAPER ====================
+    def _mark_disconnected(self, session_id: str):
+        """Resource sudah ditutup, entry registry dibuang setelah TTL disconnected"""
+        if session_id not in self.sessions:
+            self.reaper.cancel(session_id)
+            return
+        self.sessions[session_id]['connected'] = False
+        if session_id in self.disconnected:
+            return
+        self.disconnected[session_id] = time.time()
+        self.reaper.schedule(session_id, 'disconnected')
+
+        # Registry dibatasi: buang entry disconnected yang paling lama
+        while len(self.disconnected) > MAX_DISCONNECTED_SESSIONS:
+            oldest = next(iter(self.disconnected))
+            self.reaper.reap_now(oldest, 'evicted')
+
+    def _reap_session(self, session_id: str, reason: str):
+        if reason in ('disconnected', 'evicted'):
+            self.disconnected.pop(session_id, None)
+            self.sessions.pop(session_id, None)
+        else:
+            # Idle terlalu lama: tutup shell/koneksi, entry-nya menyusul nanti
+            self.disconnect(session_id)
+    
+    def get_connect_diagnostics(self, host: str, port: int) -> Optional[Dict]:
+        return connect_diagnostics.get_host(host, port)
+    
+    def get_reaper_status(self) -> Dict:
+        status = self.reaper.get_status()
+        status['sessions'] = len(self.sessions)
+        status['disconnected_sessions'] = len(self.disconnected)
+        status['max_disconnected_sessions'] = MAX_DISCONNECTED_SESSIONS
+        return status
     
     def get_session_status(self, session_id: str) -> Dict:
         return self.sessions.get(session_id, {'connected': False})
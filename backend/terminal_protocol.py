@@ -0,0 +1,225 @@
+"""Framing untuk stream terminal di /ws/terminal/{session_id}.
+
+Ada dua mode yang dinegosiasikan lewat query param ``?protocol=``:
+
+- ``json``   : mode lama, setiap chunk output dikirim sebagai
+               ``{"type": "data", "data": "..."}`` (default untuk client lama)
+- ``binary`` : output mentah dikirim sebagai binary frame dengan header 1 byte,
+               pesan kontrol (hello, error, resize, exit) tetap text frame JSON
+
+Mode binary bisa minta kompresi dengan ``?compress=deflate``. Server memakai
+satu konteks raw deflate per websocket (context takeover antar frame, jadi
+prompt/escape sequence yang berulang murah) dan mengirim frame
+``FRAME_DATA_DEFLATE``: header 1 byte + panjang asli (uint32 big endian) +
+payload deflate hasil Z_SYNC_FLUSH tanpa ekor ``00 00 ff ff``. Frame yang
+lebih kecil dari ``WT_COMPRESS_MIN_BYTES`` (echo keystroke) tetap dikirim
+sebagai ``FRAME_DATA`` biasa. Hasil negosiasi dikirim di pesan ``hello``.
+
+Output dari shell selalu berupa bytes. Decode UTF-8 hanya dilakukan untuk
+client mode json, dengan decoder incremental per session supaya karakter
+multibyte yang terpotong di batas read tidak rusak.
+"""
+import codecs
+import json
+import logging
+import os
+import struct
+import time
+import zlib
+from typing import AsyncIterator, Dict, Optional, Sequence, Union
+
+from backend.metrics import COMPRESSION, new_compression_counters
+
+logger = logging.getLogger(__name__)
+
+PROTOCOL_JSON = "json"
+PROTOCOL_BINARY = "binary"
+SUPPORTED_PROTOCOLS = (PROTOCOL_JSON, PROTOCOL_BINARY)
+
+COMPRESSION_DEFLATE = "deflate"
+# 0 = tolak semua permintaan kompresi
+COMPRESSION_ENABLED = os.environ.get("WT_COMPRESSION", "1").lower() in ("1", "true", "yes")
+COMPRESS_MIN_BYTES = int(os.environ.get("WT_COMPRESS_MIN_BYTES", "128"))
+# Level 3: rasio ~8x untuk log, CPU ~4x lebih murah dari level 6 (benchmarks.bench_terminal --compress)
+COMPRESS_LEVEL = int(os.environ.get("WT_COMPRESS_LEVEL", "3"))
+
+# ==================== BINARY FRAME HEADER ====================
+# Byte pertama setiap binary frame menentukan jenis payload
+FRAME_DATA = 0x01    # server -> client: output terminal mentah
+FRAME_INPUT = 0x02   # client -> server: input mentah (misal paste besar)
+FRAME_DATA_DEFLATE = 0x03  # server -> client: output terkompresi (lihat docstring modul)
+
+_DATA_HEADER = bytes([FRAME_DATA])
+_DEFLATE_HEADER = struct.Struct(">BI")
+_SYNC_TAIL = b"\x00\x00\xff\xff"
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+
+def negotiate_protocol(websocket) -> str:
+    """Ambil mode protocol yang diminta client, fallback ke json"""
+    requested = websocket.query_params.get("protocol", PROTOCOL_JSON).lower()
+    if requested not in SUPPORTED_PROTOCOLS:
+        logger.warning(f"Unknown terminal protocol '{requested}', falling back to json")
+        return PROTOCOL_JSON
+    return requested
+
+
+def negotiate_compression(websocket, protocol: str) -> Optional[str]:
+    """Kompresi hanya untuk mode binary dan kalau server mengizinkan"""
+    requested = websocket.query_params.get("compress", "").lower()
+    if requested != COMPRESSION_DEFLATE or protocol != PROTOCOL_BINARY or not COMPRESSION_ENABLED:
+        return None
+    return COMPRESSION_DEFLATE
+
+
+def negotiate_trace(websocket) -> bool:
+    """Tracing latency echo hanya aktif kalau client minta ?trace=1"""
+    return websocket.query_params.get("trace", "").lower() in ("1", "true", "yes")
+
+
+def encode_json_output(data: Union[bytes, str]) -> str:
+    """Encode output untuk mode json (sama persis dengan send_json lama)"""
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = bytes(data).decode('utf-8', errors='replace')
+    return json.dumps({"type": "data", "data": data}, separators=(",", ":"))
+
+
+def encode_binary_output(data: Union[bytes, str]) -> bytes:
+    """Encode output untuk mode binary: header FRAME_DATA + bytes mentah"""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return _DATA_HEADER + data
+
+
+class TerminalChannel:
+    """Wrapper websocket yang tahu mode protocol session"""
+
+    def __init__(self, websocket, protocol: str = PROTOCOL_JSON, trace: bool = False,
+                 compression: Optional[str] = None):
+        self.websocket = websocket
+        self.protocol = protocol
+        self.trace = trace
+        self.closed = False
+        # Hanya dibuat untuk mode json, mode binary tidak pernah decode
+        self._decoder = None
+        if protocol == PROTOCOL_JSON:
+            self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+        # Konteks deflate hidup selama websocket ini, decompressor client juga
+        self.compression = compression if protocol == PROTOCOL_BINARY else None
+        self._compressor = None
+        self.compression_stats: Optional[Dict] = None
+        if self.compression == COMPRESSION_DEFLATE:
+            self._compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS)
+            self.compression_stats = new_compression_counters()
+
+    @property
+    def is_binary(self) -> bool:
+        return self.protocol == PROTOCOL_BINARY
+
+    async def send_hello(self):
+        """Konfirmasi mode protocol ke client (selalu text frame)"""
+        await self.send_control("hello", protocol=self.protocol, compression=self.compression)
+
+    async def send_output(self, data: Union[BytesLike, str]):
+        await self.send_output_chunks((data,))
+
+    async def send_output_chunks(self, chunks: Sequence[Union[BytesLike, str]]):
+        """Kirim beberapa chunk output sebagai satu frame.
+
+        Mode binary: header + chunk di-join sekali (satu copy, tanpa decode).
+        Mode json: chunk di-decode incremental lalu dibungkus JSON.
+        """
+        if self._compressor is not None:
+            await self.websocket.send_bytes(self._deflate_frame(b"".join(
+                chunk.encode('utf-8') if isinstance(chunk, str) else chunk for chunk in chunks
+            )))
+            return
+
+        if self.is_binary:
+            await self.websocket.send_bytes(b"".join([
+                _DATA_HEADER,
+                *(chunk.encode('utf-8') if isinstance(chunk, str) else chunk for chunk in chunks)
+            ]))
+            return
+
+        text = "".join(
+            chunk if isinstance(chunk, str) else self._decoder.decode(chunk)
+            for chunk in chunks
+        )
+        if text:
+            await self.websocket.send_text(
+                json.dumps({"type": "data", "data": text}, separators=(",", ":"))
+            )
+
+    def _deflate_frame(self, payload: bytes) -> bytes:
+        stats = self.compression_stats
+        if len(payload) < COMPRESS_MIN_BYTES:
+            # Echo keystroke: header deflate lebih besar dari hematnya
+            stats["raw_frames"] += 1
+            COMPRESSION["raw_frames"] += 1
+            return _DATA_HEADER + payload
+
+        started = time.perf_counter()
+        body = self._compressor.compress(payload) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        elapsed = time.perf_counter() - started
+        if body.endswith(_SYNC_TAIL):
+            body = body[:-len(_SYNC_TAIL)]
+
+        for counters in (stats, COMPRESSION):
+            counters["frames"] += 1
+            counters["input_bytes"] += len(payload)
+            counters["output_bytes"] += len(body)
+            counters["cpu_seconds"] += elapsed
+        return _DEFLATE_HEADER.pack(FRAME_DATA_DEFLATE, len(payload)) + body
+
+    async def send_control(self, msg_type: str, **fields):
+        if self.closed:
+            # Client sudah disconnect, pesan kontrol tidak perlu dikirim
+            return
+        message = {"type": msg_type}
+        message.update(fields)
+        await self.websocket.send_text(json.dumps(message, separators=(",", ":")))
+
+    async def send_error(self, message: str):
+        await self.send_control("error", data=message)
+
+    async def iter_messages(self) -> AsyncIterator[Dict]:
+        """Iterasi pesan dari client.
+
+        Text frame di-parse sebagai JSON seperti biasa. Binary frame dengan
+        header FRAME_INPUT diterjemahkan jadi pesan input dengan data bytes.
+        """
+        while True:
+            message = await self.websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                self.closed = True
+                return
+
+            text = message.get("text")
+            if text is not None:
+                yield json.loads(text)
+                continue
+
+            payload = message.get("bytes")
+            if not payload:
+                continue
+            if payload[0] == FRAME_INPUT:
+                yield {"type": "input", "data": payload[1:]}
+            else:
+                logger.warning(f"Unknown binary frame type: {payload[0]}")
+
+
+def input_as_text(data: Union[bytes, str]) -> str:
+    """Normalisasi input client ke str (untuk channel mode text)"""
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return bytes(data).decode('utf-8', errors='replace')
+    return data
+
+
+def input_as_bytes(data: Union[bytes, str]) -> bytes:
+    """Normalisasi input client ke bytes (untuk pipe/fd)"""
+    if isinstance(data, str):
+        return data.encode('utf-8')
+    return bytes(data)
@@ -0,0 +1,370 @@
+"""Terminal yang hidup lebih lama dari websocket-nya.
+
+Setiap TerminalSession memegang proses shell (SSH PTY channel atau shell
+lokal) dan satu task reader yang selalu jalan. Semua output masuk ke
+ScrollbackBuffer (ring buffer dengan offset absolut) dan, kalau ada client
+yang attach, ke OutputPump client tersebut.
+
+Kalau websocket putus (reload tab, jaringan mobile), shell tetap jalan.
+Client yang reconnect dengan ``?resume=<token>&offset=<n>`` hanya menerima
+byte yang terlewat dari scrollback lalu lanjut ke output live, tanpa
+handshake SSH ulang.
+"""
+import asyncio
+import logging
+import os
+import secrets
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from backend.echo_trace import EchoTracer
+from backend.metrics import TOTALS, new_session_counters
+from backend.output_pump import READ_SIZE_MAX, OutputPump
+from backend.session_recorder import SessionRecorder, start_recording
+from backend.terminal_protocol import TerminalChannel, input_as_bytes, input_as_text
+
+logger = logging.getLogger(__name__)
+
+SCROLLBACK_BYTES = int(os.environ.get("WT_SCROLLBACK_BYTES", str(256 * 1024)))
+
+
+class ScrollbackBuffer:
+    """Ring buffer byte berukuran tetap dengan offset absolut"""
+
+    def __init__(self, capacity: int = SCROLLBACK_BYTES):
+        self.capacity = capacity
+        self._buf = bytearray(capacity)
+        self.end_offset = 0
+
+    @property
+    def start_offset(self) -> int:
+        return max(0, self.end_offset - self.capacity)
+
+    def __len__(self) -> int:
+        return self.end_offset - self.start_offset
+
+    def append(self, data):
+        size = len(data)
+        view = memoryview(data)
+        if size > self.capacity:
+            # Hanya ekor data yang muat
+            view = view[size - self.capacity:]
+        self.end_offset += size
+
+        # Byte dengan offset absolut o selalu disimpan di posisi o % capacity
+        length = len(view)
+        pos = (self.end_offset - length) % self.capacity
+        first = min(length, self.capacity - pos)
+        self._buf[pos:pos + first] = view[:first]
+        if first < length:
+            self._buf[:length - first] = view[first:]
+
+    def read_from(self, offset: int) -> Tuple[bytes, int]:
+        """Ambil byte sejak offset, return (data, offset awal data sebenarnya)"""
+        offset = min(max(offset, self.start_offset), self.end_offset)
+        size = self.end_offset - offset
+        if size == 0:
+            return b"", offset
+
+        pos = offset % self.capacity
+        first = min(size, self.capacity - pos)
+        data = bytes(self._buf[pos:pos + first])
+        if first < size:
+            data += bytes(self._buf[:size - first])
+        return data, offset
+
+
+# ==================== SHELL IO ADAPTERS ====================
+# Semua backend shell dibungkus ke interface yang sama:
+# read(n) -> bytes, async write(bytes), resize(cols, rows), terminate(), wait() -> exit code
+
+class SSHShellIO:
+    """PTY channel asyncssh (dibuka dengan encoding=None)"""
+
+    def __init__(self, process):
+        self.process = process
+
+    async def read(self, n: int):
+        return await self.process.stdout.read(n)
+
+    async def write(self, data):
+        self.process.stdin.write(data)
+        await self.process.stdin.drain()
+
+    def resize(self, cols: int, rows: int):
+        self.process.change_terminal_size(cols, rows)
+
+    def terminate(self):
+        self.process.close()
+
+    async def wait(self) -> Optional[int]:
+        await self.process.wait_closed()
+        return self.process.exit_status
+
+
+class PipeShellIO:
+    """Shell lokal via asyncio subprocess dengan pipe (tanpa TTY)"""
+
+    def __init__(self, process):
+        self.process = process
+
+    async def read(self, n: int):
+        return await self.process.stdout.read(n)
+
+    async def write(self, data):
+        self.process.stdin.write(data)
+        await self.process.stdin.drain()
+
+    def resize(self, cols: int, rows: int):
+        # Pipe tidak punya ukuran terminal
+        pass
+
+    def terminate(self):
+        if self.process.returncode is None:
+            self.process.terminate()
+
+    async def wait(self) -> Optional[int]:
+        return await self.process.wait()
+
+
+class WinptyShellIO:
+    """Proses pywinpty (ConPTY) di Windows, read/write berbasis str"""
+
+    def __init__(self, proc):
+        self.proc = proc
+
+    async def read(self, n: int):
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self.proc.isalive():
+                return b""
+            data = await loop.run_in_executor(None, self.proc.read, n)
+            if data:
+                return data.encode('utf-8')
+            await asyncio.sleep(0.05)
+
+    async def write(self, data):
+        self.proc.write(input_as_text(data))
+
+    def resize(self, cols: int, rows: int):
+        self.proc.setwinsize(rows, cols)
+
+    def terminate(self):
+        self.proc.terminate()
+
+    async def wait(self) -> Optional[int]:
+        return self.proc.exitstatus
+
+
+class TerminalSession:
+    """Shell + scrollback yang bisa di-attach/detach dari websocket"""
+
+    def __init__(self, session_id: str, shell_io, info: Optional[Dict] = None,
+                 on_exit: Optional[Callable[["TerminalSession"], None]] = None,
+                 on_detach: Optional[Callable[["TerminalSession"], None]] = None,
+                 scrollback_bytes: int = SCROLLBACK_BYTES):
+        self.session_id = session_id
+        self.io = shell_io
+        self.info = info if info is not None else {}
+        self.on_exit = on_exit
+        self.on_detach = on_detach
+        self.resume_token = secrets.token_urlsafe(24)
+        self.scrollback = ScrollbackBuffer(scrollback_bytes)
+        self.counters = new_session_counters()
+        # Dibuat saat pertama kali ada websocket dengan ?trace=1
+        self.tracer: Optional[EchoTracer] = None
+        # Counter kompresi gabungan semua websocket ?compress=deflate
+        self.compression: Optional[Dict] = None
+        # None kalau WT_RECORDING_DIR tidak diisi
+        self.recorder: Optional[SessionRecorder] = start_recording(session_id, self.info)
+        if self.recorder is not None:
+            # Live view: stats hanya diubah di event loop (lihat SessionRecorder)
+            self.info['recording'] = self.recorder.stats
+
+        self.channel: Optional[TerminalChannel] = None
+        self.pump: Optional[OutputPump] = None
+        self.exited = False
+        self.exit_code: Optional[int] = None
+        self.created_at = time.time()
+        self.last_attached_at: Optional[float] = None
+        self.last_detached_at: Optional[float] = None
+
+        self._update_info()
+        self._reader = asyncio.create_task(self._read_loop())
+
+    @property
+    def attached(self) -> bool:
+        return self.channel is not None
+
+    def _update_info(self):
+        self.info['terminal'] = {
+            'attached': self.attached,
+            'exited': self.exited,
+            'output_offset': self.scrollback.end_offset,
+            'scrollback_bytes': len(self.scrollback),
+            'scrollback_capacity': self.scrollback.capacity,
+        }
+
+    async def _read_loop(self):
+        try:
+            while True:
+                data = await self.io.read(self.pump.read_size if self.pump else READ_SIZE_MAX)
+                if not data:
+                    break
+                # Append + ambil pump tanpa await di antaranya, supaya attach()
+                # yang snapshot scrollback tidak kehilangan/menggandakan byte
+                self.scrollback.append(data)
+                self.info['terminal']['output_offset'] = self.scrollback.end_offset
+                if self.tracer is not None:
+                    self.tracer.on_output()
+                if self.recorder is not None:
+                    self.recorder.record_output(data)
+                pump = self.pump
+                if pump is not None:
+                    try:
+                        await pump.feed(data)
+                    except ConnectionError:
+                        # Client putus, data sudah aman di scrollback
+                        pass
+        except Exception as e:
+            logger.error(f"Terminal read error ({self.session_id}): {e}")
+        finally:
+            self.exited = True
+            try:
+                self.exit_code = await asyncio.wait_for(self.io.wait(), timeout=2.0)
+            except Exception:
+                pass
+            self._update_info()
+            await self._finish_attached()
+            if self.recorder is not None:
+                await self.recorder.close()
+            if self.on_exit is not None:
+                self.on_exit(self)
+
+    async def _finish_attached(self):
+        """Shell selesai: kirim sisa output + exit lalu tutup websocket client"""
+        channel, pump = self.channel, self.pump
+        if channel is None:
+            return
+        await pump.close()
+        try:
+            await channel.send_control("exit", code=self.exit_code)
+            await channel.websocket.close()
+        except Exception as e:
+            logger.debug(f"Closing websocket after exit failed: {e}")
+
+    async def attach(self, channel: TerminalChannel, offset: Optional[int] = None):
+        """Pasang websocket baru, kirim byte yang terlewat sejak offset lalu live"""
+        if self.channel is not None:
+            # Websocket lama belum terdeteksi putus (network blip), ambil alih
+            old = self.channel
+            await self._release_channel()
+            try:
+                await old.websocket.close(code=1000, reason="Session resumed elsewhere")
+            except Exception:
+                pass
+
+        replay, replay_from = self.scrollback.read_from(
+            self.scrollback.start_offset if offset is None else offset
+        )
+
+        # Pump belum di-start: replay dan output live yang masuk selama
+        # pesan 'attached' dikirim tetap antri berurutan di buffer pump
+        pump = OutputPump(channel, counters=self.counters)
+        if channel.compression_stats is not None:
+            # Konteks deflate per websocket, counter-nya diakumulasi per session
+            if self.compression is None:
+                self.compression = channel.compression_stats
+                self.info['compression'] = self.compression
+            channel.compression_stats = self.compression
+        if channel.trace:
+            if self.tracer is None:
+                self.tracer = EchoTracer()
+                self.info['echo_trace'] = self.tracer.stats
+            pump.on_flush = self.tracer.on_flush
+        view = memoryview(replay)
+        for start in range(0, len(replay), pump.max_frame_bytes):
+            pump.feed_nowait(view[start:start + pump.max_frame_bytes])
+
+        self.channel = channel
+        self.pump = pump
+        self.last_attached_at = time.time()
+        self.info['output'] = pump.stats
+        self._update_info()
+
+        await channel.send_control(
+            "attached",
+            resume_token=self.resume_token,
+            offset=replay_from,
+            replayed=len(replay),
+            truncated=offset is not None and replay_from > offset,
+        )
+        pump.start()
+
+        if self.exited:
+            await self._finish_attached()
+
+    async def detach(self):
+        """Lepas websocket, shell tetap hidup dan output tetap masuk scrollback"""
+        await self._release_channel()
+        if self.on_detach is not None:
+            self.on_detach(self)
+
+    async def _release_channel(self):
+        pump = self.pump
+        self.channel = None
+        self.pump = None
+        self.last_detached_at = time.time()
+        self._update_info()
+        if self.tracer is not None:
+            self.tracer.reset()
+        if pump is not None:
+            await pump.close()
+
+    async def serve(self, channel: TerminalChannel, offset: Optional[int] = None):
+        """Attach lalu proses input client sampai websocket ditutup"""
+        await self.attach(channel, offset)
+        try:
+            async for message in channel.iter_messages():
+                if self.channel is not channel:
+                    # Sudah diambil alih websocket lain
+                    break
+                TOTALS["frames_in"] += 1
+                self.counters["frames_in"] += 1
+                if message['type'] == 'input':
+                    data = input_as_bytes(message['data'])
+                    TOTALS["bytes_in"] += len(data)
+                    self.counters["bytes_in"] += len(data)
+                    traced = channel.trace and self.tracer.on_input(message)
+                    if self.recorder is not None:
+                        self.recorder.record_input(data)
+                    await self.io.write(data)
+                    if traced:
+                        self.tracer.on_written()
+                elif message['type'] == 'trace':
+                    if channel.trace:
+                        self.tracer.on_report(message)
+                elif message['type'] == 'resize':
+                    cols = max(10, int(message.get('cols', 80)))
+                    rows = max(10, int(message.get('rows', 24)))
+                    self.io.resize(cols, rows)
+                    if self.recorder is not None:
+                        self.recorder.record_resize(cols, rows)
+                    await channel.send_control("resize", cols=cols, rows=rows)
+        except Exception as e:
+            logger.error(f"Terminal write error ({self.session_id}): {e}")
+        finally:
+            if self.channel is channel:
+                await self.detach()
+
+    def close(self):
+        """Matikan shell (disconnect eksplisit / reaper), reader yang beres-beres"""
+        if not self.exited:
+            try:
+                self.io.terminate()
+            except Exception as e:
+                logger.error(f"Error terminating terminal {self.session_id}: {e}")
+
+    async def wait_closed(self):
+        """Tunggu reader selesai (shell exit + exit message terkirim)"""
+        await asyncio.shield(self._reader)
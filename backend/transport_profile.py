@@ -0,0 +1,209 @@
+"""Profil transport SSH per saved host.
+
+Satu profil = preset (``TRANSPORT_PRESETS``) + override opsional yang
+disimpan di kolom ``SSHHost.transport_profile`` / ``transport_options``:
+
+- ``encryption_algs`` / ``mac_algs``: urutan preferensi algoritma, ``None``
+  berarti default asyncssh. AES-GCM paling cepat di CPU dengan AES-NI,
+  chacha20-poly1305 lebih cepat di CPU tanpa akselerasi AES (ARM kecil)
+- ``compression``: ``auto`` (default asyncssh, zlib@openssh.com kalau server
+  mau), ``on`` (prefer zlib, untuk link lambat) atau ``off`` (tanpa
+  kompresi, untuk LAN: zlib memakan CPU event loop)
+- ``window`` / ``max_pktsize``: window dan ukuran paket channel, window
+  besar membantu link dengan latency tinggi (bandwidth-delay product)
+- ``keepalive_interval`` / ``keepalive_count_max``: 0 = keepalive mati
+
+Profil yang sudah di-resolve selalu lengkap (semua key ada), dipakai
+langsung untuk opsi ``asyncssh.connect`` dan sebagai bagian key pool
+koneksi: host yang sama dengan profil berbeda tidak berbagi koneksi.
+
+Bandingkan preset terhadap satu host dengan ``python -m benchmarks.bench_transport``.
+"""
+import json
+from typing import Dict, List, Optional, Union
+
+from asyncssh.compression import get_compression_algs
+from asyncssh.encryption import get_encryption_algs
+from asyncssh.kex import get_kex_algs
+from asyncssh.mac import get_mac_algs
+
+DEFAULT_PROFILE = "default"
+
+_GCM_FIRST = ["aes128-gcm@openssh.com", "aes256-gcm@openssh.com",
+              "chacha20-poly1305@openssh.com", "aes128-ctr", "aes256-ctr"]
+_CHACHA_FIRST = ["chacha20-poly1305@openssh.com", "aes128-gcm@openssh.com",
+                 "aes256-gcm@openssh.com", "aes128-ctr", "aes256-ctr"]
+# Hanya dipakai cipher non-AEAD (ctr), GCM/chacha punya MAC sendiri
+_ETM_MACS = ["umac-64-etm@openssh.com", "hmac-sha2-256-etm@openssh.com",
+             "hmac-sha2-512-etm@openssh.com", "hmac-sha2-256"]
+
+TRANSPORT_PRESETS: Dict[str, Dict] = {
+    # Perilaku lama: default asyncssh + keepalive 15 detik
+    "default": {
+        "encryption_algs": None,
+        "mac_algs": None,
+        "compression": "auto",
+        "window": 2 * 1024 * 1024,
+        "max_pktsize": 32 * 1024,
+        "keepalive_interval": 15,
+        "keepalive_count_max": 3,
+    },
+    # LAN / datacenter: cipher tercepat, tanpa kompresi, window besar
+    "throughput": {
+        "encryption_algs": _GCM_FIRST,
+        "mac_algs": _ETM_MACS,
+        "compression": "off",
+        "window": 8 * 1024 * 1024,
+        "max_pktsize": 128 * 1024,
+        "keepalive_interval": 15,
+        "keepalive_count_max": 3,
+    },
+    # Sama dengan throughput, untuk CPU tanpa AES-NI
+    "chacha": {
+        "encryption_algs": _CHACHA_FIRST,
+        "mac_algs": _ETM_MACS,
+        "compression": "off",
+        "window": 8 * 1024 * 1024,
+        "max_pktsize": 128 * 1024,
+        "keepalive_interval": 15,
+        "keepalive_count_max": 3,
+    },
+    # Link lambat / tidak stabil: kompresi, keepalive lebih sabar
+    "slow-link": {
+        "encryption_algs": None,
+        "mac_algs": None,
+        "compression": "on",
+        "window": 2 * 1024 * 1024,
+        "max_pktsize": 32 * 1024,
+        "keepalive_interval": 30,
+        "keepalive_count_max": 6,
+    },
+}
+
+COMPRESSION_MODES = ("auto", "on", "off")
+_COMPRESSION_ALGS = {
+    "on": ["zlib@openssh.com", "zlib", "none"],
+    "off": ["none"],
+}
+
+# (min, max) untuk field numerik
+_LIMITS = {
+    "window": (64 * 1024, 64 * 1024 * 1024),
+    # Di bawah batas paket OpenSSH (256 KiB termasuk header)
+    "max_pktsize": (4 * 1024, 128 * 1024),
+    "keepalive_interval": (0, 3600),
+    "keepalive_count_max": (1, 100),
+}
+
+
+def supported_algorithms() -> Dict[str, List[str]]:
+    return {
+        "encryption": [alg.decode('ascii') for alg in get_encryption_algs()],
+        "mac": [alg.decode('ascii') for alg in get_mac_algs()],
+    }
+
+
+def _check_algs(name: str, algs, supported: List[str]) -> Optional[List[str]]:
+    if algs is None:
+        return None
+    if isinstance(algs, str):
+        algs = [alg.strip() for alg in algs.split(",") if alg.strip()]
+    if not isinstance(algs, list) or not algs:
+        raise ValueError(f"{name} must be a non-empty list or null")
+    unknown = [alg for alg in algs if alg not in supported]
+    if unknown:
+        raise ValueError(f"Unsupported {name}: {', '.join(map(str, unknown))}")
+    return list(algs)
+
+
+def resolve_transport(profile: Optional[str] = None,
+                      options: Union[str, Dict, None] = None) -> Dict:
+    """Gabungkan preset + override, raise ValueError kalau tidak valid"""
+    name = profile or DEFAULT_PROFILE
+    if name not in TRANSPORT_PRESETS:
+        raise ValueError(f"Unknown transport profile '{name}' "
+                         f"(available: {', '.join(TRANSPORT_PRESETS)})")
+    if isinstance(options, str):
+        options = json.loads(options) if options.strip() else None
+    options = options or {}
+    if not isinstance(options, dict):
+        raise ValueError("Transport options must be an object")
+
+    resolved = dict(TRANSPORT_PRESETS[name])
+    unknown = set(options) - set(resolved)
+    if unknown:
+        raise ValueError(f"Unknown transport option: {', '.join(sorted(unknown))}")
+    resolved.update(options)
+
+    algorithms = supported_algorithms()
+    resolved["encryption_algs"] = _check_algs(
+        "encryption_algs", resolved["encryption_algs"], algorithms["encryption"]
+    )
+    resolved["mac_algs"] = _check_algs("mac_algs", resolved["mac_algs"], algorithms["mac"])
+    if resolved["compression"] not in COMPRESSION_MODES:
+        raise ValueError(f"compression must be one of {', '.join(COMPRESSION_MODES)}")
+    for field, (low, high) in _LIMITS.items():
+        value = resolved[field]
+        if isinstance(value, bool) or not isinstance(value, (int, float)) \
+                or not low <= value <= high:
+            raise ValueError(f"{field} must be between {low} and {high}")
+        if field != "keepalive_interval":
+            resolved[field] = int(value)
+
+    resolved["profile"] = name
+    return resolved
+
+
+def host_transport(host) -> Dict:
+    """Profil transport SSHHost, profil rusak di DB jatuh ke default"""
+    try:
+        return resolve_transport(host.transport_profile, host.transport_options)
+    except ValueError:
+        return resolve_transport()
+
+
+def transport_key(transport: Optional[Dict]) -> str:
+    """Bagian key pool koneksi"""
+    return json.dumps(transport or resolve_transport(), sort_keys=True)
+
+
+def connect_options(transport: Optional[Dict], compat: bool = False) -> Dict:
+    """Opsi tambahan untuk asyncssh.connect
+
+    ``compat=True`` dipakai fallback Method 2: izinkan semua algoritma yang
+    didukung asyncssh (termasuk cbc/sha1 lama) untuk server tua yang tidak
+    cocok dengan daftar default, window/keepalive tetap dari profil.
+    """
+    transport = transport or resolve_transport()
+    options = {
+        "window": transport["window"],
+        "max_pktsize": transport["max_pktsize"],
+        "keepalive_interval": transport["keepalive_interval"],
+        "keepalive_count_max": transport["keepalive_count_max"],
+    }
+    if compat:
+        options.update(
+            kex_algs=[alg.decode('ascii') for alg in get_kex_algs()],
+            encryption_algs=[alg.decode('ascii') for alg in get_encryption_algs()],
+            mac_algs=[alg.decode('ascii') for alg in get_mac_algs()],
+            compression_algs=[alg.decode('ascii') for alg in get_compression_algs()],
+        )
+        return options
+
+    if transport["encryption_algs"]:
+        options["encryption_algs"] = transport["encryption_algs"]
+    if transport["mac_algs"]:
+        options["mac_algs"] = transport["mac_algs"]
+    if transport["compression"] in _COMPRESSION_ALGS:
+        options["compression_algs"] = _COMPRESSION_ALGS[transport["compression"]]
+    return options
+
+
+def negotiated_transport(conn, transport: Optional[Dict]) -> Dict:
+    """Hasil negosiasi (arah server -> client) untuk info session"""
+    return {
+        "profile": (transport or {}).get("profile", DEFAULT_PROFILE),
+        "cipher": conn.get_extra_info('recv_cipher'),
+        "mac": conn.get_extra_info('recv_mac'),
+        "compression": conn.get_extra_info('recv_compression'),
+    }
@@ -0,0 +1,168 @@
+"""Cache per user untuk saved hosts dan quick commands.
+
+Setiap (jenis, user_id) punya satu entry berisi:
+
+- ``rows``    : hasil query yang sudah diserialisasi (None = perlu reload)
+- ``version`` : naik setiap ada perubahan (add/update/delete)
+- ``changes`` : log perubahan terakhir untuk delta sync ``?since=<version>``
+
+Endpoint mutasi tidak mengubah ``rows`` di tempat, cukup mencatat
+perubahan dan membuang ``rows`` sehingga GET berikutnya query ulang.
+Versi berasal dari satu counter global + epoch proses, jadi token dari
+entry yang sudah di-evict atau dari proses sebelum restart tidak pernah
+dianggap masih valid.
+
+Jumlah entry dibatasi dengan LRU (OrderedDict).
+"""
+import logging
+import os
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+# ==================== KONFIGURASI ====================
+USER_CACHE_MAX_ENTRIES = int(os.environ.get("WT_USER_CACHE_MAX_ENTRIES", "4096"))
+USER_CACHE_MAX_CHANGES = int(os.environ.get("WT_USER_CACHE_MAX_CHANGES", "128"))
+
+_EPOCH = os.urandom(4).hex()
+
+
+class UserDataCache:
+    """LRU cache (jenis, user_id) -> rows + versi + log perubahan"""
+
+    def __init__(self, max_entries: int = USER_CACHE_MAX_ENTRIES,
+                 max_changes: int = USER_CACHE_MAX_CHANGES):
+        self.max_entries = max_entries
+        self.max_changes = max_changes
+        self._entries: "OrderedDict[Tuple[str, int], Dict]" = OrderedDict()
+        self._counter = 0
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "not_modified": 0,
+            "evictions": 0,
+            "deltas": 0,
+            "full_resyncs": 0,
+        }
+
+    # ==================== VERSION TOKEN ====================
+    def _next_version(self) -> int:
+        self._counter += 1
+        return self._counter
+
+    @staticmethod
+    def token(version: int) -> str:
+        return f"{_EPOCH}.{version}"
+
+    @staticmethod
+    def parse_token(token: Optional[str]) -> Optional[int]:
+        """Token dari proses lain (restart) atau format salah -> None"""
+        if not token:
+            return None
+        epoch, _, version = token.strip('W/"').partition(".")
+        if epoch != _EPOCH or not version.isdigit():
+            return None
+        return int(version)
+
+    # ==================== ENTRY ====================
+    def _get_entry(self, key: Tuple[str, int]) -> Dict:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            return entry
+
+        version = self._next_version()
+        entry = {
+            "rows": None,
+            "version": version,
+            # Delta lengkap hanya bisa dihitung dari versi >= base
+            "base": version,
+            "changes": deque(),
+        }
+        self._entries[key] = entry
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+        return entry
+
+    async def get_rows(self, kind: str, user_id: int,
+                       loader: Callable[[], Awaitable[List[Dict]]]) -> Tuple[List[Dict], int]:
+        """Ambil rows dari cache, atau panggil loader (query DB) kalau belum ada"""
+        key = (kind, user_id)
+        entry = self._get_entry(key)
+        if entry["rows"] is not None:
+            self.stats["hits"] += 1
+            return entry["rows"], entry["version"]
+
+        self.stats["misses"] += 1
+        version = entry["version"]
+        rows = await loader()
+        # Ada mutasi selama query berjalan: hasilnya mungkin basi, jangan disimpan
+        if self._entries.get(key) is entry and entry["version"] == version:
+            entry["rows"] = rows
+        return rows, version
+
+    def record_change(self, kind: str, user_id: int, row_id: int, row: Optional[Dict] = None):
+        """Catat add/update (row) atau delete (row=None), rows di-reload saat GET berikutnya"""
+        entry = self._entries.get((kind, user_id))
+        if entry is None:
+            # Belum di-cache: load berikutnya otomatis dapat versi baru
+            return
+
+        version = self._next_version()
+        if len(entry["changes"]) >= self.max_changes:
+            entry["base"] = entry["changes"].popleft()[0]
+        entry["changes"].append((version, row_id, row))
+        entry["version"] = version
+        entry["rows"] = None
+
+    def invalidate_kind(self, kind: str):
+        """Data bersama semua user berubah (misal seed default commands)"""
+        for key in [key for key in self._entries if key[0] == kind]:
+            del self._entries[key]
+
+    # ==================== DELTA ====================
+    def delta(self, kind: str, user_id: int, since: Optional[str]) -> Optional[Dict]:
+        """Perubahan sejak versi ``since``, None kalau client harus full resync"""
+        since_version = self.parse_token(since)
+        entry = self._entries.get((kind, user_id))
+        if (entry is None or since_version is None
+                or not entry["base"] <= since_version <= entry["version"]):
+            self.stats["full_resyncs"] += 1
+            return None
+
+        self._entries.move_to_end((kind, user_id))
+        changed: Dict[int, Optional[Dict]] = {}
+        for version, row_id, row in entry["changes"]:
+            if version > since_version:
+                changed[row_id] = row
+        self.stats["deltas"] += 1
+        return {
+            "version": self.token(entry["version"]),
+            "full": False,
+            "upserted": [row for row in changed.values() if row is not None],
+            "deleted": [row_id for row_id, row in changed.items() if row is None],
+        }
+
+    def get_status(self) -> Dict:
+        status = dict(self.stats)
+        status["entries"] = len(self._entries)
+        status["max_entries"] = self.max_entries
+        return status
+
+
+def cached_response(request: Request, rows: List[Dict], version: int) -> Response:
+    """JSON response dengan ETag, 304 kalau client sudah punya versi ini"""
+    etag = f'W/"{UserDataCache.token(version)}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        user_cache.stats["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(rows, headers=headers)
+
+
+user_cache = UserDataCache()
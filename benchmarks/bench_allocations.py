@@ -0,0 +1,128 @@
+"""Benchmark alokasi memori per MB output: jalur text lama vs jalur bytes.
+
+- text  : perilaku sebelum jalur bytes. asyncssh decode setiap paket ke str,
+          lalu setiap chunk 1 KiB dibungkus {"type": "data"} + json.dumps dan
+          di-encode lagi ke UTF-8 oleh websocket.
+- bytes : jalur sekarang. Chunk bytes masuk OutputPump tanpa decode lalu
+          di-join sekali jadi binary frame (atau di-decode incremental untuk
+          client mode json).
+
+Diukur dengan tracemalloc: untuk setiap chunk, peak memory di-reset lalu
+selisih peak terhadap baseline dijumlahkan. Angka ini adalah byte transient
+yang dialokasikan per MB output (tidak termasuk payload sumber).
+
+Jalankan dari root repo:
+    python -m benchmarks.bench_allocations --mb 8
+"""
+import argparse
+import asyncio
+import codecs
+import json
+import tracemalloc
+
+from backend.output_pump import OutputPump
+from backend.terminal_protocol import PROTOCOL_BINARY, PROTOCOL_JSON, TerminalChannel
+from benchmarks.bench_protocol import make_log
+
+
+class NullWebSocket:
+    """Websocket palsu: hanya menghitung ukuran frame di wire"""
+
+    def __init__(self):
+        self.wire_bytes = 0
+        self.frames = 0
+
+    async def send_bytes(self, data: bytes):
+        self.wire_bytes += len(data)
+        self.frames += 1
+
+    async def send_text(self, data: str):
+        # Websocket akan encode text frame ke UTF-8
+        self.wire_bytes += len(data.encode("utf-8"))
+        self.frames += 1
+
+
+class Meter:
+    def __init__(self):
+        self.transient = 0
+
+    def start(self):
+        tracemalloc.reset_peak()
+        self.base = tracemalloc.get_traced_memory()[0]
+
+    def stop(self):
+        self.transient += tracemalloc.get_traced_memory()[1] - self.base
+
+
+async def run_text_path(payload: bytes, chunk: int, meter: Meter):
+    ws = NullWebSocket()
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    for offset in range(0, len(payload), chunk):
+        meter.start()
+        data = decoder.decode(payload[offset:offset + chunk])
+        await ws.send_text(json.dumps({"type": "data", "data": data}))
+        meter.stop()
+    return ws
+
+
+async def run_bytes_path(payload: bytes, chunk: int, meter: Meter, protocol: str):
+    ws = NullWebSocket()
+    pump = OutputPump(TerminalChannel(ws, protocol)).start()
+    view = memoryview(payload)
+    for offset in range(0, len(payload), chunk):
+        meter.start()
+        await pump.feed(view[offset:offset + chunk])
+        meter.stop()
+    meter.start()
+    await pump.close()
+    meter.stop()
+    return ws
+
+
+async def measure(name, payload, runner):
+    meter = Meter()
+    tracemalloc.start()
+    try:
+        ws = await runner(meter)
+    finally:
+        tracemalloc.stop()
+    mb = len(payload) / (1024 * 1024)
+    return {
+        "path": name,
+        "frames": ws.frames,
+        "wire_bytes": ws.wire_bytes,
+        "transient_kb_per_mb": round(meter.transient / 1024 / mb, 1),
+    }
+
+
+async def main_async(args):
+    payload = make_log(args.mb * 1024 * 1024)
+    results = [
+        await measure("text (before)", payload,
+                      lambda m: run_text_path(payload, args.chunk, m)),
+        await measure("bytes -> json", payload,
+                      lambda m: run_bytes_path(payload, args.chunk, m, PROTOCOL_JSON)),
+        await measure("bytes -> binary", payload,
+                      lambda m: run_bytes_path(payload, args.chunk, m, PROTOCOL_BINARY)),
+    ]
+
+    print(f"{'path':<18}{'frames':>10}{'wire MB':>10}{'alloc KB/MB':>14}")
+    for r in results:
+        print(f"{r['path']:<18}{r['frames']:>10}{r['wire_bytes'] / 1048576:>10.2f}"
+              f"{r['transient_kb_per_mb']:>14.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"chunk": args.chunk, "results": results}, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mb", type=int, default=8, help="ukuran output (MiB)")
+    parser.add_argument("--chunk", type=int, default=1024, help="ukuran chunk read")
+    parser.add_argument("--output", help="simpan hasil ke file JSON")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
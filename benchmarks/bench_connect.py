@@ -0,0 +1,201 @@
+"""Benchmark pipeline connect SSH: time-to-connect dan time-to-fail.
+
+Setiap skenario memanggil API connect berulang kali dan mengukur waktu
+sampai response (sukses atau 400). Koneksi pool tidak dipakai ulang:
+username dibuat unik per connect (stand-in menerima username apa saja)
+dan ``WT_SSH_POOL_LINGER=0``.
+
+- ``ok_ip``    : stand-in lewat 127.0.0.1
+- ``ok_name``  : stand-in lewat ``localhost`` (DNS, ::1 lalu 127.0.0.1)
+- ``legacy``   : saved host dengan profil yang cipher-nya tidak didukung
+                 server, baru berhasil setelah fallback semua algoritma
+- ``auth``     : password salah
+- ``refused``  : port tanpa listener
+- ``drop``     : server menerima TCP lalu langsung menutupnya
+- ``hang``     : server menerima TCP tapi tidak pernah mengirim banner SSH
+                 (habis di ``--timeout``)
+
+Hasil (p50/p95/max per skenario) ditulis ke JSON, bandingkan antar commit
+dengan ``--compare``.
+
+Jalankan dari root repo:
+    python -m benchmarks.bench_connect --samples 20 --timeout 3
+    python -m benchmarks.bench_connect --compare benchmarks/results/connect-abc1234.json
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+
+from benchmarks.bench_rest_echo import free_port
+from benchmarks.bench_terminal import compare, git_commit, percentile
+from benchmarks.stack import SSH_PASSWORD, BenchStack
+
+SCENARIOS = ("ok_ip", "ok_name", "legacy", "auth", "refused", "drop", "hang")
+# Skenario yang memang harus gagal (time-to-fail)
+FAILING = ("auth", "refused", "drop", "hang")
+
+
+# ==================== TARGET LOKAL ====================
+def _listen() -> socket.socket:
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(("127.0.0.1", 0))
+    server.listen(128)
+    return server
+
+
+def start_drop_server() -> socket.socket:
+    """Accept lalu close, misal MaxStartups penuh / fail2ban"""
+    server = _listen()
+
+    def serve():
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return
+            conn.close()
+
+    threading.Thread(target=serve, daemon=True).start()
+    return server
+
+
+def start_hang_server() -> socket.socket:
+    """Listen tanpa accept: handshake TCP selesai di kernel, banner tidak pernah datang"""
+    return _listen()
+
+
+class Scenarios:
+    def __init__(self, stack: BenchStack):
+        self.stack = stack
+        self.counter = 0
+        self.refused_port = free_port()
+        self.drop = start_drop_server()
+        self.hang = start_hang_server()
+        self.legacy_host_id = None
+
+    def setup_legacy(self):
+        credentials = urllib.parse.urlencode({"username": "connect-bench", "password": "bench"})
+        self.stack.api("POST", f"/api/register?{credentials}")
+        user_id = self.stack.api("POST", f"/api/login?{credentials}")["user_id"]
+        query = urllib.parse.urlencode({
+            "user_id": user_id, "host": "127.0.0.1", "port": self.stack.ssh_port,
+            "username": "legacy", "password": SSH_PASSWORD,
+        })
+        self.stack.api("POST", f"/api/hosts?{query}")
+        self.legacy_host_id = self.stack.api("GET", f"/api/hosts/{user_id}")[-1]["id"]
+        # Stand-in (asyncssh default) tidak menawarkan cbc
+        self.stack.api("PUT", f"/api/hosts/{self.legacy_host_id}/transport?user_id={user_id}",
+                       {"profile": "default", "options": {"encryption_algs": ["aes256-cbc"]}})
+
+    def connect(self, host: str, port: int, password: str = SSH_PASSWORD):
+        self.counter += 1
+        return self.stack.api("POST", "/api/connect", {
+            "host": host, "port": port,
+            "username": f"bench{self.counter}", "password": password,
+        })
+
+    def run(self, name: str):
+        """Satu connect, return session_id (None kalau gagal)"""
+        ssh_port = self.stack.ssh_port
+        try:
+            if name == "ok_ip":
+                return self.connect("127.0.0.1", ssh_port)["session_id"]
+            if name == "ok_name":
+                return self.connect("localhost", ssh_port)["session_id"]
+            if name == "legacy":
+                return self.stack.api("POST", f"/api/connect-saved/{self.legacy_host_id}")["session_id"]
+            if name == "auth":
+                return self.connect("127.0.0.1", ssh_port, password="wrong")["session_id"]
+            if name == "refused":
+                return self.connect("127.0.0.1", self.refused_port)["session_id"]
+            if name == "drop":
+                return self.connect("127.0.0.1", self.drop.getsockname()[1])["session_id"]
+            if name == "hang":
+                return self.connect("127.0.0.1", self.hang.getsockname()[1])["session_id"]
+        except urllib.error.HTTPError:
+            return None
+        raise ValueError(f"unknown scenario {name}")
+
+
+def measure(scenarios: Scenarios, name: str, samples: int) -> dict:
+    durations = []
+    ok = 0
+    for _ in range(samples):
+        started = time.perf_counter()
+        session_id = scenarios.run(name)
+        durations.append((time.perf_counter() - started) * 1000)
+        if session_id is not None:
+            ok += 1
+            scenarios.stack.api("POST", f"/api/disconnect/{session_id}")
+            # Beri waktu linger 0 menutup koneksi sebelum connect berikutnya
+            time.sleep(0.02)
+    return {
+        "samples": samples,
+        "ok": ok,
+        "p50_ms": round(statistics.median(durations), 2),
+        "p95_ms": round(percentile(durations, 0.95), 2),
+        "max_ms": round(max(durations), 2),
+        "mean_ms": round(statistics.mean(durations), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=20, help="connect per skenario")
+    parser.add_argument("--hang-samples", type=int, default=3,
+                        help="connect untuk skenario hang (masing-masing selama --timeout)")
+    parser.add_argument("--timeout", type=float, default=3.0, help="WT_SSH_CONNECT_TIMEOUT backend (detik)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"skenario yang dijalankan, dipisah koma ({','.join(SCENARIOS)})")
+    parser.add_argument("--output", help="file JSON hasil (default benchmarks/results/connect-<commit>.json)")
+    parser.add_argument("--compare", help="file JSON hasil sebelumnya untuk dibandingkan")
+    args = parser.parse_args()
+    args.scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+
+    commit = git_commit()
+    env = {"WT_SSH_CONNECT_TIMEOUT": str(args.timeout), "WT_SSH_POOL_LINGER": "0"}
+    results = {}
+    with BenchStack(env=env) as stack:
+        scenarios = Scenarios(stack)
+        if "legacy" in args.scenarios:
+            scenarios.setup_legacy()
+        for name in args.scenarios:
+            samples = args.hang_samples if name == "hang" else args.samples
+            results[name] = measure(scenarios, name, samples)
+            print(f"{name:<8} " + "  ".join(f"{k}={v}" for k, v in results[name].items()))
+
+    report = {
+        "meta": {
+            "benchmark": "connect",
+            "commit": commit,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        },
+        "results": results,
+        "failing": [name for name in results if name in FAILING],
+    }
+    output = args.output or os.path.join("benchmarks", "results", f"connect-{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nresults written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Benchmark throughput dan latency login (bcrypt) di beberapa level concurrency.
+
+Server (uvicorn backend.main:app) dijalankan di subprocess dengan database
+sementara dan konfigurasi hasher dari argumen (cost, jumlah worker, process
+pool). Untuk setiap level concurrency, N thread client memanggil
+/api/login berulang-ulang dengan koneksi keep-alive masing-masing.
+
+Yang dilaporkan per level: logins/sec, p50/p99 latency, jumlah 503
+(antrian hasher penuh) dan waktu tunggu antrian di server
+(/api/password-hasher).
+
+Jalankan dari root repo:
+    python -m benchmarks.bench_login --rounds 10 --levels 1,4,16,64
+"""
+import argparse
+import http.client
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.bench_rest_echo import api, free_port, wait_ready
+
+
+def _login_worker(port: int, count: int, latencies: list, rejected: list):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+    for _ in range(count):
+        started = time.perf_counter()
+        conn.request("POST", "/api/login?username=bench&password=bench")
+        response = conn.getresponse()
+        response.read()
+        if response.status == 503:
+            rejected[0] += 1
+            time.sleep(0.05)
+            continue
+        if response.status != 200:
+            raise RuntimeError(f"login failed: HTTP {response.status}")
+        latencies.append((time.perf_counter() - started) * 1000)
+    conn.close()
+
+
+def run_level(port: int, concurrency: int, per_client: int):
+    latencies, rejected = [], [0]
+    threads = [
+        threading.Thread(target=_login_worker, args=(port, per_client, latencies, rejected))
+        for _ in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return latencies, rejected[0], elapsed
+
+
+def summarize(concurrency: int, latencies, rejected: int, elapsed: float, hasher: dict):
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] if ordered else float("nan")
+    p50 = statistics.median(ordered) if ordered else float("nan")
+    wait_p99 = hasher["wait_ms"]["p99"]
+    print(f"c={concurrency:<4} {len(ordered) / elapsed:7.1f} logins/s  "
+          f"p50 {p50:8.1f} ms  p99 {p99:8.1f} ms  503s {rejected:<4} "
+          f"queue wait p99 {wait_p99 if wait_p99 is not None else '-':>8} ms  "
+          f"peak queued {hasher['peak_queued']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=10, help="bcrypt cost factor (WT_BCRYPT_ROUNDS)")
+    parser.add_argument("--workers", type=int, default=None, help="worker hasher (WT_BCRYPT_WORKERS)")
+    parser.add_argument("--max-queue", type=int, default=None, help="batas antrian (WT_BCRYPT_MAX_QUEUE)")
+    parser.add_argument("--process-pool", action="store_true", help="pakai process pool")
+    parser.add_argument("--levels", default="1,4,16,64", help="level concurrency, dipisah koma")
+    parser.add_argument("--requests", type=int, default=4, help="login per client per level")
+    args = parser.parse_args()
+
+    port = free_port()
+    workdir = tempfile.mkdtemp(prefix="wt-bench-")
+    env = dict(
+        os.environ,
+        WT_DATABASE_URL=f"sqlite+aiosqlite:///{workdir}/bench.db",
+        WT_BCRYPT_ROUNDS=str(args.rounds),
+        WT_BCRYPT_PROCESS_POOL="1" if args.process_pool else "0",
+    )
+    if args.workers is not None:
+        env["WT_BCRYPT_WORKERS"] = str(args.workers)
+    if args.max_queue is not None:
+        env["WT_BCRYPT_MAX_QUEUE"] = str(args.max_queue)
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_ready(port)
+        api(port, "POST", "/api/register?username=bench&password=bench")
+        # Pemanasan: executor dibuat lazily
+        api(port, "POST", "/api/login?username=bench&password=bench")
+
+        status = api(port, "GET", "/api/password-hasher")
+        print(f"bcrypt cost {status['rounds']}, {status['workers']} {status['executor']} "
+              f"worker(s), max queue {status['max_queue']}, {args.requests} login(s) per client")
+        for level in [int(value) for value in args.levels.split(",")]:
+            latencies, rejected, elapsed = run_level(port, level, args.requests)
+            summarize(level, latencies, rejected, elapsed, api(port, "GET", "/api/password-hasher"))
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Benchmark framing output terminal: mode json vs mode binary.
+
+Mensimulasikan sesi `cat` log berwarna (ANSI) yang dibaca per chunk lalu
+di-encode seperti di TerminalChannel.send_output. Yang diukur:
+CPU per MB (process_time) dan ukuran di wire per MB.
+
+Jalankan dari root repo:
+    python -m benchmarks.bench_protocol --mb 32 --chunk 1024
+"""
+import argparse
+import json
+import random
+import time
+
+from backend.terminal_protocol import encode_binary_output, encode_json_output
+
+LEVELS = [
+    ("\x1b[32mINFO\x1b[0m", 70),
+    ("\x1b[33mWARN\x1b[0m", 20),
+    ("\x1b[1;31mERROR\x1b[0m", 10),
+]
+
+
+def make_log(size: int, seed: int = 42) -> bytes:
+    """Buat log sintetis mirip output journalctl / build log"""
+    rng = random.Random(seed)
+    words = ["connection", "request", "worker", "cache", "timeout", "süccess",
+             "данные", "處理", "/var/log/app.log", "GET", "200", "0x7f3a"]
+    labels = [label for label, _ in LEVELS]
+    weights = [weight for _, weight in LEVELS]
+    lines = []
+    total = 0
+    n = 0
+    while total < size:
+        level = rng.choices(labels, weights)[0]
+        msg = " ".join(rng.choice(words) for _ in range(rng.randint(4, 14)))
+        line = f"\x1b[2m2026-01-15 10:{n // 60 % 60:02d}:{n % 60:02d}\x1b[0m {level} {msg}\r\n"
+        encoded = line.encode("utf-8")
+        lines.append(encoded)
+        total += len(encoded)
+        n += 1
+    return b"".join(lines)[:size]
+
+
+def run_mode(name, encode, payload: bytes, chunk: int, as_text: bool):
+    wire = 0
+    frames = 0
+    start_cpu = time.process_time()
+    start = time.perf_counter()
+    for offset in range(0, len(payload), chunk):
+        data = payload[offset:offset + chunk]
+        if as_text:
+            # Jalur lama: asyncssh text mode memberi str, lalu json.dumps
+            data = data.decode("utf-8", errors="replace")
+        frame = encode(data)
+        wire += len(frame.encode("utf-8")) if isinstance(frame, str) else len(frame)
+        frames += 1
+    cpu = time.process_time() - start_cpu
+    wall = time.perf_counter() - start
+    mb = len(payload) / (1024 * 1024)
+    return {
+        "mode": name,
+        "frames": frames,
+        "payload_bytes": len(payload),
+        "wire_bytes": wire,
+        "wire_overhead_pct": round((wire - len(payload)) * 100 / len(payload), 2),
+        "cpu_ms_per_mb": round(cpu * 1000 / mb, 3),
+        "wall_ms_per_mb": round(wall * 1000 / mb, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mb", type=int, default=16, help="ukuran output (MiB)")
+    parser.add_argument("--chunk", type=int, default=1024, help="ukuran chunk read")
+    parser.add_argument("--output", help="simpan hasil ke file JSON")
+    args = parser.parse_args()
+
+    payload = make_log(args.mb * 1024 * 1024)
+    results = [
+        run_mode("json", encode_json_output, payload, args.chunk, as_text=True),
+        run_mode("binary", encode_binary_output, payload, args.chunk, as_text=False),
+    ]
+
+    print(f"{'mode':<8}{'frames':>10}{'wire MB':>12}{'overhead %':>12}{'cpu ms/MB':>12}")
+    for r in results:
+        print(f"{r['mode']:<8}{r['frames']:>10}{r['wire_bytes'] / 1048576:>12.2f}"
+              f"{r['wire_overhead_pct']:>12.2f}{r['cpu_ms_per_mb']:>12.3f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"chunk": args.chunk, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
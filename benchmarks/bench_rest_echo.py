@@ -0,0 +1,199 @@
+"""Benchmark latency echo terminal saat REST API dibebani.
+
+Server (uvicorn backend.main:app) dijalankan di subprocess dengan database
+sementara. Probe membuka local terminal lewat websocket, menjalankan `cat`
+lalu mengukur waktu kirim satu keystroke sampai echo-nya kembali. Probe
+diukur dua kali: saat REST idle dan saat proses lain membanjiri endpoint
+quick-commands (baca + tulis ke SQLite).
+
+Kalau query DB memblokir event loop, p99 echo akan naik mengikuti beban
+REST. Dengan engine async, latency echo seharusnya tetap datar.
+
+Jalankan dari root repo (Linux, butuh local PTY):
+    python -m benchmarks.bench_rest_echo --samples 300 --workers 16
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import multiprocessing
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+import websockets
+
+
+def free_port() -> int:
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def api(port: int, method: str, path: str, body=None):
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{port}{path}",
+        method=method,
+        data=json.dumps(body).encode() if body is not None else None,
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.loads(response.read())
+
+
+def wait_ready(port: int, timeout: float = 30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            api(port, "GET", "/")
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("Server did not start")
+
+
+# ==================== REST LOAD (proses terpisah) ====================
+def _load_worker(port: int, user_id: int, stop: threading.Event, counter: list):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    headers = {"Content-Type": "application/json"}
+    n = 0
+    while not stop.is_set():
+        n += 1
+        if n % 10 == 0:
+            # Sesekali tulis, supaya writer SQLite ikut sibuk
+            body = json.dumps({"name": f"bench {n}", "command": "uptime", "category": "custom"})
+            conn.request("POST", f"/api/quick-commands?user_id={user_id}", body, headers)
+        else:
+            conn.request("GET", f"/api/quick-commands/{user_id}")
+        conn.getresponse().read()
+        counter[0] += 1
+
+
+def run_load(port: int, user_id: int, workers: int, duration: float, result):
+    # Load generator jangan merebut CPU server (penting di mesin 1-2 core)
+    os.nice(10)
+    stop = threading.Event()
+    counters = [[0] for _ in range(workers)]
+    threads = [
+        threading.Thread(target=_load_worker, args=(port, user_id, stop, counters[i]), daemon=True)
+        for i in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=5)
+    result.value = sum(counter[0] for counter in counters) / duration
+
+
+# ==================== ECHO PROBE ====================
+async def probe_echo(port: int, session_id: str, samples: int, interval: float):
+    url = f"ws://127.0.0.1:{port}/ws/terminal/{session_id}?protocol=binary"
+    async with websockets.connect(url, max_size=None) as ws:
+        async def read_until(marker: bytes, timeout: float = 10):
+            buffer = b""
+            while marker not in buffer:
+                message = await asyncio.wait_for(ws.recv(), timeout)
+                if isinstance(message, bytes):
+                    buffer += message[1:]
+            return buffer
+
+        await ws.send(json.dumps({"type": "input", "data": "cat\n"}))
+        await asyncio.sleep(1.5)
+        # Buang output awal (prompt, echo 'cat')
+        try:
+            while True:
+                await asyncio.wait_for(ws.recv(), 0.3)
+        except asyncio.TimeoutError:
+            pass
+
+        latencies = []
+        for i in range(samples):
+            key = chr(ord("a") + i % 26)
+            started = time.perf_counter()
+            await ws.send(json.dumps({"type": "input", "data": key}))
+            await read_until(key.encode())
+            latencies.append((time.perf_counter() - started) * 1000)
+            if i % 50 == 49:
+                # Kosongkan baris supaya buffer tty tidak penuh
+                await ws.send(json.dumps({"type": "input", "data": "\x15"}))
+                await asyncio.sleep(0.05)
+            await asyncio.sleep(interval)
+
+        await ws.send(json.dumps({"type": "input", "data": "\x04exit\n"}))
+    return latencies
+
+
+def summarize(name: str, latencies, rest_rps=None):
+    ordered = sorted(latencies)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+    line = (f"{name:<10} p50 {statistics.median(ordered):6.2f} ms  p95 {pct(0.95):6.2f} ms  "
+            f"p99 {pct(0.99):6.2f} ms  max {ordered[-1]:6.2f} ms")
+    if rest_rps is not None:
+        line += f"  | REST {rest_rps:7.0f} req/s"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=300, help="jumlah keystroke per fase")
+    parser.add_argument("--interval", type=float, default=0.01, help="jeda antar keystroke (detik)")
+    parser.add_argument("--workers", type=int, default=16, help="thread REST load")
+    args = parser.parse_args()
+
+    port = free_port()
+    workdir = tempfile.mkdtemp(prefix="wt-bench-")
+    env = dict(os.environ, WT_DATABASE_URL=f"sqlite+aiosqlite:///{workdir}/bench.db")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_ready(port)
+        api(port, "POST", "/api/register?username=bench&password=bench")
+        user_id = api(port, "POST", "/api/login?username=bench&password=bench")["user_id"]
+        api(port, "POST", "/api/quick-commands/seed-defaults")
+        for i in range(50):
+            api(port, "POST", f"/api/quick-commands?user_id={user_id}",
+                {"name": f"cmd {i}", "command": f"echo {i}", "category": "custom"})
+
+        session_id = api(port, "POST", "/api/connect-local")["session_id"]
+        idle = asyncio.run(probe_echo(port, session_id, args.samples, args.interval))
+
+        session_id = api(port, "POST", "/api/connect-local")["session_id"]
+        rest_rps = multiprocessing.Value("d", 0.0)
+        duration = args.samples * (args.interval + 0.002) + 3
+        loader = multiprocessing.Process(
+            target=run_load, args=(port, user_id, args.workers, duration, rest_rps)
+        )
+        loader.start()
+        time.sleep(1)
+        loaded = asyncio.run(probe_echo(port, session_id, args.samples, args.interval))
+        loader.join()
+
+        print(f"echo latency, {args.samples} keystrokes per phase")
+        summarize("idle", idle)
+        summarize("REST load", loaded, rest_rps.value)
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+if __name__ == "__main__":
+    main()
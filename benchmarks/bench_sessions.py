@@ -0,0 +1,230 @@
+"""Load test session konkuren: memori per session dan kurva scaling.
+
+Membuka N session sekaligus, campuran SSH (ke stand-in asyncssh dari
+benchmarks/stack.py) dan local shell, masing-masing dengan websocket aktif
+dan output dengan rate tertentu. N dinaikkan bertahap (``--levels``). Di
+setiap level, setelah beban stabil (``--settle``), dicatat dari proses
+backend:
+
+- RSS dan jumlah file descriptor
+- lag event loop (mean/max selama settle)
+- jumlah entry struktur ``SSHManager``
+- memori tracemalloc per struktur (terminals, connections, local_sessions,
+  websockets, sessions, ...), lihat ``MEMORY_GROUPS`` di stack.py
+
+Per session = (nilai di level N - baseline tanpa session) / N. Hasilnya
+kurva untuk capacity planning: sampai N berapa RSS, fd dan lag masih wajar.
+
+tracemalloc memperlambat backend, jadi lag dan throughput dengan
+``--no-tracemalloc`` lebih mendekati produksi.
+
+Jalankan dari root repo (local shell butuh Linux/macOS):
+    python -m benchmarks.bench_sessions --levels 10,50,100 --local-ratio 0.2 --rate 2048
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+
+import websockets
+
+from benchmarks.bench_terminal import FRAME_DATA, git_commit
+from benchmarks.stack import DONE_MARKER, BenchStack
+
+MB = 1024 * 1024
+
+
+class LoadSession:
+    """Satu session + websocket yang membaca output terus-menerus"""
+
+    def __init__(self, kind: str, session_id: str):
+        self.kind = kind
+        self.session_id = session_id
+        self.ws = None
+        self.bytes = 0
+        self.task = None
+
+    async def start(self, stack: BenchStack, rate: int):
+        self.ws = await websockets.connect(stack.ws_url(self.session_id), max_size=None)
+        # Prompt shell lokal tidak bisa ditebak, cukup tunggu output pertama
+        await self._until(b"$ " if self.kind == "ssh" else b"")
+        if rate:
+            await self.ws.send(json.dumps({"type": "input", "data": self._stream_command(rate)}))
+            if self.kind == "ssh":
+                await self._until(DONE_MARKER)
+        self.task = asyncio.ensure_future(self._read())
+
+    def _stream_command(self, rate: int) -> str:
+        if self.kind == "ssh":
+            return f"stream {rate}\r"
+        # Shell asli: satu burst per detik
+        return f"while :; do head -c {rate} /dev/zero | tr '\\0' x; echo; sleep 1; done\r"
+
+    async def _until(self, marker: bytes, timeout: float = 30):
+        tail = b""
+        while True:
+            message = await asyncio.wait_for(self.ws.recv(), timeout)
+            if isinstance(message, bytes) and message[0] == FRAME_DATA:
+                window = tail + message[1:]
+                if marker in window:
+                    return
+                tail = window[-len(marker):]
+
+    async def _read(self):
+        try:
+            async for message in self.ws:
+                if isinstance(message, bytes) and message[0] == FRAME_DATA:
+                    self.bytes += len(message) - 1
+        except websockets.ConnectionClosed:
+            pass
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+        if self.ws is not None:
+            await self.ws.close()
+
+
+async def open_sessions(stack: BenchStack, count: int, start_index: int, args):
+    loop = asyncio.get_running_loop()
+
+    async def open_one(index: int):
+        # Rasio local dibagi rata di sepanjang urutan session
+        local = int((index + 1) * args.local_ratio) > int(index * args.local_ratio)
+        kind = "local" if local else "ssh"
+        connect = stack.connect_local if local else stack.connect
+        session_id = await loop.run_in_executor(None, connect)
+        session = LoadSession(kind, session_id)
+        await session.start(stack, args.rate)
+        return session
+
+    sessions = []
+    for batch_start in range(start_index, start_index + count, args.batch):
+        batch = range(batch_start, min(start_index + count, batch_start + args.batch))
+        sessions.extend(await asyncio.gather(*(open_one(i) for i in batch)))
+    return sessions
+
+
+def per_session(value, base, n: int):
+    if value is None or base is None or not n:
+        return None
+    return round((value - base) / n, 1)
+
+
+async def measure(stack: BenchStack, sessions, settle: float) -> dict:
+    loop = asyncio.get_running_loop()
+    # Buang lag selama fase buka session
+    await loop.run_in_executor(None, stack.memory, False)
+    received = sum(session.bytes for session in sessions)
+    await asyncio.sleep(settle)
+    received = sum(session.bytes for session in sessions) - received
+    sample = await loop.run_in_executor(None, stack.memory)
+    sample["received_mb_per_s"] = round(received / MB / settle, 3)
+    return sample
+
+
+async def run(stack: BenchStack, args) -> dict:
+    baseline = await measure(stack, [], args.settle)
+    previous = dict(baseline, sessions=0)
+    curve = []
+    sessions = []
+    try:
+        for level in args.levels:
+            if level > len(sessions):
+                opened_at = time.perf_counter()
+                sessions += await open_sessions(stack, level - len(sessions), len(sessions), args)
+                open_seconds = time.perf_counter() - opened_at
+            else:
+                open_seconds = 0.0
+            sample = await measure(stack, sessions, args.settle)
+
+            point = {
+                "sessions": len(sessions),
+                "ssh": sum(1 for s in sessions if s.kind == "ssh"),
+                "local": sum(1 for s in sessions if s.kind == "local"),
+                "open_seconds": round(open_seconds, 2),
+                "rss_mb": round(sample["rss_bytes"] / MB, 2),
+                "rss_per_session_kb": per_session(
+                    sample["rss_bytes"] / 1024, baseline["rss_bytes"] / 1024, len(sessions)
+                ),
+                # Kemiringan kurva sejak level sebelumnya, lebih stabil dari rata-rata
+                "rss_marginal_kb": per_session(
+                    sample["rss_bytes"] / 1024, previous["rss_bytes"] / 1024,
+                    len(sessions) - previous["sessions"],
+                ),
+                "fds": sample["fds"],
+                "fds_per_session": per_session(sample["fds"], baseline["fds"], len(sessions)),
+                "loop_lag_mean_ms": sample["loop_lag_mean_ms"],
+                "loop_lag_max_ms": sample["loop_lag_max_ms"],
+                "received_mb_per_s": sample["received_mb_per_s"],
+                "structures": sample["structures"],
+            }
+            if sample["tracemalloc"] is not None:
+                point["tracemalloc_per_session_kb"] = {
+                    name: per_session(size / 1024, baseline["tracemalloc"][name] / 1024, len(sessions))
+                    for name, size in sample["tracemalloc"].items()
+                }
+            curve.append(point)
+            previous = dict(sample, sessions=len(sessions))
+            print(
+                f"N={point['sessions']:<5} rss={point['rss_mb']:>8.1f}MB "
+                f"({point['rss_per_session_kb']}KB/session, marginal {point['rss_marginal_kb']}KB)  fds={point['fds']:<5} "
+                f"lag mean/max={point['loop_lag_mean_ms']}/{point['loop_lag_max_ms']}ms  "
+                f"recv={point['received_mb_per_s']}MB/s"
+            )
+            if "tracemalloc_per_session_kb" in point:
+                print("        KB/session " + "  ".join(
+                    f"{name}={kb}" for name, kb in point["tracemalloc_per_session_kb"].items()
+                ))
+    finally:
+        await asyncio.gather(*(session.close() for session in sessions), return_exceptions=True)
+
+    return {"baseline": baseline, "curve": curve}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--levels", default="10,25,50,100",
+                        help="jumlah session per langkah, dipisah koma")
+    parser.add_argument("--local-ratio", type=float, default=0.2,
+                        help="porsi session local shell (0 = semua SSH)")
+    parser.add_argument("--rate", type=int, default=1024,
+                        help="output per session (byte/detik, 0 = idle)")
+    parser.add_argument("--settle", type=float, default=5.0,
+                        help="detik menunggu di setiap level sebelum diukur")
+    parser.add_argument("--batch", type=int, default=10,
+                        help="session yang dibuka bersamaan")
+    parser.add_argument("--no-tracemalloc", action="store_true",
+                        help="matikan tracemalloc di backend (RSS/lag lebih realistis)")
+    parser.add_argument("--output", help="file JSON hasil (default benchmarks/results/sessions-<commit>.json)")
+    args = parser.parse_args()
+    args.levels = sorted(int(level) for level in args.levels.split(",") if level.strip())
+
+    commit = git_commit()
+    with BenchStack(trace_memory=not args.no_tracemalloc) as stack:
+        result = asyncio.run(run(stack, args))
+
+    report = {
+        "meta": {
+            "benchmark": "sessions",
+            "commit": commit,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k != "output"},
+        },
+        **result,
+    }
+    output = args.output or os.path.join("benchmarks", "results", f"sessions-{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nresults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
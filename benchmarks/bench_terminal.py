@@ -0,0 +1,368 @@
+"""Suite benchmark throughput terminal end-to-end (SSH stand-in -> backend -> websocket).
+
+Stack di benchmarks/stack.py: server asyncssh stand-in + uvicorn
+backend.main:app di proses anak. Setiap workload membuka session lewat
+/api/connect lalu /ws/terminal/{session_id}?protocol=binary:
+
+- ``bulk_yes``   : ``yes <N>``, output seragam sebesar mungkin
+- ``bulk_cat``   : ``cat <N>``, log ANSI sintetis (mirip journalctl)
+- ``echo``       : satu keystroke, tunggu echo, ulangi (p50/p99)
+- ``paste``      : paste besar sebagai binary input frame, tunggu echo-nya
+- ``resize``     : badai pesan resize, tunggu semua ack + ukuran akhir
+
+Yang dilaporkan: MB/s, pesan/s, latency echo, dan CPU per MB. CPU diambil
+dari thread event loop backend (``loop_cpu``) dan dari seluruh proses
+backend termasuk thread pool (``process_cpu``). Stand-in SSH jalan di proses
+sendiri, jadi tidak ikut terhitung.
+
+``--compress`` membuka websocket dengan ``?compress=deflate``: dilaporkan juga
+byte di wire, rasio kompresi dan CPU kompresi server per MB output.
+
+Hasil ditulis ke JSON (default benchmarks/results/terminal-<commit>.json)
+supaya bisa dibandingkan antar commit dengan ``--compare``.
+
+Jalankan dari root repo:
+    python -m benchmarks.bench_terminal --mb 32
+    python -m benchmarks.bench_terminal --compare benchmarks/results/terminal-abc1234.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import zlib
+
+import websockets
+
+from benchmarks.stack import DONE_MARKER, BenchStack
+
+FRAME_DATA = 0x01
+FRAME_INPUT = 0x02
+FRAME_DATA_DEFLATE = 0x03
+SYNC_TAIL = b"\x00\x00\xff\xff"
+MB = 1024 * 1024
+
+WORKLOADS = ("bulk_yes", "bulk_cat", "echo", "paste", "resize")
+
+
+def percentile(values, p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+class Reader:
+    """Hitung frame/byte output dan tunggu marker lintas batas frame"""
+
+    def __init__(self, ws, session_id: str = None):
+        self.ws = ws
+        self.session_id = session_id
+        self.frames = 0
+        self.bytes = 0
+        # Byte frame output di wire (termasuk header), beda dari bytes kalau dikompresi
+        self.wire = 0
+        self.controls = []
+        self._tail = b""
+        self._inflater = zlib.decompressobj(-zlib.MAX_WBITS)
+
+    async def next_output(self, timeout: float = 30) -> bytes:
+        while True:
+            message = await asyncio.wait_for(self.ws.recv(), timeout)
+            if isinstance(message, bytes):
+                if message[0] == FRAME_DATA:
+                    data = message[1:]
+                elif message[0] == FRAME_DATA_DEFLATE:
+                    data = self._inflater.decompress(message[5:] + SYNC_TAIL)
+                else:
+                    continue
+                self.frames += 1
+                self.bytes += len(data)
+                self.wire += len(message)
+                return data
+            else:
+                self.controls.append(json.loads(message))
+
+    async def until(self, marker: bytes, timeout: float = 120) -> bytes:
+        while True:
+            data = await self.next_output(timeout)
+            window = self._tail + data
+            if marker in window:
+                self._tail = b""
+                return window
+            self._tail = window[-len(marker):]
+
+    async def drain(self, quiet: float = 0.3):
+        try:
+            while True:
+                await self.next_output(quiet)
+        except asyncio.TimeoutError:
+            pass
+
+
+COMPRESS = {"enabled": False}
+
+
+async def _open(stack: BenchStack):
+    session_id = stack.connect()
+    params = {"compress": "deflate"} if COMPRESS["enabled"] else {}
+    ws = await websockets.connect(stack.ws_url(session_id, **params), max_size=None)
+    reader = Reader(ws, session_id)
+    await reader.until(b"$ ")
+    await reader.drain()
+    return ws, reader
+
+
+def _cpu_fields(before: dict, after: dict, mb: float) -> dict:
+    loop_cpu = after["loop_cpu"] - before["loop_cpu"]
+    process_cpu = after["process_cpu"] - before["process_cpu"]
+    return {
+        "loop_cpu_ms_per_mb": round(loop_cpu * 1000 / mb, 3),
+        "process_cpu_ms_per_mb": round(process_cpu * 1000 / mb, 3),
+    }
+
+
+def _compression_fields(stack: BenchStack, reader: Reader, received: int, wire: int) -> dict:
+    """Rasio dari sisi client + CPU kompresi dari counter session di server"""
+    raw = reader.bytes - received
+    fields = {
+        "wire_mb": round((reader.wire - wire) / MB, 3),
+        "compression_ratio": round(raw / max(1, reader.wire - wire), 2),
+    }
+    if COMPRESS["enabled"]:
+        stats = stack.api("GET", f"/api/session/{reader.session_id}").get("compression") or {}
+        fields["compress_cpu_ms_per_mb"] = round(
+            stats.get("cpu_seconds", 0) * 1000 / max(1e-9, stats.get("input_bytes", 0) / MB), 3
+        )
+        fields["compressed_frames"] = stats.get("frames", 0)
+        fields["raw_frames"] = stats.get("raw_frames", 0)
+    return fields
+
+
+# ==================== WORKLOADS ====================
+async def run_bulk(stack: BenchStack, command: str, size: int) -> dict:
+    ws, reader = await _open(stack)
+    try:
+        if command == "cat":
+            await ws.send(json.dumps({"type": "input", "data": f"prepare {size}\r"}))
+            await reader.until(DONE_MARKER)
+            await reader.drain()
+        frames, received, wire = reader.frames, reader.bytes, reader.wire
+        before = stack.cpu()
+        started = time.perf_counter()
+        await ws.send(json.dumps({"type": "input", "data": f"{command} {size}\r"}))
+        await reader.until(DONE_MARKER)
+        elapsed = time.perf_counter() - started
+        after = stack.cpu()
+        compression = _compression_fields(stack, reader, received, wire)
+    finally:
+        await ws.close()
+
+    frames = reader.frames - frames
+    mb = (reader.bytes - received) / MB
+    result = {
+        "mb": round(mb, 2),
+        "seconds": round(elapsed, 3),
+        "mb_per_s": round(mb / elapsed, 2),
+        "frames": frames,
+        "frames_per_s": round(frames / elapsed, 1),
+        "bytes_per_frame": round((reader.bytes - received) / max(1, frames), 1),
+    }
+    result.update(_cpu_fields(before, after, mb))
+    result.update(compression)
+    return result
+
+
+async def run_echo(stack: BenchStack, samples: int, interval: float) -> dict:
+    ws, reader = await _open(stack)
+    latencies = []
+    try:
+        started = time.perf_counter()
+        for i in range(samples):
+            key = chr(ord("a") + i % 26)
+            sent = time.perf_counter()
+            await ws.send(json.dumps({"type": "input", "data": key}))
+            while key.encode() not in await reader.next_output():
+                pass
+            latencies.append((time.perf_counter() - sent) * 1000)
+            if interval:
+                await asyncio.sleep(interval)
+        elapsed = time.perf_counter() - started
+    finally:
+        await ws.close()
+
+    return {
+        "samples": samples,
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "max_ms": round(max(latencies), 3),
+        # Round trip input + echo per detik
+        "messages_per_s": round(samples / elapsed, 1),
+    }
+
+
+async def run_paste(stack: BenchStack, size: int, chunk: int) -> dict:
+    ws, reader = await _open(stack)
+    marker = b"#PASTE-END#"
+    # Tanpa CR supaya stand-in tidak menganggapnya command
+    line = b"".join(bytes([ord("a") + i % 26]) for i in range(64))
+    payload = (line * (size // len(line) + 1))[:size - len(marker)] + marker
+    try:
+        received = reader.bytes
+        before = stack.cpu()
+        started = time.perf_counter()
+
+        async def send():
+            for start in range(0, len(payload), chunk):
+                await ws.send(bytes([FRAME_INPUT]) + payload[start:start + chunk])
+
+        sender = asyncio.create_task(send())
+        await reader.until(marker)
+        await sender
+        elapsed = time.perf_counter() - started
+        after = stack.cpu()
+    finally:
+        await ws.close()
+
+    mb = size / MB
+    result = {
+        "mb": round(mb, 2),
+        "seconds": round(elapsed, 3),
+        "mb_per_s": round(mb / elapsed, 2),
+        "input_messages": -(-size // chunk),
+        "messages_per_s": round(-(-size // chunk) / elapsed, 1),
+        "echoed_mb": round((reader.bytes - received) / MB, 2),
+    }
+    result.update(_cpu_fields(before, after, mb * 2))
+    return result
+
+
+async def run_resize(stack: BenchStack, count: int) -> dict:
+    ws, reader = await _open(stack)
+    try:
+        sizes = [(80 + i % 120, 24 + i % 40) for i in range(count)]
+        before = stack.cpu()
+        started = time.perf_counter()
+        for cols, rows in sizes:
+            await ws.send(json.dumps({"type": "resize", "cols": cols, "rows": rows}))
+
+        acks = 0
+        while acks < count:
+            message = await asyncio.wait_for(ws.recv(), 30)
+            if isinstance(message, str) and json.loads(message).get("type") == "resize":
+                acks += 1
+        acked = time.perf_counter() - started
+
+        await ws.send(json.dumps({"type": "input", "data": "size\r"}))
+        window = await reader.until(DONE_MARKER)
+        settled = time.perf_counter() - started
+        after = stack.cpu()
+    finally:
+        await ws.close()
+
+    final = f"{sizes[-1][0]}x{sizes[-1][1]}".encode()
+    return {
+        "messages": count,
+        "seconds": round(acked, 3),
+        "messages_per_s": round(count / acked, 1),
+        "settled_seconds": round(settled, 3),
+        "final_size_ok": final in window,
+        "loop_cpu_us_per_message": round(
+            (after["loop_cpu"] - before["loop_cpu"]) * 1e6 / count, 1
+        ),
+    }
+
+
+# ==================== HASIL ====================
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(old: dict, new: dict):
+    print(f"\ncompared with {old['meta'].get('commit')} ({old['meta'].get('timestamp')})")
+    for workload, metrics in new["results"].items():
+        previous = old["results"].get(workload)
+        if not previous:
+            continue
+        for name, value in metrics.items():
+            before = previous.get(name)
+            if not isinstance(value, (int, float)) or isinstance(value, bool) \
+                    or not isinstance(before, (int, float)) or not before:
+                continue
+            change = (value - before) * 100 / before
+            print(f"  {workload:<10} {name:<24} {before:>12} -> {value:<12} {change:+7.1f}%")
+
+
+async def run_all(stack: BenchStack, args) -> dict:
+    results = {}
+    if "bulk_yes" in args.workloads:
+        results["bulk_yes"] = await run_bulk(stack, "yes", args.mb * MB)
+    if "bulk_cat" in args.workloads:
+        results["bulk_cat"] = await run_bulk(stack, "cat", args.mb * MB)
+    if "echo" in args.workloads:
+        results["echo"] = await run_echo(stack, args.samples, args.interval)
+    if "paste" in args.workloads:
+        results["paste"] = await run_paste(stack, args.paste_mb * MB, args.paste_chunk)
+    if "resize" in args.workloads:
+        results["resize"] = await run_resize(stack, args.resizes)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mb", type=int, default=32, help="ukuran output bulk (MiB)")
+    parser.add_argument("--samples", type=int, default=300, help="jumlah keystroke echo")
+    parser.add_argument("--interval", type=float, default=0.0, help="jeda antar keystroke (detik)")
+    parser.add_argument("--paste-mb", type=int, default=4, help="ukuran paste (MiB)")
+    parser.add_argument("--paste-chunk", type=int, default=16 * 1024, help="ukuran frame input paste")
+    parser.add_argument("--resizes", type=int, default=500, help="jumlah pesan resize")
+    parser.add_argument("--compress", action="store_true",
+                        help="minta kompresi deflate di websocket (?compress=deflate)")
+    parser.add_argument("--workloads", default=",".join(WORKLOADS),
+                        help=f"workload yang dijalankan, dipisah koma ({','.join(WORKLOADS)})")
+    parser.add_argument("--output", help="file JSON hasil (default benchmarks/results/terminal-<commit>.json)")
+    parser.add_argument("--compare", help="file JSON hasil sebelumnya untuk dibandingkan")
+    args = parser.parse_args()
+    args.workloads = [w.strip() for w in args.workloads.split(",") if w.strip()]
+    COMPRESS["enabled"] = args.compress
+
+    commit = git_commit()
+    with BenchStack() as stack:
+        results = asyncio.run(run_all(stack, args))
+
+    report = {
+        "meta": {
+            "benchmark": "terminal",
+            "commit": commit,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        },
+        "results": results,
+    }
+
+    for workload, metrics in results.items():
+        print(f"{workload:<10} " + "  ".join(f"{k}={v}" for k, v in metrics.items()))
+
+    output = args.output or os.path.join("benchmarks", "results", f"terminal-{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nresults written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
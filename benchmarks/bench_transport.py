@@ -0,0 +1,220 @@
+"""Benchmark profil transport SSH: bandingkan preset terhadap satu host.
+
+Untuk setiap profil di ``backend/transport_profile.py`` (atau ``--profiles``):
+saved host diset ke profil itu lewat ``PUT /api/hosts/{id}/transport``, lalu
+session dibuka dengan ``/api/connect-saved/{id}`` (profil berbeda = koneksi
+pool berbeda, jadi setiap profil handshake sendiri) dan diukur:
+
+- waktu connect (DNS, TCP, kex, auth)
+- throughput output bulk lewat websocket (MB/s)
+- CPU backend per MB (thread event loop dan seluruh proses): dekripsi, MAC
+  dan dekompresi SSH jalan di event loop
+- latency echo keystroke (p50/p99)
+- cipher, MAC dan kompresi hasil negosiasi
+
+Default target adalah SSH stand-in dari benchmarks/stack.py (loopback, jadi
+yang terukur terutama biaya CPU per cipher). Kompresi SSH hanya menang kalau
+link-nya yang jadi bottleneck: ukur terhadap host sungguhan dengan
+``--host``/``--user``/``--password``. Output host sungguhan dibuat oleh
+``--remote-command`` (``{bytes}`` diganti ukuran output).
+
+Jalankan dari root repo:
+    python -m benchmarks.bench_transport --mb 16
+    python -m benchmarks.bench_transport --host 10.0.0.5 --user deploy --password secret
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import urllib.parse
+
+import websockets
+
+from benchmarks.bench_terminal import Reader, git_commit, percentile
+from benchmarks.stack import DONE_MARKER, SSH_PASSWORD, SSH_USER, BenchStack
+
+MB = 1024 * 1024
+PRESETS = ("default", "throughput", "chacha", "slow-link")
+# Marker dicetak printf supaya echo command-nya sendiri tidak cocok dengan marker
+REMOTE_DONE = "; printf '__%s__\\n' DONE"
+
+
+class Target:
+    """Saved host milik user benchmark yang profilnya diganti-ganti"""
+
+    def __init__(self, stack: BenchStack, args):
+        self.stack = stack
+        self.remote = bool(args.host)
+        self.host = args.host or "127.0.0.1"
+        self.port = args.port if args.host else stack.ssh_port
+        self.username = args.user if args.host else SSH_USER
+        self.password = args.password if args.host else SSH_PASSWORD
+        self.remote_command = args.remote_command
+        self.user_id = None
+        self.host_id = None
+
+    def setup(self):
+        credentials = urllib.parse.urlencode({"username": "transport-bench", "password": "bench"})
+        self.stack.api("POST", f"/api/register?{credentials}")
+        self.user_id = self.stack.api("POST", f"/api/login?{credentials}")["user_id"]
+        query = urllib.parse.urlencode({
+            "user_id": self.user_id, "host": self.host, "port": self.port,
+            "username": self.username, "password": self.password,
+        })
+        self.stack.api("POST", f"/api/hosts?{query}")
+        self.host_id = self.stack.api("GET", f"/api/hosts/{self.user_id}")[-1]["id"]
+
+    def use_profile(self, profile: str) -> dict:
+        return self.stack.api(
+            "PUT", f"/api/hosts/{self.host_id}/transport?user_id={self.user_id}",
+            {"profile": profile},
+        )["transport"]
+
+    def connect(self) -> str:
+        return self.stack.api("POST", f"/api/connect-saved/{self.host_id}")["session_id"]
+
+    def bulk_commands(self, size: int):
+        """(command persiapan atau None, command yang diukur)"""
+        if self.remote:
+            return None, self.remote_command.format(bytes=size) + REMOTE_DONE + "\r"
+        return f"prepare {size}\r", f"cat {size}\r"
+
+
+async def _wait_prompt(target: Target, reader: Reader):
+    # Prompt host sungguhan tidak bisa ditebak, cukup tunggu output pertama
+    if target.remote:
+        await reader.next_output()
+    else:
+        await reader.until(b"$ ")
+    await reader.drain()
+
+
+async def run_profile(target: Target, profile: str, args) -> dict:
+    stack = target.stack
+    transport = target.use_profile(profile)
+
+    started = time.perf_counter()
+    session_id = target.connect()
+    connect_ms = (time.perf_counter() - started) * 1000
+
+    ws = await websockets.connect(stack.ws_url(session_id), max_size=None)
+    reader = Reader(ws, session_id)
+    try:
+        await _wait_prompt(target, reader)
+        negotiated = stack.api("GET", f"/api/session/{session_id}").get("transport") or {}
+
+        prepare, command = target.bulk_commands(args.mb * MB)
+        if prepare:
+            await ws.send(json.dumps({"type": "input", "data": prepare}))
+            await reader.until(DONE_MARKER)
+            await reader.drain()
+
+        runs = []
+        for _ in range(args.repeat):
+            received = reader.bytes
+            before = stack.cpu()
+            started = time.perf_counter()
+            await ws.send(json.dumps({"type": "input", "data": command}))
+            await reader.until(DONE_MARKER)
+            elapsed = time.perf_counter() - started
+            after = stack.cpu()
+            await reader.drain()
+            mb = (reader.bytes - received) / MB
+            runs.append((mb, elapsed, after["loop_cpu"] - before["loop_cpu"],
+                         after["process_cpu"] - before["process_cpu"]))
+
+        latencies = []
+        for i in range(args.samples):
+            key = chr(ord("a") + i % 26)
+            sent = time.perf_counter()
+            await ws.send(json.dumps({"type": "input", "data": key}))
+            while key.encode() not in await reader.next_output():
+                pass
+            latencies.append((time.perf_counter() - sent) * 1000)
+    finally:
+        await ws.close()
+
+    mb = sum(run[0] for run in runs)
+    seconds = sum(run[1] for run in runs)
+    return {
+        "cipher": negotiated.get("cipher"),
+        "mac": negotiated.get("mac"),
+        "compression": negotiated.get("compression"),
+        "window": transport["window"],
+        "max_pktsize": transport["max_pktsize"],
+        "connect_ms": round(connect_ms, 1),
+        "mb": round(mb, 2),
+        "mb_per_s": round(mb / seconds, 2),
+        "best_mb_per_s": round(max(run[0] / run[1] for run in runs), 2),
+        "loop_cpu_ms_per_mb": round(sum(run[2] for run in runs) * 1000 / mb, 3),
+        "process_cpu_ms_per_mb": round(sum(run[3] for run in runs) * 1000 / mb, 3),
+        "echo_p50_ms": round(statistics.median(latencies), 3) if latencies else None,
+        "echo_p99_ms": round(percentile(latencies, 0.99), 3) if latencies else None,
+    }
+
+
+async def run_all(target: Target, args) -> dict:
+    results = {}
+    for profile in args.profiles:
+        results[profile] = await run_profile(target, profile, args)
+        print(f"{profile:<12} " + "  ".join(f"{k}={v}" for k, v in results[profile].items()))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", default=",".join(PRESETS),
+                        help="profil yang dibandingkan, dipisah koma")
+    parser.add_argument("--mb", type=int, default=16, help="ukuran output bulk per run (MiB)")
+    parser.add_argument("--repeat", type=int, default=3, help="run bulk per profil")
+    parser.add_argument("--samples", type=int, default=50, help="jumlah keystroke echo per profil")
+    parser.add_argument("--host", help="host SSH sungguhan (default: stand-in lokal)")
+    parser.add_argument("--port", type=int, default=22)
+    parser.add_argument("--user", help="username host sungguhan")
+    parser.add_argument("--password", help="password host sungguhan")
+    parser.add_argument("--remote-command",
+                        default="yes 'GET /api/v1/items?page=1 200 0.004s' | head -c {bytes}",
+                        help="command output bulk di host sungguhan, {bytes} = ukuran")
+    parser.add_argument("--output", help="file JSON hasil (default benchmarks/results/transport-<commit>.json)")
+    args = parser.parse_args()
+    args.profiles = [p.strip() for p in args.profiles.split(",") if p.strip()]
+    if args.host and not (args.user and args.password):
+        parser.error("--host needs --user and --password")
+
+    commit = git_commit()
+    with BenchStack() as stack:
+        target = Target(stack, args)
+        target.setup()
+        results = asyncio.run(run_all(target, args))
+
+    fastest = max(results, key=lambda name: results[name]["mb_per_s"])
+    print(f"\nfastest: {fastest} ({results[fastest]['mb_per_s']} MB/s, "
+          f"{results[fastest]['cipher']}, compression {results[fastest]['compression']})")
+
+    report = {
+        "meta": {
+            "benchmark": "transport",
+            "commit": commit,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "target": "remote" if args.host else "stand-in",
+            "args": {k: v for k, v in vars(args).items() if k not in ("output", "password")},
+        },
+        "results": results,
+        "fastest": fastest,
+    }
+    output = args.output or os.path.join("benchmarks", "results", f"transport-{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+"""Stack lokal untuk benchmark: SSH stand-in + backend di proses anak.
+
+Dua proses anak (spawn):
+
+- server asyncssh stand-in dengan shell mini yang cukup untuk workload
+  benchmark. Proses sendiri supaya CPU, RSS dan alokasinya tidak tercampur
+  dengan angka backend.
+- ``backend.main:app`` di uvicorn, ditambah route khusus benchmark:
+
+  - ``/__bench/cpu``    : CPU thread event loop backend dan seluruh proses
+  - ``/__bench/memory`` : RSS, jumlah fd, lag event loop sejak panggilan
+    sebelumnya, jumlah entry struktur ``SSHManager`` dan (kalau tracemalloc
+    aktif) memori per struktur
+
+Shell stand-in meniru PTY dengan echo: setiap byte input dikirim balik
+(CR -> CRLF), lalu baris yang diakhiri CR dijalankan sebagai command:
+
+- ``yes <bytes>``    : output "y" sebanyak <bytes>
+- ``cat <bytes>``    : output log ANSI sintetis sebanyak <bytes>
+- ``stream <rate>``  : output log terus-menerus <rate> byte/detik sampai
+  ada input berikutnya
+- ``size``           : cetak ukuran terminal terakhir, misal ``120x40``
+- ``prepare <bytes>``: siapkan payload ``cat`` tanpa output (di luar waktu ukur)
+
+Setiap command diakhiri marker ``__DONE__``. Command yang sama juga bisa
+dijalankan lewat exec channel (tanpa PTY), misal dari ``/api/exec/stream``.
+"""
+import asyncio
+import gc
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import asyncssh
+
+from benchmarks.bench_protocol import make_log
+from benchmarks.bench_rest_echo import api, free_port, wait_ready
+
+SSH_USER = "bench"
+SSH_PASSWORD = "bench"
+DONE_MARKER = b"__DONE__"
+WRITE_BLOCK = 64 * 1024
+STREAM_TICK = 0.1
+
+
+# ==================== SSH STAND-IN ====================
+class _StandInServer(asyncssh.SSHServer):
+    def begin_auth(self, username: str) -> bool:
+        return True
+
+    def password_auth_supported(self) -> bool:
+        return True
+
+    def validate_password(self, username: str, password: str) -> bool:
+        return password == SSH_PASSWORD
+
+
+_LOG_CACHE = {}
+
+
+def _log_payload(size: int) -> bytes:
+    payload = _LOG_CACHE.get(size)
+    if payload is None:
+        payload = _LOG_CACHE[size] = make_log(size)
+    return payload
+
+
+async def _write_blocks(process, payload: bytes):
+    view = memoryview(payload)
+    for start in range(0, len(payload), WRITE_BLOCK):
+        process.stdout.write(view[start:start + WRITE_BLOCK])
+        await process.stdout.drain()
+
+
+async def _stream(process, rate: int):
+    payload = _log_payload(1024 * 1024)
+    per_tick = max(1, int(rate * STREAM_TICK))
+    offset = 0
+    while True:
+        chunk = payload[offset:offset + per_tick]
+        offset = (offset + per_tick) % (len(payload) - per_tick)
+        process.stdout.write(chunk)
+        await process.stdout.drain()
+        await asyncio.sleep(STREAM_TICK)
+
+
+async def _run_command(process, command: bytes, size):
+    name, _, arg = command.decode(errors="replace").partition(" ")
+    if name == "yes":
+        count = int(arg or 1024 * 1024)
+        await _write_blocks(process, (b"y\r\n" * (count // 3 + 1))[:count])
+    elif name == "cat":
+        await _write_blocks(process, _log_payload(int(arg or 1024 * 1024)))
+    elif name == "prepare":
+        _log_payload(int(arg or 1024 * 1024))
+    elif name == "size":
+        process.stdout.write(f"{size[0]}x{size[1]}".encode())
+    elif name:
+        process.stdout.write(f"{name}: command not found".encode())
+    process.stdout.write(b"\r\n" + DONE_MARKER + b"\r\n$ ")
+
+
+async def _standin_shell(process):
+    size = process.term_size[:2] if process.term_size else (80, 24)
+    if process.command:
+        # Exec channel (/api/exec/stream): satu command lalu exit
+        try:
+            await _run_command(process, process.command.encode(), size)
+        except BrokenPipeError:
+            # Client menutup channel duluan (output dipotong); seperti sshd,
+            # cukup channel ini yang berhenti, koneksinya tetap hidup
+            return
+        process.exit(0)
+        return
+    process.stdout.write(b"bench stand-in\r\n$ ")
+    line = b""
+    streamer = None
+    try:
+        while True:
+            try:
+                data = await process.stdin.read(WRITE_BLOCK)
+            except asyncssh.TerminalSizeChanged as e:
+                size = (e.width, e.height)
+                continue
+            except asyncssh.BreakReceived:
+                continue
+            if not data:
+                break
+
+            # Input apa pun menghentikan stream yang sedang jalan
+            if streamer is not None:
+                streamer.cancel()
+                streamer = None
+
+            # Echo seperti line discipline PTY
+            process.stdout.write(data.replace(b"\r", b"\r\n"))
+            line += data
+            while b"\r" in line:
+                command, _, line = line.partition(b"\r")
+                name, _, arg = command.strip().partition(b" ")
+                if name == b"stream":
+                    process.stdout.write(b"\r\n" + DONE_MARKER + b"\r\n")
+                    streamer = asyncio.ensure_future(_stream(process, int(arg or 1024)))
+                else:
+                    await _run_command(process, command.strip(), size)
+            # Paste besar tanpa CR: cukup simpan ekor untuk command berikutnya
+            line = line[-256:]
+            await process.stdout.drain()
+    finally:
+        if streamer is not None:
+            streamer.cancel()
+    process.exit(0)
+
+
+async def start_standin(port: int):
+    key = asyncssh.generate_private_key("ssh-ed25519")
+    return await asyncssh.create_server(
+        _StandInServer, "127.0.0.1", port,
+        server_host_keys=[key],
+        process_factory=_standin_shell,
+        encoding=None,
+        line_editor=False,
+    )
+
+
+def _silence():
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+
+
+def _standin_main(port: int, ready, quiet: bool):
+    if quiet:
+        _silence()
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    loop.run_until_complete(start_standin(port))
+    ready.set()
+    loop.run_forever()
+
+
+# ==================== PROBE MEMORI ====================
+# Struktur SSHManager -> file tempat alokasinya terjadi (tracemalloc hanya
+# mencatat frame paling dalam, jadi pengelompokan per file sumber)
+MEMORY_GROUPS = (
+    ("terminals", ("backend/terminal_session.py", "backend/output_pump.py",
+                   "backend/terminal_protocol.py", "backend/echo_trace.py")),
+    ("local_sessions", ("backend/pty_shell.py", "asyncio/subprocess.py",
+                        "asyncio/unix_events.py", "asyncio/base_subprocess.py",
+                        "/subprocess.py", "/pty.py")),
+    ("connections", ("asyncssh/",)),
+    ("websockets", ("websockets/", "uvicorn/", "starlette/", "fastapi/", "/wsproto/")),
+    ("sessions", ("backend/ssh_manager.py", "backend/session_reaper.py",
+                  "backend/connect_trace.py", "backend/metrics.py")),
+    ("asyncio", ("/asyncio/",)),
+)
+
+SSH_MANAGER_STRUCTURES = (
+    "connections", "local_sessions", "sessions", "terminals", "pool",
+    "session_pool", "connect_traces", "disconnected",
+)
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # Fallback: peak RSS (KiB di Linux)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _fd_count() -> int:
+    for path in ("/proc/self/fd", "/dev/fd"):
+        try:
+            return len(os.listdir(path))
+        except OSError:
+            continue
+    return -1
+
+
+def _memory_groups() -> dict:
+    groups = dict.fromkeys([name for name, _ in MEMORY_GROUPS] + ["other"], 0)
+    for stat in tracemalloc.take_snapshot().statistics("filename"):
+        filename = stat.traceback[0].filename.replace(os.sep, "/")
+        for name, patterns in MEMORY_GROUPS:
+            if any(pattern in filename for pattern in patterns):
+                groups[name] += stat.size
+                break
+        else:
+            groups["other"] += stat.size
+    return groups
+
+
+def _install_probes(app):
+    from backend import metrics
+    from backend.main import ssh_manager
+
+    lag_base = {"count": 0, "sum": 0.0}
+
+    @app.get("/__bench/cpu")
+    async def bench_cpu():
+        # Handler async jalan di thread event loop backend
+        return {"loop_cpu": time.thread_time(), "process_cpu": time.process_time()}
+
+    @app.get("/__bench/memory")
+    async def bench_memory(snapshot: bool = True):
+        # snapshot=false: hanya reset jendela lag, tanpa gc/tracemalloc yang memblokir loop
+        if snapshot:
+            gc.collect()
+        monitor = metrics.loop_lag
+        count = monitor.lag.count - lag_base["count"]
+        total = monitor.lag.sum - lag_base["sum"]
+        lag_base.update(count=monitor.lag.count, sum=monitor.lag.sum)
+        max_lag, monitor.max_lag = monitor.max_lag, 0.0
+        return {
+            "rss_bytes": _rss_bytes(),
+            "fds": _fd_count(),
+            "fd_limit": resource.getrlimit(resource.RLIMIT_NOFILE)[0],
+            # Sejak panggilan /__bench/memory sebelumnya
+            "loop_lag_mean_ms": round(total * 1000 / count, 3) if count else 0.0,
+            "loop_lag_max_ms": round(max_lag * 1000, 3),
+            "structures": {
+                name: len(getattr(ssh_manager, name, {})) for name in SSH_MANAGER_STRUCTURES
+            },
+            "tracemalloc": _memory_groups() if snapshot and tracemalloc.is_tracing() else None,
+        }
+
+
+# ==================== PROSES SERVER ====================
+def _server_main(web_port: int, env: dict, quiet: bool, trace_memory: bool):
+    os.environ.update(env)
+    if quiet:
+        _silence()
+    if trace_memory:
+        # Sebelum import backend supaya alokasi modul ikut tercatat di baseline
+        tracemalloc.start()
+
+    import uvicorn
+    from backend.main import app
+
+    _install_probes(app)
+    uvicorn.Server(uvicorn.Config(
+        app, host="127.0.0.1", port=web_port, log_level="warning"
+    )).run()
+
+
+class BenchStack:
+    """Context manager: start proses server, sediakan helper untuk benchmark"""
+
+    def __init__(self, env: dict = None, quiet: bool = True, trace_memory: bool = False):
+        self.web_port = free_port()
+        self.ssh_port = free_port()
+        self.workdir = tempfile.mkdtemp(prefix="wt-bench-")
+        self.env = {"WT_DATABASE_URL": f"sqlite+aiosqlite:///{self.workdir}/bench.db"}
+        self.env.update(env or {})
+        self.quiet = quiet
+        self.trace_memory = trace_memory
+        self.process = None
+        self.standin = None
+
+    def __enter__(self):
+        context = multiprocessing.get_context("spawn")
+        ready = context.Event()
+        self.standin = context.Process(
+            target=_standin_main, args=(self.ssh_port, ready, self.quiet), daemon=True
+        )
+        self.standin.start()
+        self.process = context.Process(
+            target=_server_main,
+            args=(self.web_port, self.env, self.quiet, self.trace_memory),
+            daemon=True,
+        )
+        self.process.start()
+        if not ready.wait(30):
+            self.__exit__()
+            raise RuntimeError("SSH stand-in did not start")
+        wait_ready(self.web_port)
+        return self
+
+    def __exit__(self, *exc):
+        for process in (self.process, self.standin):
+            if process is None:
+                continue
+            process.terminate()
+            process.join(10)
+            if process.is_alive():
+                process.kill()
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    def api(self, method: str, path: str, body=None):
+        return api(self.web_port, method, path, body)
+
+    def cpu(self) -> dict:
+        return self.api("GET", "/__bench/cpu")
+
+    def memory(self, snapshot: bool = True) -> dict:
+        return self.api("GET", f"/__bench/memory?snapshot={str(snapshot).lower()}")
+
+    def connect(self) -> str:
+        """Buka session SSH ke stand-in, return session_id"""
+        return self.api("POST", "/api/connect", {
+            "host": "127.0.0.1", "port": self.ssh_port,
+            "username": SSH_USER, "password": SSH_PASSWORD,
+        })["session_id"]
+
+    def connect_local(self) -> str:
+        """Buka local shell di mesin backend, return session_id"""
+        return self.api("POST", "/api/connect-local")["session_id"]
+
+    def ws_url(self, session_id: str, **params) -> str:
+        query = "&".join(f"{k}={v}" for k, v in {"protocol": "binary", **params}.items())
+        return f"ws://127.0.0.1:{self.web_port}/ws/terminal/{session_id}?{query}"
+
+
+if __name__ == "__main__":
+    # Debug manual: jalankan stack dan tunggu sampai Ctrl+C
+    with BenchStack(quiet=False) as stack:
+        print(f"backend http://127.0.0.1:{stack.web_port}  ssh 127.0.0.1:{stack.ssh_port}",
+              file=sys.stderr)
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
@@ -14,6 +14,12 @@ import TabBar from "./components/TabBar";
 import QuickCommand from "./components/QuickCommand";
 import axios from "axios";
 
+// Token dari /api/login, dikirim di setiap request REST (backend/auth.py)
+const savedToken = localStorage.getItem("access_token");
+if (savedToken) {
+  axios.defaults.headers.common.Authorization = `Bearer ${savedToken}`;
+}
+
 const darkTheme = createTheme({
   palette: {
     mode: "dark",
@@ -57,6 +63,21 @@ function App() {
     }
   }, []);
 
+  // Token kedaluwarsa / tidak valid: login ulang
+  useEffect(() => {
+    const interceptor = axios.interceptors.response.use(
+      (response) => response,
+      (error) => {
+        if (error.response?.status === 401 && localStorage.getItem("access_token")) {
+          handleLogout();
+        }
+        return Promise.reject(error);
+      },
+    );
+    return () => axios.interceptors.response.eject(interceptor);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, []);
+
   // Load saved hosts setelah login
   useEffect(() => {
     if (isAuthenticated && userId) {
@@ -99,6 +120,8 @@ function App() {
     localStorage.removeItem("xshell-auth");
     localStorage.removeItem("username");
     localStorage.removeItem("user_id");
+    localStorage.removeItem("access_token");
+    delete axios.defaults.headers.common.Authorization;
     setIsAuthenticated(false);
     setSessions([]);
     setActiveSession(null);
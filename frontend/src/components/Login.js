@@ -111,6 +111,8 @@ const Login = ({ onLogin, open, onClose, onConnect, onConnectSaved }) => {
       );
 
       localStorage.setItem("user_id", response.data.user_id);
+      localStorage.setItem("access_token", response.data.access_token);
+      axios.defaults.headers.common.Authorization = `Bearer ${response.data.access_token}`;
       setUserId(response.data.user_id);
 
       onLogin(formData.username, formData.password);
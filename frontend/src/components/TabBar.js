@@ -26,7 +26,10 @@ const TabBar = ({
 
     const fetchHosts = async () => {
       try {
-        const res = await fetch(`/api/hosts/${userId}`);
+        const token = localStorage.getItem("access_token");
+        const res = await fetch(`/api/hosts/${userId}`, {
+          headers: token ? { Authorization: `Bearer ${token}` } : {},
+        });
         const data = await res.json();
 
         if (Array.isArray(data)) {
@@ -115,78 +115,208 @@ const Terminal = ({ session }) => {
     // =========================
     setStatus("connecting");
 
-    const ws = new WebSocket(
-      `ws://localhost:8000/ws/terminal/${session.backendId}`,
-    );
-    wsRef.current = ws;
-
-    // 🔥 FLAG UNTUK MENCEGAH MULTIPLE EVENT
-    let connectionEstablished = false;
-
-    ws.onopen = () => {
-      if (connectionEstablished) return;
-      connectionEstablished = true;
-
-      setConnected(true);
-      setStatus("connected");
-
-      setTimeout(() => {
-        if (fitAddon.current && ws.readyState === WebSocket.OPEN) {
-          const dimensions = fitAddon.current.proposeDimensions();
-          if (dimensions?.cols && dimensions?.rows) {
-            ws.send(
-              JSON.stringify({
-                type: "resize",
-                cols: Math.floor(dimensions.cols),
-                rows: Math.floor(dimensions.rows),
-              }),
-            );
+    const FRAME_DATA = 0x01;
+    const FRAME_DATA_DEFLATE = 0x03;
+    const DEFLATE_SYNC_TAIL = new Uint8Array([0x00, 0x00, 0xff, 0xff]);
+    const MAX_RECONNECT_ATTEMPTS = 5;
+    const resumeKey = `wt-resume-${session.backendId}`;
+
+    // Shell tetap hidup di server saat websocket putus. Token disimpan di
+    // sessionStorage supaya reload tab bisa attach ulang (replay scrollback),
+    // offset hanya valid selama xterm ini masih menyimpan output sebelumnya
+    let resumeToken = sessionStorage.getItem(resumeKey);
+    let outputOffset = null;
+    let reconnectAttempts = 0;
+    let reconnectTimer = null;
+    let shellExited = false;
+    let disposed = false;
+
+    // Tracing latency keystroke -> echo, aktifkan dengan
+    // localStorage.setItem("wt-trace", "1") lalu reload tab
+    const traceEnabled = localStorage.getItem("wt-trace") === "1";
+    const traceSent = new Map();
+    let traceSeq = 0;
+
+    // Kompresi output (raw deflate, satu konteks per websocket). Matikan dengan
+    // localStorage.setItem("wt-compress", "0") kalau CPU client lebih mahal dari bandwidth
+    const compressEnabled =
+      typeof DecompressionStream !== "undefined" &&
+      localStorage.getItem("wt-compress") !== "0";
+
+    const createInflater = () => {
+      const stream = new DecompressionStream("deflate-raw");
+      return { writer: stream.writable.getWriter(), reader: stream.readable.getReader() };
+    };
+
+    // Server flush (Z_SYNC_FLUSH) di setiap frame, jadi output satu frame
+    // selalu lengkap setelah payload + ekor sync ditulis
+    const inflate = async (inflater, payload, size) => {
+      const input = new Uint8Array(payload.length + DEFLATE_SYNC_TAIL.length);
+      input.set(payload);
+      input.set(DEFLATE_SYNC_TAIL, payload.length);
+      inflater.writer.write(input);
+      const output = new Uint8Array(size);
+      let filled = 0;
+      while (filled < size) {
+        const { value, done } = await inflater.reader.read();
+        if (done) throw new Error("inflate stream closed");
+        output.set(value, filled);
+        filled += value.length;
+      }
+      return output;
+    };
+
+    const connect = () => {
+      // Minta mode binary: output mentah di binary frame, kontrol tetap JSON
+      const params = new URLSearchParams({ protocol: "binary" });
+      if (resumeToken) params.set("resume", resumeToken);
+      if (resumeToken && outputOffset !== null) params.set("offset", outputOffset);
+      if (traceEnabled) params.set("trace", "1");
+      if (compressEnabled) params.set("compress", "deflate");
+
+      const ws = new WebSocket(
+        `ws://localhost:8000/ws/terminal/${session.backendId}?${params}`,
+      );
+      ws.binaryType = "arraybuffer";
+      wsRef.current = ws;
+
+      // 🔥 FLAG UNTUK MENCEGAH MULTIPLE EVENT
+      let connectionEstablished = false;
+      // Decompress async: semua pesan diproses berurutan lewat satu antrian
+      let inflater = null;
+      let messageQueue = Promise.resolve();
+
+      ws.onopen = () => {
+        if (connectionEstablished) return;
+        connectionEstablished = true;
+        reconnectAttempts = 0;
+
+        setConnected(true);
+        setStatus("connected");
+
+        setTimeout(() => {
+          if (fitAddon.current && ws.readyState === WebSocket.OPEN) {
+            const dimensions = fitAddon.current.proposeDimensions();
+            if (dimensions?.cols && dimensions?.rows) {
+              ws.send(
+                JSON.stringify({
+                  type: "resize",
+                  cols: Math.floor(dimensions.cols),
+                  rows: Math.floor(dimensions.rows),
+                }),
+              );
+            }
           }
+        }, 300);
+      };
+
+      ws.onclose = () => {
+        if (!connectionEstablished) {
+          if (!disposed && !shellExited) scheduleReconnect();
+          return;
         }
-      }, 300);
-    };
+        connectionEstablished = false;
 
-    ws.onclose = () => {
-      if (!connectionEstablished) return;
-      connectionEstablished = false;
+        setConnected(false);
+        if (disposed) return;
 
-      setConnected(false);
-      setStatus("disconnected");
-      term.writeln("\r\n\x1b[31mDisconnected from server\x1b[0m\r\n");
+        if (!shellExited && resumeToken && reconnectAttempts < MAX_RECONNECT_ATTEMPTS) {
+          setStatus("connecting");
+          scheduleReconnect();
+          return;
+        }
+        setStatus("disconnected");
+        term.writeln("\r\n\x1b[31mDisconnected from server\x1b[0m\r\n");
+      };
+
+      const handleMessage = async (event) => {
+        if (!connectionEstablished) return;
+        if (event.data instanceof ArrayBuffer) {
+          const frame = new Uint8Array(event.data);
+          let output = null;
+          if (frame[0] === FRAME_DATA) {
+            output = frame.subarray(1);
+          } else if (frame[0] === FRAME_DATA_DEFLATE) {
+            if (!inflater) inflater = createInflater();
+            const size = new DataView(event.data).getUint32(1);
+            output = await inflate(inflater, frame.subarray(5), size);
+          }
+          if (output && terminalInstance.current) {
+            // xterm.js decode UTF-8 sendiri (aman untuk multibyte terpotong)
+            terminalInstance.current.write(output);
+            if (outputOffset !== null) outputOffset += output.length;
+          }
+          return;
+        }
+        try {
+          const data = JSON.parse(event.data);
+          if (data.type === "data" && terminalInstance.current) {
+            terminalInstance.current.write(data.data);
+          } else if (data.type === "attached") {
+            resumeToken = data.resume_token;
+            outputOffset = data.offset;
+            sessionStorage.setItem(resumeKey, resumeToken);
+          } else if (data.type === "exit") {
+            shellExited = true;
+            sessionStorage.removeItem(resumeKey);
+          } else if (data.type === "trace") {
+            // Frame echo sudah diterima tepat sebelum pesan ini
+            const sentAt = traceSent.get(data.seq);
+            traceSent.delete(data.seq);
+            if (sentAt !== undefined && ws.readyState === WebSocket.OPEN) {
+              const totalMs = Date.now() - sentAt;
+              ws.send(JSON.stringify({ type: "trace", seq: data.seq, total_ms: totalMs }));
+              console.debug("echo trace", { total_ms: totalMs, ...data.server_ms });
+            }
+          }
+        } catch (e) {
+          console.error("WS parse error:", e);
+        }
+      };
+
+      ws.onmessage = (event) => {
+        messageQueue = messageQueue
+          .then(() => handleMessage(event))
+          .catch((e) => console.error("WS message error:", e));
+      };
+
+      ws.onerror = (error) => {
+        if (!connectionEstablished) return;
+        console.error("WebSocket error:", error);
+        setStatus("error");
+        terminalInstance.current?.writeln(
+          "\r\n\x1b[31mConnection error\x1b[0m\r\n",
+        );
+      };
     };
 
-    ws.onmessage = (event) => {
-      if (!connectionEstablished) return;
-      try {
-        const data = JSON.parse(event.data);
-        if (data.type === "data" && terminalInstance.current) {
-          terminalInstance.current.write(data.data);
-        }
-      } catch (e) {
-        console.error("WS parse error:", e);
+    const scheduleReconnect = () => {
+      if (reconnectAttempts >= MAX_RECONNECT_ATTEMPTS) {
+        setStatus("disconnected");
+        return;
       }
+      // Backoff 0.5s, 1s, 2s, ... supaya tidak membanjiri server yang restart
+      const delay = 500 * 2 ** reconnectAttempts;
+      reconnectAttempts += 1;
+      reconnectTimer = setTimeout(connect, delay);
     };
 
-    ws.onerror = (error) => {
-      if (!connectionEstablished) return;
-      console.error("WebSocket error:", error);
-      setStatus("error");
-      terminalInstance.current?.writeln(
-        "\r\n\x1b[31mConnection error\x1b[0m\r\n",
-      );
-    };
+    connect();
 
     // =========================
     // INPUT → SEND TO SERVER
     // =========================
     term.onData((data) => {
       if (wsRef.current?.readyState === WebSocket.OPEN) {
-        wsRef.current.send(
-          JSON.stringify({
-            type: "input",
-            data: data,
-          }),
-        );
+        const message = { type: "input", data: data };
+        if (traceEnabled) {
+          // Server hanya men-trace satu keystroke dalam satu waktu
+          message.seq = ++traceSeq;
+          message.ts = Date.now();
+          traceSent.set(message.seq, message.ts);
+          if (traceSent.size > 64) traceSent.delete(traceSent.keys().next().value);
+        }
+        wsRef.current.send(JSON.stringify(message));
       }
     });
 
@@ -253,6 +383,8 @@ const Terminal = ({ session }) => {
     // CLEANUP
     // =========================
     return () => {
+      disposed = true;
+      clearTimeout(reconnectTimer);
       window.removeEventListener("resize", handleResize);
       window.sendCommandToTerminal = null;
 
@@ -0,0 +1,47 @@
+"""Trace connect mencatat setiap fase handshake, termasuk kex.
+
+Fase kex ditandai lewat hook di _PoolClient (lihat komentar di sana); test
+ini yang menangkap kalau upgrade asyncssh membuat fase itu hilang.
+"""
+import asyncio
+import multiprocessing
+
+import pytest
+
+from backend.ssh_manager import SSHManager
+from benchmarks.bench_rest_echo import free_port
+from benchmarks.stack import SSH_PASSWORD, SSH_USER, _standin_main
+
+HANDSHAKE_PHASES = ("dns", "tcp", "kex", "auth")
+
+
+@pytest.fixture(scope="module")
+def standin_port():
+    port = free_port()
+    context = multiprocessing.get_context("spawn")
+    ready = context.Event()
+    process = context.Process(target=_standin_main, args=(port, ready, True), daemon=True)
+    process.start()
+    assert ready.wait(30), "SSH stand-in did not start"
+    yield port
+    process.terminate()
+    process.join(10)
+
+
+def test_handshake_phases_recorded(standin_port):
+    async def scenario():
+        manager = SSHManager()
+        await manager.run_pooled_command("127.0.0.1", standin_port, SSH_USER, SSH_PASSWORD, "yes 3")
+        return manager.get_connect_diagnostics("127.0.0.1", standin_port)
+
+    diagnostics = asyncio.run(scenario())
+
+    trace = diagnostics["recent"][0]
+    assert trace["ok"] is True
+    attempt = trace["attempts"][-1]
+    assert list(attempt["phases_ms"]) == list(HANDSHAKE_PHASES)
+    # Kex (DH + signature) tidak mungkin gratis; kalau hook tidak jalan,
+    # waktunya ikut masuk ke auth dan fase kex tidak ada sama sekali
+    assert attempt["phases_ms"]["kex"] > 0
+    for phase in HANDSHAKE_PHASES:
+        assert diagnostics["phases"][phase]["count"] == 1
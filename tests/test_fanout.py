@@ -0,0 +1,73 @@
+"""Fan-out: output host yang melebihi FANOUT_MAX_OUTPUT dipotong saat dibaca.
+
+Target SSH adalah stand-in dari benchmarks/stack.py; ``yes N`` di exec
+channel menulis N byte lalu exit.
+"""
+import asyncio
+import multiprocessing
+import time
+
+import pytest
+
+from backend import fanout
+from backend.ssh_manager import SSHManager
+from benchmarks.bench_rest_echo import free_port
+from benchmarks.stack import SSH_PASSWORD, SSH_USER, _standin_main
+
+CAP = 16 * 1024
+# Jauh di atas cap: kalau channel tidak ditutup, transfer ini lewat timeout
+HUGE = 48 * 1024 * 1024
+TIMEOUT = 10
+
+
+@pytest.fixture(scope="module")
+def standin_port():
+    port = free_port()
+    context = multiprocessing.get_context("spawn")
+    ready = context.Event()
+    process = context.Process(target=_standin_main, args=(port, ready, True), daemon=True)
+    process.start()
+    assert ready.wait(30), "SSH stand-in did not start"
+    yield port
+    process.terminate()
+    process.join(10)
+
+
+def _fan_out(manager, port, command):
+    target = {"id": 1, "host": "127.0.0.1", "port": port,
+              "username": SSH_USER, "password": SSH_PASSWORD}
+
+    async def collect():
+        return [event async for event in fanout.fan_out(manager, [target], command, timeout=TIMEOUT)]
+
+    return collect()
+
+
+def test_output_over_cap_is_cut_while_reading(standin_port, monkeypatch):
+    monkeypatch.setattr(fanout, "FANOUT_MAX_OUTPUT", CAP)
+
+    async def scenario():
+        manager = SSHManager()
+        started = time.perf_counter()
+        big = await _fan_out(manager, standin_port, f"yes {HUGE}")
+        elapsed = time.perf_counter() - started
+        # Koneksi pool tetap sehat setelah channel ditutup paksa
+        small = await _fan_out(manager, standin_port, "yes 30")
+        return big, elapsed, small
+
+    big, elapsed, small = asyncio.run(scenario())
+
+    result = big[1]
+    assert result["type"] == "result"
+    assert "error" not in result, result.get("error")
+    assert result["truncated"] is True
+    assert result["ok"] is True
+    assert len(result["stdout"]) == CAP
+    assert result["stdout"].startswith("y\r\ny\r\n")
+    assert elapsed < TIMEOUT / 2
+
+    result = small[1]
+    assert result["truncated"] is False
+    assert result["exit_status"] == 0
+    assert result["stdout"].startswith("y\r\n" * 10)
+    assert result["pooled"] is True
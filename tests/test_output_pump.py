@@ -0,0 +1,67 @@
+"""OutputPump: echo keystroke dikirim langsung, output beruntun digabung."""
+import asyncio
+
+from backend.output_pump import OutputPump
+
+BUDGET_MS = 20
+
+
+class FakeChannel:
+    def __init__(self):
+        self.frames = []
+
+    async def send_output_chunks(self, chunks):
+        self.frames.append((asyncio.get_running_loop().time(), b"".join(chunks)))
+
+    async def send_control(self, kind, **fields):
+        pass
+
+
+async def _wait_frames(channel: FakeChannel, count: int):
+    while len(channel.frames) < count:
+        await asyncio.sleep(0.001)
+    return channel.frames[count - 1][0]
+
+
+def test_echo_after_latency_flush_is_interactive():
+    async def run():
+        channel = FakeChannel()
+        pump = OutputPump(channel, latency_budget_ms=BUDGET_MS).start()
+        loop = asyncio.get_running_loop()
+
+        await pump.feed(b"a")
+        await _wait_frames(channel, 1)
+        # Read kedua terlalu dekat dengan read pertama: ditahan latency budget
+        await asyncio.sleep(0.001)
+        await pump.feed(b"b")
+        await _wait_frames(channel, 2)
+        # Read ketiga tepat setelah flush tertunda, tapi > budget sejak read
+        # sebelumnya: shell sempat idle, jangan ditahan lagi
+        fed_at = loop.time()
+        await pump.feed(b"c")
+        sent_at = await _wait_frames(channel, 3)
+        await pump.close()
+
+        assert [frame for _, frame in channel.frames] == [b"a", b"b", b"c"]
+        assert pump.stats["flush_reasons"]["interactive"] == 2
+        assert pump.stats["flush_reasons"]["latency"] == 1
+        assert sent_at - fed_at < BUDGET_MS / 2000
+
+    asyncio.run(run())
+
+
+def test_consecutive_small_feeds_are_coalesced():
+    async def run():
+        channel = FakeChannel()
+        pump = OutputPump(channel, latency_budget_ms=BUDGET_MS).start()
+        for i in range(20):
+            await pump.feed(b"line %d\r\n" % i)
+        await pump.close()
+
+        assert b"".join(frame for _, frame in channel.frames) == b"".join(
+            b"line %d\r\n" % i for i in range(20)
+        )
+        # Hanya read pertama (setelah idle) yang dikirim sendiri
+        assert len(channel.frames) <= 2
+
+    asyncio.run(run())
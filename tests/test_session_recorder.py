@@ -0,0 +1,46 @@
+"""Rekaman session: terminal yang dibuka ulang melanjutkan file yang sama."""
+import asyncio
+import json
+
+from backend import session_recorder
+from backend.session_recorder import SessionRecorder, replay
+
+INFO = {"host": "example", "port": 22, "username": "deploy", "type": "ssh"}
+
+
+async def _record(directory: str, outputs):
+    recorder = SessionRecorder("s1", INFO, directory=directory)
+    for data in outputs:
+        recorder.record_output(data)
+        # Satu chunk per event, supaya index punya beberapa record
+        recorder.flush()
+        await asyncio.sleep(0.01)
+    await recorder.close()
+    return recorder
+
+
+def test_reopened_terminal_continues_recording(tmp_path, monkeypatch):
+    directory = str(tmp_path)
+    monkeypatch.setattr(session_recorder, "RECORDING_DIR", directory)
+
+    async def run():
+        await _record(directory, [b"run0-a\r\n", b"run0-b\r\n"])
+        # Shell baru di session yang sama (tanpa resume token)
+        second = await _record(directory, [b"run1-a\r\n", b"run1-b\r\n"])
+        return second, [line async for line in replay("s1", speed=0)]
+
+    second, lines = asyncio.run(run())
+    events = [json.loads(line) for line in lines[1:]]
+
+    assert [data for _, kind, data in events if kind == "o"] == [
+        "run0-a\r\n", "run0-b\r\n", "run1-a\r\n", "run1-b\r\n"
+    ]
+    assert [data for _, kind, data in events if kind == "m"] == ["reopened"]
+    times = [t for t, _, _ in events]
+    assert times == sorted(times)
+
+    meta = json.loads((tmp_path / "s1.json").read_text())
+    assert meta["finished"]
+    assert meta["stats"]["output_bytes"] == 32
+    assert meta["stats"]["chunks"] == second.stats["chunks"] == 4
+    assert meta["stats"]["compressed_bytes"] == (tmp_path / "s1.cast.z").stat().st_size
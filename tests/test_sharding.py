@@ -0,0 +1,153 @@
+"""Mode sharded: request yang butuh session harus sampai di shard pemiliknya.
+
+Front ``python -m backend.sharding`` dengan 2 worker, target SSH adalah
+stand-in dari benchmarks/stack.py.
+"""
+import http.client
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+
+import pytest
+
+from backend.sharding import ShardFront, host_shard, shard_of
+from benchmarks.bench_rest_echo import api, free_port, wait_ready
+from benchmarks.stack import SSH_PASSWORD, SSH_USER, _standin_main
+
+SHARDS = 2
+
+
+@pytest.fixture(scope="module")
+def standin_port():
+    port = free_port()
+    context = multiprocessing.get_context("spawn")
+    ready = context.Event()
+    process = context.Process(target=_standin_main, args=(port, ready, True), daemon=True)
+    process.start()
+    assert ready.wait(30), "SSH stand-in did not start"
+    yield port
+    process.terminate()
+    process.join(10)
+
+
+@pytest.fixture(scope="module")
+def front_port():
+    port = free_port()
+    workdir = tempfile.mkdtemp(prefix="wt-test-shards-")
+    env = dict(os.environ, WT_DATABASE_URL=f"sqlite+aiosqlite:///{workdir}/test.db")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "backend.sharding", "--host", "127.0.0.1", "--port", str(port),
+         "--shards", str(SHARDS), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_ready(port, timeout=60)
+        yield port
+    finally:
+        process.terminate()
+        process.wait(30)
+
+
+def _exec_stream(port: int, session_id: str, command: str) -> list:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    try:
+        conn.request("POST", f"/api/exec/stream/{session_id}", json.dumps({"command": command}),
+                     {"Content-Type": "application/json"})
+        response = conn.getresponse()
+        body = response.read()
+    finally:
+        conn.close()
+    assert response.status == 200, body
+    return [json.loads(line) for line in body.splitlines() if line]
+
+
+def test_route_session_paths():
+    front = ShardFront(SHARDS, tempfile.gettempdir())
+    for session_id in ("a", "b", "c", "d"):
+        owner = front.workers[shard_of(session_id, SHARDS)]
+        for path in (f"/ws/terminal/{session_id}", f"/api/session/{session_id}",
+                     f"/api/exec/stream/{session_id}"):
+            assert front.route("POST", path, {}) is owner
+
+
+def test_route_saved_host_paths():
+    front = ShardFront(SHARDS, tempfile.gettempdir())
+    for host_id in range(1, 5):
+        owner = front.workers[host_shard(host_id, SHARDS)]
+        assert front.route("POST", f"/api/connect-saved/{host_id}", {}) is owner
+        assert front.route("GET", f"/api/diagnostics/connect/{host_id}", {}) is owner
+    for path in ("/api/ssh-pool", "/api/connect-cache", "/api/prewarm"):
+        assert front.route("GET", path, {}) is None
+
+
+def _connect_all(front_port: int, standin_port: int) -> list:
+    return [
+        api(front_port, "POST", "/api/connect", {
+            "host": "127.0.0.1", "port": standin_port,
+            "username": SSH_USER, "password": SSH_PASSWORD,
+        })["session_id"]
+        for _ in range(2 * SHARDS)
+    ]
+
+
+def test_exec_stream_on_every_shard(front_port, standin_port):
+    session_ids = _connect_all(front_port, standin_port)
+    # Connect round robin: setiap shard punya session
+    assert {shard_of(session_id, SHARDS) for session_id in session_ids} == set(range(SHARDS))
+
+    for session_id in session_ids:
+        events = _exec_stream(front_port, session_id, "yes 30")
+        output = "".join(event["data"] for event in events if event["type"] == "output")
+        assert output.startswith("y\r\n" * 10)
+        assert events[-1]["type"] == "exit"
+        api(front_port, "POST", f"/api/disconnect/{session_id}")
+
+
+def test_per_process_views_merged(front_port, standin_port):
+    session_ids = _connect_all(front_port, standin_port)
+    try:
+        pool = api(front_port, "GET", "/api/ssh-pool")
+        assert {entry["shard"] for entry in pool} == set(range(SHARDS))
+        for path in ("/api/connect-cache", "/api/prewarm"):
+            assert set(api(front_port, "GET", path)) == {str(shard) for shard in range(SHARDS)}
+    finally:
+        for session_id in session_ids:
+            api(front_port, "POST", f"/api/disconnect/{session_id}")
+
+
+def _shard_api(port: int, shard: int, method: str, path: str, token: str = None):
+    headers = {"X-WT-Shard": str(shard)}
+    if token is not None:
+        headers["Authorization"] = f"Bearer {token}"
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    try:
+        conn.request(method, path, headers=headers)
+        response = conn.getresponse()
+        body = response.read()
+    finally:
+        conn.close()
+    assert response.status == 200, body
+    return json.loads(body)
+
+
+def test_user_change_invalidates_principal_on_every_shard(front_port):
+    api(front_port, "POST", "/api/register?username=shard-user&password=secret")
+    login = api(front_port, "POST", "/api/login?username=shard-user&password=secret")
+    user_id, token = login["user_id"], login["access_token"]
+
+    # Principal user ini masuk cache di setiap shard
+    for shard in range(SHARDS):
+        _shard_api(front_port, shard, "GET", f"/api/recordings?user_id={user_id}", token)
+    before = [_shard_api(front_port, shard, "GET", "/api/auth-cache") for shard in range(SHARDS)]
+    assert all(status["entries"] >= 1 for status in before)
+
+    # Perubahan lewat satu shard saja
+    _shard_api(front_port, 0, "PUT", f"/api/users/{user_id}/prewarm?enabled=false", token)
+
+    for shard, old in enumerate(before):
+        status = _shard_api(front_port, shard, "GET", "/api/auth-cache")
+        assert status["invalidations"] > old["invalidations"]
+        assert status["entries"] == old["entries"] - 1